@@ -0,0 +1,112 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/accelerated.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Compare le lecteur de référence fp32 (quantize=False, mode eager) au mode
+    CPU accéléré de create_reader (int8 + inference_mode + threads fixés +
+    chauffe) sur les mêmes variantes prétraitées :
+        - accord lettre à lettre : lettres communes / lettres vues par l'un
+          des deux, écart moyen des Y des lettres communes ;
+        - accord sur le layout final ;
+        - latence OCR par image et temps de chargement (chauffe incluse).
+    Chaque lecteur tourne dans un processus neuf (réglages torch indépendants).
+
+    Usage : python -m benchmarks.accelerated [dossier] [--threads N]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+MODES = {"fp32": {"quantize": False}, "accéléré": {"accelerated": True}}
+
+def _run_mode(folder, files, reader_options, threads):
+    """Exécuté dans un processus dédié : {fichier: (chars, secondes)}, temps de chargement"""
+    import cv2
+    from src.engine import create_reader, run_ocr_pipeline
+    from src.preprocessing import get_processed_images
+
+    start = time.perf_counter()
+    reader = create_reader(threads=threads, **reader_options)
+    load_time = time.perf_counter() - start
+
+    results = {}
+    for f in files:
+        img = cv2.imread(os.path.join(folder, f))
+        if img is None:
+            continue
+        processed = get_processed_images(img)
+        start = time.perf_counter()
+        chars = run_ocr_pipeline(reader, processed)
+        results[f] = (chars, time.perf_counter() - start)
+    return results, load_time
+
+def letter_agreement(chars_a, chars_b):
+    """(lettres communes / union, écart moyen des Y des lettres communes en px)"""
+    union = set(chars_a) | set(chars_b)
+    common = set(chars_a) & set(chars_b)
+    if not union:
+        return 1.0, 0.0
+    dy = sum(abs(chars_a[c] - chars_b[c]) for c in common) / len(common) if common else 0.0
+    return len(common) / len(union), dy
+
+def main():
+    from src.dataset import list_images
+    from src.pipeline import classify_chars
+
+    parser = argparse.ArgumentParser(description="Lecteur fp32 vs mode CPU accéléré")
+    parser.add_argument("folder", nargs="?", default=os.path.join("data", "inputs"))
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Threads torch (identiques pour les deux lecteurs, défaut : nb de coeurs)")
+    args = parser.parse_args()
+
+    files = sorted(list_images(args.folder))
+    if not files:
+        print(f"❌ Aucune image trouvée dans {args.folder}")
+        return
+    threads = args.threads or os.cpu_count() or 1
+
+    ctx = multiprocessing.get_context("spawn")
+    runs = {}
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for mode, reader_options in MODES.items():
+            print(f"Lecteur {mode} ({threads} thread(s))...")
+            runs[mode] = pool.apply(_run_mode, (args.folder, files, reader_options, threads))
+
+    (ref, ref_load), (acc, acc_load) = runs["fp32"], runs["accéléré"]
+    names = [f for f in files if f in ref and f in acc]
+    print(f"\n{'Fichier':<28}{'Lettres':>10}{'Accord':>9}{'dY (px)':>9}"
+          f"{'Layout':>9}{'fp32':>9}{'accéléré':>10}")
+    totals = {"agreement": 0.0, "dy": 0.0, "layout": 0, "ref": 0.0, "acc": 0.0}
+    for f in names:
+        (ref_chars, ref_s), (acc_chars, acc_s) = ref[f], acc[f]
+        agreement, dy = letter_agreement(ref_chars, acc_chars)
+        same_layout = classify_chars(ref_chars)["layout"] == classify_chars(acc_chars)["layout"]
+        totals["agreement"] += agreement
+        totals["dy"] += dy
+        totals["layout"] += same_layout
+        totals["ref"] += ref_s
+        totals["acc"] += acc_s
+        print(f"{f:<28}{len(ref_chars):>4} / {len(acc_chars):<4}{100 * agreement:>8.1f}%{dy:>9.2f}"
+              f"{'oui' if same_layout else 'NON':>9}{ref_s:>8.2f}s{acc_s:>9.2f}s")
+
+    if not names:
+        return
+    n = len(names)
+    print(f"\nAccord lettre à lettre moyen : {100 * totals['agreement'] / n:.1f}% "
+          f"(dY moyen {totals['dy'] / n:.2f} px)")
+    print(f"Même layout : {totals['layout']}/{n}")
+    print(f"OCR moyen : fp32 {totals['ref'] / n:.2f}s/image -> accéléré {totals['acc'] / n:.2f}s/image "
+          f"({totals['ref'] / max(totals['acc'], 1e-9):.2f}x)")
+    print(f"Chargement : fp32 {ref_load:.1f}s, accéléré {acc_load:.1f}s (chauffe incluse)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/clustering.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Micro-benchmark du clustering des rangées : K-Means sklearn (ancien défaut)
+    vs découpage 1D optimal (appel unitaire et appel vectorisé en lot).
+    Vérifie l'accord des étiquettes, qu'aucune solution optimale n'a
+    une inertie supérieure à celle du K-Means, et que des Y égaux sont
+    toujours dans la même rangée (y compris avec moins de 3 valeurs distinctes).
+
+    Usage : python -m benchmarks.clustering [--images 2000] [--seed 0]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import string
+import time
+import warnings
+
+import numpy as np
+
+from src.engine import cluster_rows, cluster_rows_batch
+
+def _synthetic_chars(rng):
+    """Lettres réparties sur 3 rangées inclinées/bruitées, comme une photo de clavier"""
+    letters = list(string.ascii_uppercase)
+    rng.shuffle(letters)
+    n = int(rng.integers(4, 27))
+    pitch = rng.uniform(40, 200)
+    tilt = rng.uniform(-0.15, 0.15)
+    noise = rng.uniform(0.02, 0.25) * pitch
+    rows = rng.integers(0, 3, size=n)
+    xs = rng.uniform(0, 10 * pitch, size=n)
+    ys = rows * pitch + tilt * xs + rng.normal(0, noise, size=n)
+    return dict(zip(letters[:n], ys.tolist()))
+
+def _equal_y_split(chars, rows):
+    """Vrai si deux lettres de même Y ont été mises dans des rangées différentes"""
+    by_y = {}
+    for c, y in chars.items():
+        by_y.setdefault(y, set()).add(rows[c])
+    return any(len(labels) > 1 for labels in by_y.values())
+
+def _few_values_chars(rng):
+    """Lettres sur 1 ou 2 valeurs de Y seulement (cas limite du découpage)"""
+    letters = list(string.ascii_uppercase)
+    rng.shuffle(letters)
+    n = int(rng.integers(4, 12))
+    values = rng.uniform(0, 500, size=int(rng.integers(1, 3))).round(1)
+    return dict(zip(letters[:n], rng.choice(values, size=n).tolist()))
+
+def _inertia(chars, rows):
+    y = np.array(list(chars.values()))
+    labels = np.array([rows[c] for c in chars])
+    return sum(((y[labels == k] - y[labels == k].mean()) ** 2).sum() for k in set(labels.tolist()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du clustering des rangées")
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    rng = np.random.default_rng(args.seed)
+    samples = [_synthetic_chars(rng) for _ in range(args.images)]
+
+    start = time.perf_counter()
+    kmeans = [cluster_rows(c, method="kmeans") for c in samples]
+    t_kmeans = time.perf_counter() - start
+
+    start = time.perf_counter()
+    optimal = [cluster_rows(c) for c in samples]
+    t_optimal = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = cluster_rows_batch(samples)
+    t_batch = time.perf_counter() - start
+
+    agree = sum(k == o for k, o in zip(kmeans, optimal))
+    same_batch = sum(b == o for b, o in zip(batch, optimal))
+    better = sum(_inertia(c, o) < _inertia(c, k) - 1e-9 for c, k, o in zip(samples, kmeans, optimal))
+    worse = sum(_inertia(c, o) > _inertia(c, k) + 1e-9 for c, k, o in zip(samples, kmeans, optimal))
+
+    n = len(samples)
+    print(f"{n} images synthétiques (4 à 26 lettres)")
+    print(f"KMeans sklearn     : {1e3 * t_kmeans / n:8.3f} ms/image")
+    print(f"Optimal (unitaire) : {1e3 * t_optimal / n:8.3f} ms/image  (x{t_kmeans / t_optimal:.0f})")
+    print(f"Optimal (lot)      : {1e3 * t_batch / n:8.3f} ms/image  (x{t_kmeans / t_batch:.0f})")
+    print(f"Accord des rangées avec KMeans : {agree}/{n} ({100 * agree / n:.1f}%)")
+    print(f"Lot identique à l'unitaire     : {same_batch}/{n}")
+    print(f"Inertie : meilleure que KMeans sur {better}, pire sur {worse}")
+
+    # Y égaux séparés : sur les échantillons ordinaires et sur 1-2 valeurs distinctes
+    edge_cases = [{"A": 1, "B": 1, "C": 2, "D": 2}] + [_few_values_chars(rng) for _ in range(200)]
+    split = sum(_equal_y_split(c, rows) for c, rows in zip(samples, optimal) if rows)
+    split += sum(_equal_y_split(c, cluster_rows(c)) for c in edge_cases)
+    split += sum(_equal_y_split(c, rows) for c, rows in zip(edge_cases, cluster_rows_batch(edge_cases)))
+    print(f"Y égaux séparés dans des rangées différentes : {split} "
+          f"({'❌' if split else 'aucun'})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/detect_once.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Compare le mode OCR historique ("full" : readtext sur les 4 variantes)
+    au mode "detect_once" (détection CRAFT une seule fois, reconnaissance seule
+    sur les variantes) : précision vs nom de fichier et latence OCR par image.
+
+    Usage : python -m benchmarks.detect_once [dossier] [--detect-on Inverted CLAHE]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import easyocr
+
+from src.preprocessing import get_processed_images
+from src.engine import run_ocr_pipeline, cluster_rows, score_layout
+from src.dataset import list_images, parse_expected_layout
+
+def _classify(chars):
+    if len(chars) < 4:
+        return "Pas assez de lettres"
+    rows = cluster_rows(chars)
+    if not rows:
+        return "Echec Cluster"
+    return score_layout(rows)[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detect-once vs full")
+    parser.add_argument("folder", nargs="?", default=os.path.join("data", "inputs"))
+    parser.add_argument("--detect-on", nargs="+", default=["Inverted"],
+                        help="Variantes utilisées pour la détection des boîtes")
+    args = parser.parse_args()
+
+    print("Chargement du modèle EasyOCR...")
+    reader = easyocr.Reader(['en'], gpu=False)
+
+    modes = {"full": {}, "detect_once": {"detect_on": tuple(args.detect_on)}}
+    stats = {m: {"time": 0.0, "ok": 0} for m in modes}
+    files = sorted(list_images(args.folder))
+
+    print(f"\n{'Fichier':<28}{'Attendu':>9}" + "".join(f"{m:>24}" for m in modes))
+    for f in files:
+        img = cv2.imread(os.path.join(args.folder, f))
+        if img is None:
+            continue
+        processed = get_processed_images(img)
+        expected = parse_expected_layout(f)
+
+        line = f"{f:<28}{expected:>9}"
+        for mode, kwargs in modes.items():
+            start = time.perf_counter()
+            chars = run_ocr_pipeline(reader, processed, mode=mode, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            detected = _classify(chars)
+            stats[mode]["time"] += elapsed
+            stats[mode]["ok"] += detected == expected
+            line += f"{detected[:12]:>14}{elapsed:>9.2f}s"
+        print(line)
+
+    if not files:
+        return
+    print()
+    for mode, s in stats.items():
+        print(f"{mode:<12} précision {100 * s['ok'] / len(files):5.1f}%  "
+              f"OCR moyen {s['time'] / len(files):6.2f}s/image")
+    if stats["detect_once"]["time"] > 0:
+        print(f"Gain de latence OCR : {stats['full']['time'] / stats['detect_once']['time']:.2f}x")
+
+if __name__ == "__main__":
+    main()
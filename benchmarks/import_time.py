@@ -0,0 +1,85 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/import_time.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Rapport du temps d'import au démarrage (python -X importtime) des points
+    d'entrée : `import src`, les modules du pipeline, `main.py --help`.
+    Vérifie que les dépendances lourdes (torch, EasyOCR, scikit-learn,
+    customtkinter) ne sont pas importées tant qu'aucune étape n'en a besoin,
+    et que chaque démarrage reste sous un budget en ms.
+    Échoue (code 1) sinon : utilisable en CI, comme cli_benchmark.py compare.
+
+    Usage : python -m benchmarks.import_time [--budget-ms 1000] [--top 10]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules qui ne doivent être importés qu'à la première étape qui en a besoin
+HEAVY_MODULES = ("torch", "torchvision", "easyocr", "sklearn", "customtkinter")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Nom -> arguments de l'interpréteur
+ENTRY_POINTS = {
+    "import src": ["-c", "import src"],
+    "src.pipeline": ["-c", "import src.pipeline"],
+    "src.streaming + src.batch": ["-c", "import src.streaming, src.batch"],
+    "main.py --help": ["main.py", "--help"],
+}
+
+def measure(args):
+    """(temps cumulé total en ms, {module: cumulé en ms}) d'un démarrage"""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=ROOT,
+                          capture_output=True, text=True)
+    modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in
+                                           line.replace("import time:", "|", 1).split("|"))
+        total_us += int(self_us)
+        modules[name] = int(cumulative_us) / 1000
+    return total_us / 1000, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import au démarrage")
+    parser.add_argument("--budget-ms", type=float, default=1000,
+                        help="Temps d'import maximal par point d'entrée (défaut 1000 ms)")
+    parser.add_argument("--top", type=int, default=5, help="Modules les plus lents affichés")
+    args = parser.parse_args()
+
+    failures = []
+    for label, entry_args in ENTRY_POINTS.items():
+        total, modules = measure(entry_args)
+        heavy = sorted(m for m in modules if m in HEAVY_MODULES)
+        status = "✅" if not heavy and total <= args.budget_ms else "❌"
+        print(f"\n{status} {label:<28} {total:8.1f} ms  ({len(modules)} modules)")
+        top_level = {m: t for m, t in modules.items() if "." not in m}
+        for name, t in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"      {name:<30} {t:8.1f} ms")
+        if heavy:
+            failures.append(f"{label} : import de {', '.join(heavy)}")
+        if total > args.budget_ms:
+            failures.append(f"{label} : {total:.0f} ms > budget {args.budget_ms:.0f} ms")
+
+    if failures:
+        print("\n❌ Démarrage trop lourd :")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("\n✅ Aucune dépendance lourde importée au démarrage")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/memory.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Mesure le pic de mémoire (RSS) par image du prétraitement + passages OCR :
+        - liste : get_processed_images (4 variantes gardées pendant tout l'OCR)
+        - flux  : iter_processed_images (une variante à la fois, buffers réutilisés)
+    Chaque mesure tourne dans un processus neuf pour partir d'un pic propre.
+    Sans --ocr, le "passage OCR" est simulé par une lecture de l'image.
+
+    Usage : python -m benchmarks.memory [dossier] [--ocr]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import multiprocessing
+import os
+
+import cv2
+
+from src.instrumentation import reset_peak_rss, current_rss_mb, peak_rss_mb
+
+MODES = ("liste", "flux")
+
+def _measure(path, mode, use_ocr):
+    """Exécuté dans un processus dédié : pic RSS (Mo) au-dessus du niveau après décodage"""
+    from src.preprocessing import get_processed_images, iter_processed_images
+
+    reader = None
+    if use_ocr:
+        from src.engine import create_reader, run_ocr_pipeline
+        reader = create_reader()
+
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    baseline = current_rss_mb()
+    if not reset_peak_rss() or baseline is None:
+        return None
+
+    variants = get_processed_images(img) if mode == "liste" else iter_processed_images(img)
+    if reader is not None:
+        run_ocr_pipeline(reader, variants)
+    else:
+        for _, variant in variants:
+            int(variant[::7, ::7].sum())  # lecture de l'image (simule le passage OCR)
+    return peak_rss_mb() - baseline
+
+def main():
+    parser = argparse.ArgumentParser(description="Pic mémoire du prétraitement par image")
+    parser.add_argument("folder", nargs="?", default=os.path.join("data", "inputs"))
+    parser.add_argument("--ocr", action="store_true",
+                        help="Vrai passage EasyOCR (sinon simulé)")
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.folder) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    ctx = multiprocessing.get_context("spawn")
+    totals = {mode: [] for mode in MODES}
+
+    print(f"{'Fichier':<28}{'Taille':>12}{'Liste (Mo)':>12}{'Flux (Mo)':>12}{'Gain':>8}")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for f in files:
+            path = os.path.join(args.folder, f)
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            peaks = {mode: pool.apply(_measure, (path, mode, args.ocr)) for mode in MODES}
+            if None in peaks.values():
+                print("Mesure du pic RSS non disponible sur ce système (Linux requis)")
+                return
+            for mode in MODES:
+                totals[mode].append(peaks[mode])
+            size = f"{img.shape[1]}x{img.shape[0]}"
+            print(f"{f:<28}{size:>12}{peaks['liste']:>12.1f}{peaks['flux']:>12.1f}"
+                  f"{peaks['liste'] / max(peaks['flux'], 1e-9):>7.2f}x")
+
+    if totals["liste"]:
+        mean = {mode: sum(v) / len(v) for mode, v in totals.items()}
+        print(f"\nMoyenne par image : {mean['liste']:.1f} Mo -> {mean['flux']:.1f} Mo "
+              f"({mean['liste'] / max(mean['flux'], 1e-9):.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/preprocessing.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Compare, image par image, le prétraitement historique (4 upscales x3
+    indépendants) avec le graphe à étapes partagées de src/preprocessing.py,
+    et (--threads N) avec ce graphe calculé en parallèle (PreprocessingExecutor).
+    Vérifie aussi que les sorties sont strictement identiques.
+
+    Usage : python -m benchmarks.preprocessing [dossier] [--repeat N] [--threads 4]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from src.preprocessing import get_processed_images, PreprocessingExecutor
+
+def _legacy_processed_images(img):
+    """Reproduction exacte de l'ancien get_processed_images (référence)"""
+    def upscale():
+        return cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+
+    def otsu(channel):
+        _, binary = cv2.threshold(channel, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if np.sum(binary == 0) > np.sum(binary == 255):
+            binary = cv2.bitwise_not(binary)
+        return binary
+
+    gray = cv2.cvtColor(upscale(), cv2.COLOR_BGR2GRAY)
+    gray = cv2.bitwise_not(cv2.fastNlMeansDenoising(gray, h=10))
+    adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, blockSize=31, C=10)
+
+    l_channel, _, _ = cv2.split(cv2.cvtColor(upscale(), cv2.COLOR_BGR2LAB))
+    lab = otsu(l_channel)
+
+    inverted = cv2.bitwise_not(cv2.cvtColor(upscale(), cv2.COLOR_BGR2GRAY))
+
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    clahe_img = otsu(clahe.apply(cv2.cvtColor(upscale(), cv2.COLOR_BGR2GRAY)))
+
+    return [("Adaptive", adaptive), ("LAB", lab), ("Inverted", inverted), ("CLAHE", clahe_img)]
+
+def _best_time(func, img, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func(img)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du prétraitement")
+    parser.add_argument("folder", nargs="?", default=os.path.join("data", "inputs"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Mesure aussi le graphe calculé en parallèle sur N threads")
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.folder) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    total_old, total_new, total_par = 0.0, 0.0, 0.0
+    executor = PreprocessingExecutor(args.threads) if args.threads > 0 else None
+    parallel = lambda img: get_processed_images(img, executor=executor)
+
+    print(f"{'Fichier':<28}{'Taille':>12}{'Ancien (s)':>12}{'Graphe (s)':>12}{'Gain':>8}"
+          + (f"{'Parallèle (s)':>15}{'Gain':>8}" if executor else "") + "  Identique")
+    for f in files:
+        img = cv2.imread(os.path.join(args.folder, f))
+        if img is None:
+            continue
+
+        t_old, out_old = _best_time(_legacy_processed_images, img, args.repeat)
+        t_new, out_new = _best_time(get_processed_images, img, args.repeat)
+        same = all(n1 == n2 and np.array_equal(a, b) for (n1, a), (n2, b) in zip(out_old, out_new))
+        columns = ""
+        if executor is not None:
+            t_par, out_par = _best_time(parallel, img, args.repeat)
+            same = same and all(np.array_equal(a, b) for (_, a), (_, b) in zip(out_new, out_par))
+            total_par += t_par
+            columns = f"{t_par:>15.3f}{t_new / t_par:>7.2f}x"
+
+        total_old += t_old
+        total_new += t_new
+        size = f"{img.shape[1]}x{img.shape[0]}"
+        print(f"{f:<28}{size:>12}{t_old:>12.3f}{t_new:>12.3f}{t_old / t_new:>7.2f}x{columns}"
+              f"  {'oui' if same else 'NON'}")
+
+    if files and total_new > 0:
+        print(f"\nTotal : {total_old:.2f}s -> {total_new:.2f}s ({total_old / total_new:.2f}x)")
+        if executor is not None:
+            print(f"Parallèle ({executor.workers} threads, OpenCV {executor.opencv_threads} "
+                  f"thread(s) chacun) : {total_par:.2f}s ({total_new / total_par:.2f}x vs graphe)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/synthetic.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Génère un jeu d'images synthétiques de claviers (src/synthetic.py) pour
+    les tests de charge et de non-régression : FORMAT-OS-LAYOUT-N.png +
+    synthetic.jsonl (paramètres de rendu et nombre de lettres par image, pour
+    relier la latence à la résolution, la rotation ou le nombre de lettres).
+    Même graine -> mêmes images, quel que soit le nombre de workers.
+
+    Usage : python -m benchmarks.synthetic data/synthetic --count 5000 --seed 42 --workers 4
+            python main.py --input data/synthetic --workers 4
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import time
+
+from src.synthetic import generate_dataset, DEFAULT_RANGES
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur de claviers synthétiques")
+    parser.add_argument("folder", help="Dossier de sortie")
+    parser.add_argument("--count", type=int, default=100, help="Nombre d'images (défaut 100)")
+    parser.add_argument("--seed", type=int, default=0, help="Graine (défaut 0)")
+    parser.add_argument("--start", type=int, default=0,
+                        help="Indice de la première image (pour compléter un jeu existant)")
+    parser.add_argument("--workers", type=int, default=1, help="Processus de rendu (défaut 1)")
+    parser.add_argument("--layouts", nargs="+", default=None,
+                        help="Layouts à générer (défaut : tous ceux du registre)")
+    parser.add_argument("--widths", type=str, default=",".join(map(str, DEFAULT_RANGES["widths"])),
+                        help="Largeurs possibles en px, ex: 800,1600,3200")
+    for key in ("max_rotation", "max_skew", "max_blur", "max_glare", "max_dropout",
+                "max_noise", "invert_prob", "number_row_prob"):
+        parser.add_argument("--" + key.replace("_", "-"), type=float, default=DEFAULT_RANGES[key],
+                            help=f"défaut {DEFAULT_RANGES[key]}")
+    args = parser.parse_args()
+
+    ranges = {key: getattr(args, key) for key in DEFAULT_RANGES if key != "widths"}
+    ranges["widths"] = tuple(int(w) for w in args.widths.split(","))
+
+    start = time.perf_counter()
+    letters = 0
+    for i, params in enumerate(generate_dataset(args.folder, args.count, args.seed, args.layouts,
+                                                args.workers, args.start, **ranges), 1):
+        letters += params["letters"]
+        if i % 100 == 0 or i == args.count:
+            elapsed = time.perf_counter() - start
+            print(f"[{i}/{args.count}] {params['name']:<28} ({i / elapsed:.1f} images/s)")
+
+    if args.count:
+        print(f"\n{args.count} images dans {args.folder} "
+              f"({letters / args.count:.1f} lettres/image en moyenne, graine {args.seed})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+--------------------------------------------------------------------------------
+File: benchmarks/tiling.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Compare, image par image, l'OCR des 4 variantes lues d'un bloc et par
+    tuiles (src/tiling.py) : latence, pic de mémoire (RSS au-dessus du niveau
+    après chargement du modèle et décodage), lettres trouvées et layout.
+    Chaque mesure tourne dans un processus neuf pour partir d'un pic propre.
+    Les gains apparaissent sur les grandes photos : une image plus petite
+    qu'une tuile est lue d'un bloc dans les deux modes.
+
+    Usage : python -m benchmarks.tiling [dossier] [--tile-size 1280] [--tile-overlap 192]
+                                        [--tile-workers 2] [--threads 4] [--scale 3]
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import cv2
+
+from src.instrumentation import reset_peak_rss, current_rss_mb, peak_rss_mb
+from src.tiling import DEFAULT_TILE_SIZE, DEFAULT_OVERLAP
+
+MODES = ("entier", "tuiles")
+
+def _measure(path, tiling_args, threads, scale):
+    """Exécuté dans un processus dédié : latence, pic RSS, lettres et layout d'une image"""
+    from src.engine import create_reader, run_ocr_pipeline, cluster_rows, score_layout
+    from src.preprocessing import iter_processed_images
+    from src.tiling import Tiling
+
+    reader = create_reader(threads=threads)
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    tiling = Tiling(*tiling_args) if tiling_args else None
+    baseline = current_rss_mb()
+    if not reset_peak_rss() or baseline is None:
+        return None
+
+    start = time.perf_counter()
+    chars = run_ocr_pipeline(reader, iter_processed_images(img, scale=scale), tiling=tiling,
+                             scale=scale)
+    seconds = time.perf_counter() - start
+    char_rows = cluster_rows(chars) if len(chars) >= 4 else None
+    return {"seconds": seconds, "peak_mb": peak_rss_mb() - baseline, "letters": len(chars),
+            "layout": score_layout(char_rows)[0] if char_rows else "Echec"}
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR par tuiles vs d'un bloc : latence et mémoire")
+    parser.add_argument("folder", nargs="?", default=os.path.join("data", "inputs"))
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--tile-overlap", type=int, default=DEFAULT_OVERLAP)
+    parser.add_argument("--tile-workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=None, help="Threads torch du lecteur")
+    parser.add_argument("--scale", type=float, default=3, help="Facteur du prétraitement (défaut 3)")
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.folder) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    tiling_args = (args.tile_size, args.tile_overlap, args.tile_workers)
+    ctx = multiprocessing.get_context("spawn")
+    totals = {mode: [] for mode in MODES}
+    same_layout = 0
+
+    print(f"Tuiles de {args.tile_size} px, chevauchement {args.tile_overlap} px, "
+          f"{args.tile_workers} en parallèle (échelle x{args.scale:g})\n")
+    print(f"{'Fichier':<28}{'Taille':>12}{'Entier s/Mo':>16}{'Tuiles s/Mo':>16}"
+          f"{'Lettres':>10}  Layout")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for f in files:
+            path = os.path.join(args.folder, f)
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            runs = {"entier": pool.apply(_measure, (path, None, args.threads, args.scale)),
+                    "tuiles": pool.apply(_measure, (path, tiling_args, args.threads, args.scale))}
+            if None in runs.values():
+                print("Mesure du pic RSS non disponible sur ce système (Linux requis)")
+                return
+            for mode in MODES:
+                totals[mode].append(runs[mode])
+            whole, tiled = runs["entier"], runs["tuiles"]
+            same_layout += whole["layout"] == tiled["layout"]
+            size = f"{img.shape[1]}x{img.shape[0]}"
+            print(f"{f:<28}{size:>12}"
+                  f"{whole['seconds']:>8.2f}/{whole['peak_mb']:<7.0f}"
+                  f"{tiled['seconds']:>8.2f}/{tiled['peak_mb']:<7.0f}"
+                  f"{whole['letters']:>5}/{tiled['letters']:<4}  "
+                  f"{whole['layout']} / {tiled['layout']}")
+
+    if totals["entier"]:
+        mean = {mode: {key: sum(run[key] for run in runs) / len(runs)
+                       for key in ("seconds", "peak_mb")} for mode, runs in totals.items()}
+        print(f"\nLatence moyenne : {mean['entier']['seconds']:.2f}s -> {mean['tuiles']['seconds']:.2f}s "
+              f"(x{mean['entier']['seconds'] / max(mean['tuiles']['seconds'], 1e-9):.2f})")
+        print(f"Pic mémoire moyen : {mean['entier']['peak_mb']:.0f} Mo -> {mean['tuiles']['peak_mb']:.0f} Mo")
+        print(f"Même layout : {same_layout}/{len(totals['entier'])} images")
+
+if __name__ == "__main__":
+    main()
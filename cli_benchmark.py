@@ -0,0 +1,296 @@
+"""
+--------------------------------------------------------------------------------
+File: cli_benchmark.py
+Authors:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Benchmark en ligne de commande (sans interface graphique, pour la CI).
+    Même vérité terrain que gui_benchmark.py (nom de fichier), mais mesure en plus
+    le temps de chaque étape : décodage, chaque noeud de prétraitement, chaque
+    passage OCR, clustering et scoring, ainsi que le pic de mémoire (RSS).
+    Résultats en JSON et/ou CSV ; le mode "compare" échoue (code 1) si la latence
+    ou la précision régresse au-delà d'un seuil par rapport à une baseline.
+
+    Exemples :
+        python cli_benchmark.py run --json bench.json --csv bench.csv
+        python cli_benchmark.py run --json new.json --baseline baseline.json
+        python cli_benchmark.py compare baseline.json new.json --latency-threshold 0.15
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import time
+
+from src.instrumentation import reset_peak_rss, peak_rss_mb
+
+# --- EXÉCUTION ---
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def benchmark_image(reader, path, ocr_mode="full", scale=3, min_chars=4, fusion="mean"):
+    """Analyse une image étape par étape et retourne un enregistrement de mesures"""
+    import cv2
+    from src.preprocessing import PreprocessingGraph, VARIANTS
+    from src.engine import ocr_passes, fuse_ocr_results, cluster_rows, score_layout, estimate_scale
+    from src.dataset import parse_expected_layout
+
+    class TimedGraph(PreprocessingGraph):
+        """Graphe de prétraitement qui chronomètre chaque noeud (temps propre)"""
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.timings = {}
+
+        def get(self, node):
+            if node not in self._cache:
+                parent, func = self.graph[node]
+                source = self.get(parent)
+                start = time.perf_counter()
+                self._cache[node] = func(source)
+                self.timings[f"pre_{node}"] = time.perf_counter() - start
+            return self._cache[node]
+
+    filename = os.path.basename(path)
+    stages = {}
+    reset_peak_rss()
+    start_total = time.perf_counter()
+
+    start = time.perf_counter()
+    img = cv2.imread(path)
+    stages["decode"] = time.perf_counter() - start
+
+    record = {"file": filename, "expected": parse_expected_layout(filename),
+              "detected": "Erreur", "confidence": 0, "n_chars": 0, "stages": stages}
+    if img is None:
+        record["total"] = time.perf_counter() - start_total
+        record["peak_rss_mb"] = peak_rss_mb()
+        record["success"] = False
+        return record
+
+    if scale == "auto":
+        start = time.perf_counter()
+        scale = estimate_scale(reader, img)
+        stages["scale_probe"] = time.perf_counter() - start
+    record["scale"] = scale
+
+    graph = TimedGraph(img, scale=scale)
+    passes = []
+    pre_seen = 0.0
+    last = time.perf_counter()
+    for name, results in ocr_passes(reader, graph.get, VARIANTS, ocr_mode, scale=scale):
+        now = time.perf_counter()
+        # Temps du passage = intervalle - prétraitement déclenché pendant cet intervalle
+        pre_total = sum(graph.timings.values())
+        stages[f"ocr_{name}"] = (now - last) - (pre_total - pre_seen)
+        pre_seen = pre_total
+        passes.append((name, results))
+        last = time.perf_counter()
+    stages.update(graph.timings)
+
+    start = time.perf_counter()
+    chars = fuse_ocr_results(passes, scale=scale, fusion=fusion)
+    stages["fusion"] = time.perf_counter() - start
+    record["n_chars"] = len(chars)
+
+    if len(chars) < min_chars:
+        record["detected"] = "Pas assez de lettres"
+    else:
+        start = time.perf_counter()
+        rows = cluster_rows(chars)
+        stages["cluster"] = time.perf_counter() - start
+        if not rows:
+            record["detected"] = "Echec Cluster"
+        else:
+            start = time.perf_counter()
+            record["detected"], record["confidence"], _ = score_layout(rows)
+            stages["score"] = time.perf_counter() - start
+
+    record["total"] = time.perf_counter() - start_total
+    record["peak_rss_mb"] = peak_rss_mb()
+    record["success"] = record["detected"] == record["expected"]
+    return record
+
+def summarize(records):
+    totals = [r["total"] for r in records]
+    stage_names = sorted({s for r in records for s in r["stages"]})
+    rss = [r["peak_rss_mb"] for r in records if r.get("peak_rss_mb") is not None]
+    return {
+        "images": len(records),
+        "accuracy": 100 * sum(r["success"] for r in records) / len(records) if records else 0,
+        "latency": {"mean": sum(totals) / len(totals) if totals else None,
+                    "p50": _percentile(totals, 50), "p95": _percentile(totals, 95)},
+        "stages_mean": {s: sum(r["stages"].get(s, 0) for r in records) / len(records)
+                        for s in stage_names},
+        "peak_rss_mb": max(rss) if rss else None,
+    }
+
+def run(args):
+    from src.engine import create_reader
+    from src.dataset import list_images
+
+    files = sorted(list_images(args.folder))
+    if args.limit:
+        files = files[:args.limit]
+    if not files:
+        print(f"❌ Aucune image trouvée dans {args.folder}")
+        return 1
+
+    print("Chargement du modèle EasyOCR...")
+    start = time.perf_counter()
+    reader = create_reader(threads=args.threads, accelerated=args.accelerated)
+    load_time = time.perf_counter() - start
+
+    scale = args.scale if args.scale == "auto" else float(args.scale)
+    records = []
+    for i, f in enumerate(files, 1):
+        record = benchmark_image(reader, os.path.join(args.folder, f), args.ocr_mode, scale,
+                                 fusion=args.fusion)
+        records.append(record)
+        icon = "✅" if record["success"] else "❌"
+        print(f"[{i}/{len(files)}] {icon} {f:<30} {record['detected']:<22} {record['total']:6.2f}s")
+
+    report = {
+        "config": {"folder": args.folder, "ocr_mode": args.ocr_mode, "scale": args.scale,
+                   "fusion": args.fusion,
+                   "threads": args.threads, "accelerated": args.accelerated,
+                   "python": platform.python_version(),
+                   "machine": platform.machine(), "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "model_load_s": load_time,
+        "summary": summarize(records),
+        "images": records,
+    }
+    _print_summary(report["summary"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.csv:
+        _write_csv(args.csv, records)
+    if args.baseline:
+        return compare_reports(_load(args.baseline), report, args.latency_threshold,
+                               args.accuracy_threshold)
+    return 0
+
+def _write_csv(path, records):
+    stage_names = sorted({s for r in records for s in r["stages"]})
+    fields = ["file", "expected", "detected", "success", "confidence", "n_chars",
+              "total", "peak_rss_mb"] + stage_names
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for r in records:
+            writer.writerow({**{k: r.get(k) for k in fields[:8]}, **r["stages"]})
+
+def _print_summary(summary):
+    lat = summary["latency"]
+    print("\n" + "=" * 30)
+    print(f"Images    : {summary['images']}")
+    print(f"Précision : {summary['accuracy']:.1f}%")
+    if lat["mean"] is not None:
+        print(f"Latence   : moyenne {lat['mean']:.2f}s, p50 {lat['p50']:.2f}s, p95 {lat['p95']:.2f}s")
+    if summary["peak_rss_mb"] is not None:
+        print(f"Pic RSS   : {summary['peak_rss_mb']:.0f} Mo")
+    print("Étapes (moyenne) :")
+    for stage, value in summary["stages_mean"].items():
+        print(f"   {stage:<18} {1000 * value:9.1f} ms")
+    print("=" * 30)
+
+# --- COMPARAISON ---
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare_reports(baseline, current, latency_threshold=0.10, accuracy_threshold=0.0,
+                    min_stage_seconds=0.005):
+    """
+    Compare deux rapports. Régression si :
+        - précision < baseline - accuracy_threshold (points de %)
+        - latence moyenne/p95 ou moyenne d'une étape > baseline x (1 + latency_threshold)
+    Les étapes de moins de `min_stage_seconds` dans la baseline sont ignorées (bruit).
+    Retourne 1 en cas de régression, 0 sinon.
+    """
+    base, cur = baseline["summary"], current["summary"]
+    failures = []
+
+    if cur["accuracy"] < base["accuracy"] - accuracy_threshold:
+        failures.append(f"précision {base['accuracy']:.1f}% -> {cur['accuracy']:.1f}%")
+
+    checks = [(f"latence {k}", base["latency"][k], cur["latency"][k]) for k in ("mean", "p95")]
+    checks += [(f"étape {s}", v, cur["stages_mean"].get(s)) for s, v in base["stages_mean"].items()
+               if v >= min_stage_seconds]
+
+    print(f"\n{'Mesure':<28}{'Baseline':>12}{'Actuel':>12}{'Écart':>9}")
+    print(f"{'précision (%)':<28}{base['accuracy']:>12.1f}{cur['accuracy']:>12.1f}"
+          f"{cur['accuracy'] - base['accuracy']:>+9.1f}")
+    for label, old, new in checks:
+        if old is None or new is None:
+            continue
+        delta = (new - old) / old if old else 0
+        flag = ""
+        if delta > latency_threshold:
+            flag = "  ❌"
+            failures.append(f"{label} {old:.3f}s -> {new:.3f}s ({delta:+.0%})")
+        print(f"{label:<28}{old:>12.3f}{new:>12.3f}{delta:>+9.0%}{flag}")
+
+    if failures:
+        print("\n❌ RÉGRESSION :")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("\n✅ Aucune régression")
+    return 0
+
+def compare(args):
+    return compare_reports(_load(args.baseline), _load(args.current),
+                           args.latency_threshold, args.accuracy_threshold)
+
+def main():
+    parser = argparse.ArgumentParser(description="KeyDetect - Benchmark headless")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_thresholds(p):
+        p.add_argument("--latency-threshold", type=float, default=0.10,
+                       help="Hausse de latence tolérée, en fraction (défaut 0.10 = +10%%)")
+        p.add_argument("--accuracy-threshold", type=float, default=0.0,
+                       help="Baisse de précision tolérée, en points de %% (défaut 0)")
+
+    p_run = sub.add_parser("run", help="Lance le benchmark")
+    p_run.add_argument("folder", nargs="?", default=os.path.join("data", "inputs"))
+    p_run.add_argument("--json", default=None, help="Rapport JSON complet")
+    p_run.add_argument("--csv", default=None, help="Mesures par image en CSV")
+    p_run.add_argument("--baseline", default=None, help="Rapport JSON de référence à comparer")
+    p_run.add_argument("--limit", type=int, default=None, help="Nombre max d'images")
+    p_run.add_argument("--ocr-mode", choices=("full", "detect_once"), default="full")
+    p_run.add_argument("--fusion", choices=("mean", "weighted"), default="mean",
+                       help="Fusion des variantes : moyenne simple (défaut), ou pondérée + rejet des doublons")
+    p_run.add_argument("--scale", default="3", help="Facteur d'échelle ou 'auto' (défaut 3)")
+    p_run.add_argument("--threads", type=int, default=None, help="Threads torch")
+    p_run.add_argument("--accelerated", action="store_true",
+                       help="Mode CPU accéléré du lecteur (int8 + inference_mode + chauffe)")
+    add_thresholds(p_run)
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Compare deux rapports JSON")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    add_thresholds(p_cmp)
+    p_cmp.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
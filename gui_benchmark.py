@@ -12,24 +12,156 @@ Description:
     Permet de lancer une analyse de masse (Benchmark) sur les images.
     Compare le layout détecté avec le nom du fichier (Vérité Terrain) 
     pour calculer un taux de précision (Accuracy) en temps réel.
+    Le tableau est virtualisé : seules les lignes visibles existent en widgets,
+    les résultats vivent dans un ResultStore et l'affichage est rafraîchi
+    à intervalle fixe (pas un callback par image).
 --------------------------------------------------------------------------------
 """
 
 import os
 import threading
 import time
-import cv2
-import easyocr
 import customtkinter as ctk
-from PIL import Image
+from tkinter import filedialog
 
-from src.preprocessing import get_processed_images
-from src.engine import run_ocr_pipeline, cluster_rows, score_layout
+from src.dataset import parse_expected_layout, open_source, DirectorySource
+from src.streaming import StreamingPipeline
+from src.engine import create_reader
+from src.results import ResultStore
 
 # Config du GUI
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# Rafraîchissement de l'affichage (stats + tableau) en millisecondes
+REFRESH_MS = 200
+ROW_HEIGHT = 28
+
+class VirtualTable(ctk.CTkFrame):
+    """
+    Tableau virtualisé : un nombre fixe de lignes de widgets (celles qui tiennent
+    à l'écran) dont on change seulement le texte selon la position de défilement.
+    Un clic sur un en-tête trie la vue (second clic = ordre inverse).
+    """
+    COLUMNS = [("file", "Fichier", 200), ("expected", "Attendu (Nom)", 100),
+               ("detected", "Détecté (Algo)", 100), ("confidence", "Confiance", 80),
+               ("success", "Résultat", 50)]
+
+    def __init__(self, master, store, **kwargs):
+        super().__init__(master, **kwargs)
+        self.store = store
+        self.offset = 0
+        self.filter_name = "all"
+        self.sort_key, self.reverse = "index", False
+        self.rows = []          # pool de lignes : liste de listes de CTkLabel
+        self._rendered = None   # dernier état affiché (évite les reconfigurations inutiles)
+        self._indices = []
+        self.visible = 0        # nombre de lignes affichées (dépend de la hauteur)
+
+        for i, (key, title, width) in enumerate(self.COLUMNS):
+            header = ctk.CTkButton(self, text=title, width=width, fg_color="transparent",
+                                   font=("Roboto", 14, "bold"),
+                                   command=lambda k=key: self.sort_by(k))
+            header.grid(row=0, column=i, padx=10, pady=5, sticky="w")
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=len(self.COLUMNS), rowspan=1000, sticky="ns")
+
+        self.bind("<Configure>", self._on_resize)
+        self.bind_all("<MouseWheel>", self._on_wheel)
+        self.bind_all("<Button-4>", lambda e: self.scroll(-3))
+        self.bind_all("<Button-5>", lambda e: self.scroll(3))
+
+    # --- Pool de lignes ---
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - 40) // ROW_HEIGHT)
+        while len(self.rows) < visible:
+            r = len(self.rows) + 1
+            labels = [ctk.CTkLabel(self, text="", width=width, anchor="w" if i == 0 else "center")
+                      for i, (_, _, width) in enumerate(self.COLUMNS)]
+            for c, lbl in enumerate(labels):
+                lbl.grid(row=r, column=c, padx=10, pady=2)
+            self.rows.append(labels)
+        for r, labels in enumerate(self.rows):
+            for lbl in labels:
+                if r < visible:
+                    lbl.grid()
+                else:
+                    lbl.grid_remove()
+        self.visible = visible
+        self._rendered = None
+        self.refresh()
+
+    # --- Défilement ---
+
+    def scroll(self, delta):
+        self.set_offset(self.offset + delta)
+
+    def set_offset(self, offset):
+        max_offset = max(0, len(self._indices) - self.visible)
+        offset = max(0, min(int(offset), max_offset))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.set_offset(float(args[1]) * len(self._indices))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    # --- Vue (filtre / tri) ---
+
+    def sort_by(self, key):
+        if self.sort_key == key:
+            self.reverse = not self.reverse
+        else:
+            self.sort_key, self.reverse = key, False
+        self.offset = 0
+        self.refresh()
+
+    def set_filter(self, filter_name):
+        self.filter_name = filter_name
+        self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Met à jour le texte des lignes visibles (aucune création de widget)"""
+        self._indices = self.store.view(self.filter_name, self.sort_key, self.reverse)
+        visible = self.visible
+        state = (self.store.version, self.filter_name, self.sort_key, self.reverse,
+                 self.offset, visible)
+        if state == self._rendered:
+            return
+        self._rendered = state
+
+        total = len(self._indices)
+        for r in range(visible):
+            labels = self.rows[r]
+            position = self.offset + r
+            if position >= total:
+                for lbl in labels:
+                    lbl.configure(text="")
+                continue
+            row = self.store.row(self._indices[position])
+            color_res = "#2CC985" if row["success"] else "#FF4444"
+            labels[0].configure(text=row["file"])
+            labels[1].configure(text=row["expected"], text_color="#AAA")
+            labels[2].configure(text=row["detected"], text_color=color_res,
+                                font=("Roboto", 12, "bold"))
+            labels[3].configure(text=f"{row['confidence']:.0f}%")
+            labels[4].configure(text="✅" if row["success"] else "❌")
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
 class BenchmarkApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -43,10 +175,9 @@ class BenchmarkApp(ctk.CTk):
         self.is_running = False
         self.ocr_reader = None
         
-        # Stats
-        self.total_processed = 0
-        self.success_count = 0
-        self.fail_count = 0
+        # Stats (le thread d'analyse écrit dans le store, l'UI le lit à chaque tick)
+        self.store = ResultStore()
+        self.total_files = 0
 
         # --- LAYOUT PRINCIPAL ---
         self.grid_columnconfigure(1, weight=1)
@@ -65,6 +196,12 @@ class BenchmarkApp(ctk.CTk):
         self.btn_run = ctk.CTkButton(self.sidebar, text="LANCER L'ANALYSE", command=self.start_benchmark, state="disabled", fg_color="#2CC985")
         self.btn_run.pack(pady=10, padx=20, fill="x")
 
+        # Source des images : dossier par défaut ou archive zip/tar (lue sans extraction)
+        self.btn_source = ctk.CTkButton(self.sidebar, text="Ouvrir une archive...", command=self.choose_archive)
+        self.btn_source.pack(pady=10, padx=20, fill="x")
+        self.lbl_source = ctk.CTkLabel(self.sidebar, text=os.path.basename(self.folder_path), font=("Roboto", 12))
+        self.lbl_source.pack(pady=2)
+
         # Section Stats
         ctk.CTkLabel(self.sidebar, text="--- STATISTIQUES ---", font=("Roboto", 16)).pack(pady=(30, 10))
         
@@ -84,17 +221,18 @@ class BenchmarkApp(ctk.CTk):
         self.progress_bar.pack(pady=10, padx=20, fill="x")
         self.progress_bar.set(0)
 
-        # 2. ZONE CENTRALE (Tableau des résultats)
-        self.result_frame = ctk.CTkScrollableFrame(self, label_text="Résultats en temps réel")
-        self.result_frame.grid(row=0, column=1, rowspan=2, padx=20, pady=20, sticky="nsew")
-        
-        # En-têtes du tableau
-        headers = ["Fichier", "Attendu (Nom)", "Détecté (Algo)", "Confiance", "Résultat"]
-        for i, h in enumerate(headers):
-            lbl = ctk.CTkLabel(self.result_frame, text=h, font=("Roboto", 14, "bold"))
-            lbl.grid(row=0, column=i, padx=10, pady=5, sticky="w")
-            
-        self.current_row = 1
+        # Filtre du tableau
+        self.filter_choice = ctk.CTkSegmentedButton(self.sidebar, values=["Tous", "Échecs", "Succès"],
+                                                    command=self.on_filter_change)
+        self.filter_choice.pack(pady=10, padx=20, fill="x")
+        self.filter_choice.set("Tous")
+
+        # 2. ZONE CENTRALE (Tableau des résultats, virtualisé)
+        self.result_table = VirtualTable(self, self.store)
+        self.result_table.grid(row=0, column=1, rowspan=2, padx=20, pady=20, sticky="nsew")
+
+        # Rafraîchissement périodique (stats, progression, tableau)
+        self.after(REFRESH_MS, self.refresh_ui)
 
     def load_model(self):
         """Charge EasyOCR dans un thread pour ne pas figer l'interface"""
@@ -102,7 +240,7 @@ class BenchmarkApp(ctk.CTk):
         
         def _load():
             print("Chargement EasyOCR...")
-            self.ocr_reader = easyocr.Reader(['en'], gpu=False)
+            self.ocr_reader = create_reader()  # torch/EasyOCR importés ici, pas au démarrage
             print("EasyOCR chargé !")
             # Mise à jour UI depuis le thread principal
             self.after(0, lambda: self.btn_load.configure(text="Modèle Chargé", fg_color="green"))
@@ -115,35 +253,24 @@ class BenchmarkApp(ctk.CTk):
         Extrait le layout attendu du nom de fichier.
         Convention: FORMAT-OS-LAYOUT-X.png (ex: ISO-WIN-AZERTY-1.png)
         """
-        try:
-            name_no_ext = os.path.splitext(filename)[0] # Enlève .png
-            parts = name_no_ext.split('-')
-            
-            # On cherche AZERTY, QWERTY ou QWERTZ dans les parties du nom
-            for part in parts:
-                p = part.upper()
-                if p in ["AZERTY", "QWERTY", "QWERTZ"]:
-                    return p
-            return "INCONNU"
-        except Exception:
-            return "ERREUR"
+        return parse_expected_layout(filename)
+
+    def choose_archive(self):
+        path = filedialog.askopenfilename(title="Archive d'images",
+                                          filetypes=[("Archives", "*.zip *.tar *.tar.gz *.tgz *.tar.bz2 *.tar.xz"),
+                                                     ("Tous les fichiers", "*.*")])
+        if path:
+            self.folder_path = path
+            self.lbl_source.configure(text=os.path.basename(path))
 
     def start_benchmark(self):
         if self.is_running: return
         self.is_running = True
         self.btn_run.configure(state="disabled", text="Analyse en cours...")
         
-        # Reset stats
-        self.total_processed = 0
-        self.success_count = 0
-        self.fail_count = 0
-        self.current_row = 1
-        
-        # Nettoyage tableau (sauf headers)
-        for widget in self.result_frame.winfo_children():
-            info = widget.grid_info()
-            if int(info['row']) > 0:
-                widget.destroy()
+        # Reset stats et tableau (le store est vidé, aucun widget détruit)
+        self.store.clear()
+        self.total_files = 0
 
         # Liste des fichiers
         if not os.path.exists(self.folder_path):
@@ -151,81 +278,58 @@ class BenchmarkApp(ctk.CTk):
             self.is_running = False
             return
 
-        files = [f for f in os.listdir(self.folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        try:
+            source = open_source(self.folder_path, extensions=('.png', '.jpg', '.jpeg'))
+        except ValueError as e:
+            print(e)
+            self.is_running = False
+            return
+        files = source.names()
         total_files = len(files)
+        self.total_files = total_files
 
         # Lancement du worker thread
-        threading.Thread(target=self.process_files, args=(files, total_files), daemon=True).start()
+        threading.Thread(target=self.process_files, args=(source, files, total_files), daemon=True).start()
+
+    def process_files(self, source, files, total_files):
+        # Pipeline en flux : décodage et prétraitement des images suivantes
+        # pendant l'OCR de l'image courante (résultats dans l'ordre de fin)
+        if isinstance(source, DirectorySource):
+            items = [os.path.join(self.folder_path, f) for f in files]
+        else:
+            items = iter(source)  # (nom, contenu) lus directement dans l'archive
+        pipeline = StreamingPipeline(self.ocr_reader, ordered=False, min_chars=4)
+        for result in pipeline.run(items):
+            filename = files[result["index"]]
 
-    def process_files(self, files, total_files):
-        for i, filename in enumerate(files):
-            file_path = os.path.join(self.folder_path, filename)
-            
             # 1. Détermination de la vérité terrain (Ground Truth)
             expected = self.parse_expected_layout(filename)
             
-            # 2. Analyse Algorithmique
-            img = cv2.imread(file_path)
-            detected_layout = "Erreur"
-            confidence = 0
-            
-            if img is not None:
-                # Pipeline complet
-                processed = get_processed_images(img)
-                chars = run_ocr_pipeline(self.ocr_reader, processed)
-                
-                # Check si assez de lettres
-                if len(chars) >= 4:
-                    rows = cluster_rows(chars)
-                    if rows:
-                        detected_layout, confidence, _ = score_layout(rows)
-                    else:
-                        detected_layout = "Echec Cluster"
-                else:
-                    detected_layout = "Pas assez de lettres"
-            
-            # 3. Comparaison
-            is_success = (expected == detected_layout)
-            
-            # 4. Mise à jour des stats et de l'UI
-            self.after(0, lambda f=filename, e=expected, d=detected_layout, c=confidence, s=is_success, idx=i, tot=total_files: 
-                       self.update_ui_row(f, e, d, c, s, idx, tot))
-            
-            # Petit délai pour laisser l'UI respirer
-            # time.sleep(0.1) 
+            # 2-3. Résultat de l'analyse algorithmique + comparaison (stockés, affichés au prochain tick)
+            self.store.add(filename, expected, result["layout"], result["confidence"])
 
-        self.after(0, lambda: self.btn_run.configure(state="normal", text="RELANCER L'ANALYSE"))
+        print(f"Débit : {pipeline.throughput():.2f} images/s")
         self.is_running = False
 
-    def update_ui_row(self, filename, expected, detected, confidence, is_success, index, total):
-        row = self.current_row
-        
-        # Update stats
-        self.total_processed += 1
-        if is_success: self.success_count += 1
-        else: self.fail_count += 1
-        
-        accuracy = (self.success_count / self.total_processed) * 100
-        
-        # Update Labels stats
-        self.lbl_total.configure(text=f"Total: {self.total_processed}/{total}")
-        self.lbl_success.configure(text=f"Succès: {self.success_count}")
-        self.lbl_fail.configure(text=f"Échecs: {self.fail_count}")
+    def on_filter_change(self, choice):
+        self.result_table.set_filter({"Tous": "all", "Échecs": "failures", "Succès": "successes"}[choice])
+
+    def refresh_ui(self):
+        """Tick d'affichage : stats, progression et lignes visibles, depuis le store"""
+        total_processed, success, fail, accuracy = self.store.counts()
+        total = self.total_files
+
+        self.lbl_total.configure(text=f"Total: {total_processed}/{total}")
+        self.lbl_success.configure(text=f"Succès: {success}")
+        self.lbl_fail.configure(text=f"Échecs: {fail}")
         self.lbl_accuracy.configure(text=f"Précision: {accuracy:.1f}%")
-        self.progress_bar.set((index + 1) / total)
+        self.progress_bar.set(total_processed / total if total else 0)
+        self.result_table.refresh()
 
-        # Couleurs
-        color_res = "#2CC985" if is_success else "#FF4444"
-        icon = "✅" if is_success else "❌"
-        
-        # Affichage Ligne Tableau
-        ctk.CTkLabel(self.result_frame, text=filename, width=200, anchor="w").grid(row=row, column=0, padx=10, pady=2)
-        ctk.CTkLabel(self.result_frame, text=expected, width=100, text_color="#AAA").grid(row=row, column=1, padx=10, pady=2)
-        ctk.CTkLabel(self.result_frame, text=detected, width=100, text_color=color_res, font=("Roboto", 12, "bold")).grid(row=row, column=2, padx=10, pady=2)
-        ctk.CTkLabel(self.result_frame, text=f"{confidence:.0f}%", width=80).grid(row=row, column=3, padx=10, pady=2)
-        ctk.CTkLabel(self.result_frame, text=icon, width=50).grid(row=row, column=4, padx=10, pady=2)
-
-        self.current_row += 1
+        if not self.is_running and self.btn_run.cget("state") == "disabled" and self.ocr_reader is not None:
+            self.btn_run.configure(state="normal", text="RELANCER L'ANALYSE")
+
+        self.after(REFRESH_MS, self.refresh_ui)
 
 if __name__ == "__main__":
     app = BenchmarkApp()
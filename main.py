@@ -9,46 +9,56 @@ Authors:
     
 Description: 
     Point d'entrée CLI du projet.
-    Parcourt le dossier data/inputs et analyse chaque image pour déterminer
-    le layout du clavier. Affiche les détails du clustering et du scoring
-    dans la console.
+    Parcourt le dossier data/inputs (ou un autre dossier / une archive zip-tar
+    avec --input) et analyse chaque image pour déterminer le layout du clavier.
+    Affiche les détails du clustering et du scoring dans la console.
 --------------------------------------------------------------------------------
 """
 
-import cv2
-import easyocr
+import argparse
+import json
 import os
+import platform
 import sys
+import time
 
-from src.preprocessing import get_processed_images
-from src.engine import run_ocr_pipeline, cluster_rows, score_layout
+from src.engine import LazyReader
+from src.pipeline import detect_layout_encoded
+from src.batch import run_batch
+from src.cache import OcrCache
+from src.instrumentation import MemorySink, JsonlSink, MultiSink, set_sink
+from src.streaming import StreamingPipeline
+from src.dataset import watch_directory, open_source, DirectorySource, TarSource
+from src.preprocessing import PreprocessingExecutor
+from src.tiling import Tiling, DEFAULT_TILE_SIZE, DEFAULT_OVERLAP
+from src.shards import parse_shard, shard_of, write_manifest, ShardRun, merge_results
+from src.video import VideoLayoutDetector, open_capture
 
-def analyze_image(image_path, reader):
-    print(f"\n--- Analyse de : {os.path.basename(image_path)} ---")
+def analyze_image(name, data, reader, cascade=False, **options):
+    print(f"\n--- Analyse de : {os.path.basename(name)} ---")
     
-    # 1. Chargement
-    img = cv2.imread(image_path)
-    if img is None:
-        print(f"❌ Erreur: Impossible de lire l'image à {image_path}")
+    # 1-5. Décodage en mémoire, Prétraitement (4 versions, paresseux en mode cascade),
+    # OCR, Clustering, Scoring
+    print("OCR en cours..." + (" (cascade)" if cascade else ""))
+    result = detect_layout_encoded(reader, data, min_chars=5, cascade=cascade, **options)
+    if result is None:
+        print(f"❌ Erreur: Impossible de lire l'image à {name}")
         return
+    reduction = f", décodage réduit /{result['decode_reduction']}" if result["decode_reduction"] > 1 else ""
+    print(f"Passages OCR : {result['passes']} (échelle x{result['scale']:g}{reduction})")
+    if "budget" in result:
+        print(f"Budget : {result['elapsed']:.2f}s / {result['budget']:g}s"
+              + (" -> résultat partiel" if result["partial"] else ""))
+        for variant, fallback in result["degraded"].items():
+            print(f"   {variant} remplacée par {fallback}")
+        if result["skipped"]:
+            print(f"   Variantes sautées : {', '.join(result['skipped'])}")
 
-    # 2. Prétraitement (3 versions)
-    processed = get_processed_images(img)
-    print("Prétraitement terminé")
-
-    # 3. OCR (Extraction des lettres et positions Y)
-    print("OCR en cours...")
-    validated_chars = run_ocr_pipeline(reader, processed)
-    
-    detected_list = list(validated_chars.keys())
-    #print(f"Lettres détectées ({len(detected_list)}) : {sorted(detected_list)}")
-
-    if len(detected_list) < 5:
+    if result["layout"] == "Pas assez de lettres":
         print("Pas assez de lettres pour déterminer le layout.")
-        return
+        return result
 
-    # 4. Clustering (Détermination des rangées Haut/Milieu/Bas)
-    char_rows = cluster_rows(validated_chars)
+    char_rows = result["rows"]
     if char_rows:
         # Petit affichage debug des rangées trouvées
         rows_debug = {0: [], 1: [], 2: []}
@@ -60,37 +70,361 @@ def analyze_image(image_path, reader):
         #print(f"   📐 Rangée Bas    : {sorted(rows_debug[2])}")
     else:
         print("❌ Echec du clustering des rangées.")
-        return
+        return result
 
-    # 5. Scoring & Résultat
-    best_layout, confidence, details = score_layout(char_rows)
-    
+    # Résultat
     print("\n" + "="*30)
-    print(f"RÉSULTAT : {best_layout}")
-    print(f"Confiance : {confidence:.1f}%")
+    print(f"RÉSULTAT : {result['layout']}")
+    print(f"Confiance : {result['confidence']:.1f}%")
     print("="*30)
+    return result
+
+def run_batch_mode(paths, workers, threads, options, sink=None):
+    """Analyse multi-processus : affiche les résultats au fil de l'eau et le débit"""
+    print(f"\n=== Batch : {len(paths)} images, {workers} worker(s), {threads} thread(s)/worker ===")
+    start = time.perf_counter()
+    first_done = None
+    for i, result in enumerate(run_batch(paths, workers, threads=threads, sink=sink, **options), 1):
+        if first_done is None:
+            first_done = time.perf_counter()
+        print(f"[{i}/{len(paths)}] {result['file']:<30} {result['layout']:<22} "
+              f"{result['confidence']:5.1f}%  {result['seconds']:6.2f}s  (pid {result['pid']})"
+              + ("  [partiel]" if result.get("partial") else ""))
+
+    wall = time.perf_counter() - start
+    print(f"Durée totale : {wall:.2f}s -> {len(paths) / wall:.2f} images/s (chargement des modèles inclus)")
+    if len(paths) > 1 and first_done is not None:
+        steady = time.perf_counter() - first_done
+        if steady > 0:
+            print(f"Régime établi : {(len(paths) - 1) / steady:.2f} images/s")
+    return wall
+
+def run_shard_mode(source, data_folder, files, shard, shard_dir, workers, threads, options, sink=None):
+    """Un shard d'une analyse répartie (résultats dans shard_dir, reprise automatique)"""
+    index, count = parse_shard(shard)
+    write_manifest(shard_dir, data_folder, files, count)
+    run = ShardRun(shard_dir, index, count)
+    run.resume()
+    todo = run.pending(files)
+    run.total = sum(shard_of(name, count) == index for name in files)
+    print(f"\n=== Shard {index}/{count} : {run.total} images, {run.total - len(todo)} déjà analysées, "
+          f"{len(todo)} à faire -> {run.results_path} ===")
+    if not todo:
+        return
+
+    # Résultat d'un worker ("source" = chemin ou nom reçu) -> nom du manifest
+    if isinstance(source, DirectorySource):
+        names = {os.path.join(data_folder, name): name for name in todo}
+        items = list(names)
+    else:
+        names = {name: name for name in todo}
+        if isinstance(source, TarSource):
+            # Un seul passage séquentiel dans l'archive (accès direct coûteux)
+            items = ((name, data) for name, data in source if name in names)
+        else:
+            items = ((name, source.read(name)) for name in todo)
+
+    host = platform.node()
+    try:
+        for i, result in enumerate(run_batch(items, max(1, workers), threads=threads,
+                                             sink=sink, **options), 1):
+            run.append({"name": names[result["source"]], "layout": result["layout"],
+                        "confidence": result["confidence"], "passes": result.get("passes", 0),
+                        "partial": result.get("partial", False),
+                        "seconds": result["seconds"], "shard": index, "host": host,
+                        "pid": result["pid"]})
+            print(f"[{i}/{len(todo)}] {result['file']:<30} {result['layout']:<22} "
+                  f"{result['confidence']:5.1f}%  {result['seconds']:6.2f}s")
+    except KeyboardInterrupt:
+        print("\nInterrompu : relancer la même commande pour reprendre.")
+    finally:
+        run.close()
+
+def run_merge_mode(shard_dir, report_path=None):
+    """Rapport combiné (précision + latence) de tous les shards d'un dossier"""
+    report = merge_results(shard_dir)
+    summary, lat = report["summary"], report["summary"]["latency"]
+    print(f"\n=== Fusion de {len(report['shards'])} fichier(s) de shard ({shard_dir}) ===")
+    for shard, n in report["shards"].items():
+        print(f"   {shard:<24} {n:>6} images")
+    print(f"Images    : {summary['images']}" + (f" ({len(report['missing'])} manquantes)"
+                                                 if report["missing"] else ""))
+    print(f"Précision : {summary['accuracy']:.1f}%")
+    for layout, stats in sorted(report["by_layout"].items()):
+        print(f"   {layout:<10} {stats['success']:>5}/{stats['images']:<5} "
+              f"{100 * stats['success'] / stats['images']:5.1f}%")
+    if lat["mean"] is not None:
+        print(f"Latence   : moyenne {lat['mean']:.2f}s, p50 {lat['p50']:.2f}s, p95 {lat['p95']:.2f}s")
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1, ensure_ascii=False)
+        print(f"Rapport écrit dans {report_path} (comparable avec cli_benchmark.py compare)")
+    return report
+
+def run_stream_mode(reader, source, total, stream_options, options):
+    """Analyse en flux (décodage / prétraitement / OCR en parallèle) avec débit final"""
+    pipeline = StreamingPipeline(reader, **stream_options, **options)
+    label = f"/{total}" if total else ""
+    try:
+        for i, result in enumerate(pipeline.run(source), 1):
+            print(f"[{i}{label}] {result['file']:<30} {result['layout']:<22} "
+                  f"{result['confidence']:5.1f}%  ({pipeline.throughput():.2f} images/s)")
+    except KeyboardInterrupt:
+        print("\nArrêt demandé.")
+    stats = pipeline.stats()
+    occupation = ", ".join(f"{stage} {100 * u:.0f}%" for stage, u in stats["utilization"].items())
+    print(f"\nFlux : {stats['images']} images en {stats['seconds']:.2f}s -> "
+          f"{stats['images_per_s']:.2f} images/s (occupation : {occupation})")
+
+def run_video_mode(reader, source, video_options):
+    """Flux vidéo : affiche chaque re-score puis le temps jusqu'à la décision"""
+    detector = VideoLayoutDetector(reader, **video_options)
+    print(f"\n=== Flux vidéo : {source} (1 image sur {detector.sample_every}) ===")
+    try:
+        capture = open_capture(source)
+    except IOError as e:
+        print(f"❌ {e}")
+        return None
+
+    result = None
+    try:
+        for update in detector.updates(capture):
+            print(f"[image {update['frames_read']:>5}] {len(update['chars']):>2} lettres -> "
+                  f"{update['layout']:<22} {update['confidence']:5.1f}%"
+                  + ("  (stable)" if update["stable"] else ""))
+            result = update
+    except KeyboardInterrupt:
+        print("\nArrêt demandé.")
+    finally:
+        capture.release()
+
+    print(f"\nImages lues : {detector.frames_read}, analysées : {detector.frames_processed} "
+          f"({detector.passes} passages OCR)")
+    if result is not None and result["stable"]:
+        print(f"RÉSULTAT : {result['layout']} ({result['confidence']:.1f}%) "
+              f"en {result['elapsed']:.2f}s")
+    else:
+        print("Pas de décision stable sur ce flux.")
+    return result
+
+def print_cache_stats(cache):
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache OCR : {stats['hits']} hits / {stats['misses']} misses, "
+              f"{stats['entries']} entrées ({stats['bytes'] / 1e6:.1f} Mo), "
+              f"{stats['evictions']} évictions")
 
 if __name__ == "__main__":
-    # Initialisation unique du lecteur
-    print("Chargement du modèle EasyOCR...")
-    reader = easyocr.Reader(['en'], gpu=False) 
-    
-    # CHEMIN : data/inputs
+    parser = argparse.ArgumentParser(description="KeyDetect - Détection du layout clavier")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Arrêt anticipé dès que le layout est sûr (moins de passages OCR)")
+    parser.add_argument("--min-confidence", type=float, default=100,
+                        help="Cascade : confiance minimale pour s'arrêter (défaut 100)")
+    parser.add_argument("--min-letters", type=int, default=8,
+                        help="Cascade : nombre minimal de lettres pour s'arrêter (défaut 8)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Temps maximal par image en secondes : échelle, variantes et débruitage "
+                             "choisis d'après les coûts mesurés, résultat partiel si besoin")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Mode batch : nombre de processus (0 = analyse séquentielle détaillée)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Mode batch : threads torch/OpenCV par worker (défaut 1)")
+    parser.add_argument("--accelerated", action="store_true",
+                        help="Mode CPU accéléré du lecteur : int8 + inference_mode + threads fixés + chauffe")
+    parser.add_argument("--shard", type=str, default=None,
+                        help="Analyse répartie : shard i/N de la liste (ex: 0/4), reprise automatique")
+    parser.add_argument("--shard-dir", type=str, default=os.path.join("data", "shards"),
+                        help="Dossier partagé des résultats de shards (défaut data/shards)")
+    parser.add_argument("--merge", type=str, default=None,
+                        help="Combine les résultats des shards de ce dossier (précision + latence)")
+    parser.add_argument("--report", type=str, default=None,
+                        help="Mode --merge : écrit le rapport combiné en JSON")
+    parser.add_argument("--scaling", type=str, default=None,
+                        help="Mesure le débit pour plusieurs nombres de workers, ex: 1,2,4,8")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="Fichier de cache OCR (SQLite) : re-scorer sans relancer l'OCR")
+    parser.add_argument("--cache-size", type=int, default=512,
+                        help="Taille maximale du cache OCR en Mo (éviction LRU, défaut 512)")
+    parser.add_argument("--scale", type=str, default="3",
+                        help="Facteur d'échelle du prétraitement, ou 'auto' pour l'adapter "
+                             "à la taille des lettres (défaut 3)")
+    parser.add_argument("--target-height", type=int, default=48,
+                        help="Mode --scale auto : hauteur visée des lettres en px (défaut 48)")
+    parser.add_argument("--fusion", choices=("mean", "weighted"), default="mean",
+                        help="Fusion des Y des variantes : moyenne simple (défaut), ou pondérée "
+                             "par la confiance avec rejet des doublons aberrants")
+    parser.add_argument("--variant-threads", type=int, default=0,
+                        help="Prétraite les 4 variantes d'une image en parallèle sur N threads, "
+                             "OCR de chacune dès qu'elle est prête (0 = séquentiel)")
+    parser.add_argument("--tiles", action="store_true",
+                        help="OCR par tuiles qui se chevauchent (très grandes photos), lues en parallèle")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE,
+                        help=f"Mode --tiles : côté d'une tuile en px de l'image agrandie (défaut {DEFAULT_TILE_SIZE})")
+    parser.add_argument("--tile-overlap", type=int, default=DEFAULT_OVERLAP,
+                        help=f"Mode --tiles : chevauchement en px, plus grand qu'une lettre (défaut {DEFAULT_OVERLAP})")
+    parser.add_argument("--tile-workers", type=int, default=2,
+                        help="Mode --tiles : tuiles lues en parallèle (défaut 2)")
+    parser.add_argument("--input", type=str, default=None,
+                        help="Dossier ou archive zip/tar d'images (défaut data/inputs), lue sans extraction")
+    parser.add_argument("--reduced-decode", action="store_true",
+                        help="Décode à résolution réduite quand l'échelle le permet (scale < 1 ou auto)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Analyse en flux : décodage, prétraitement et OCR en parallèle")
+    parser.add_argument("--watch", action="store_true",
+                        help="Mode flux : surveille data/inputs et analyse les nouvelles images (Ctrl+C pour arrêter)")
+    parser.add_argument("--queue-depth", type=int, default=4,
+                        help="Mode flux : taille des files entre étapes (défaut 4)")
+    parser.add_argument("--decode-workers", type=int, default=2,
+                        help="Mode flux : threads de décodage (défaut 2)")
+    parser.add_argument("--preprocess-workers", type=int, default=2,
+                        help="Mode flux : threads de prétraitement (défaut 2)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="Mode flux : résultats dans l'ordre de fin de traitement")
+    parser.add_argument("--video", type=str, default=None,
+                        help="Analyse un flux vidéo : fichier, URL ou index de webcam (ex: 0)")
+    parser.add_argument("--sample-every", type=int, default=5,
+                        help="Mode vidéo : OCR d'une image sur N (défaut 5)")
+    parser.add_argument("--stable-updates", type=int, default=2,
+                        help="Mode vidéo : re-scores identiques consécutifs pour conclure (défaut 2)")
+    parser.add_argument("--max-frames", type=int, default=None,
+                        help="Mode vidéo : nombre maximal d'images lues")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Écrit les spans/compteurs d'instrumentation dans ce fichier JSONL")
+    parser.add_argument("--metrics", type=str, default=None,
+                        help="Écrit les métriques agrégées au format texte Prometheus "
+                             "(mode séquentiel) et affiche le résumé")
+    args = parser.parse_args()
+    cache = OcrCache(args.cache, max_bytes=args.cache_size * 1024 * 1024) if args.cache else None
+    try:
+        tiling = Tiling(args.tile_size, args.tile_overlap, args.tile_workers) if args.tiles else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit()
+    options = {"cascade": args.cascade, "min_confidence": args.min_confidence,
+               "min_letters": args.min_letters, "cache": cache, "budget": args.budget,
+               "tiling": tiling, "fusion": args.fusion,
+               "executor": PreprocessingExecutor(args.variant_threads) if args.variant_threads > 0 else None,
+               "scale": args.scale if args.scale == "auto" else float(args.scale),
+               "target_height": args.target_height}
+    reader_options = {"accelerated": args.accelerated}
+
+    if args.video is not None:
+        print("Chargement du modèle EasyOCR (en arrière-plan)...")
+        video_options = {"sample_every": args.sample_every, "stable_updates": args.stable_updates,
+                         "max_frames": args.max_frames, "min_confidence": args.min_confidence,
+                         "min_letters": args.min_letters, "scale": options["scale"],
+                         "target_height": args.target_height}
+        run_video_mode(LazyReader(**reader_options), args.video, video_options)
+        sys.exit()
+
+    if args.merge:
+        if not os.path.isdir(args.merge):
+            print(f"❌ Le dossier n'existe pas : {args.merge}")
+        else:
+            run_merge_mode(args.merge, args.report)
+        sys.exit()
+
+    # CHEMIN : data/inputs (ou --input : dossier / archive)
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    data_folder = os.path.join(current_dir, "data", "inputs")
+    data_folder = args.input or os.path.join(current_dir, "data", "inputs")
     
     if not os.path.exists(data_folder):
         print(f"❌ Le dossier n'existe pas : {data_folder}")
         print("Veuillez créer 'data/inputs' et y mettre vos images.")
         sys.exit()
 
-    # On ne prend que les images
-    extensions_valides = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
-    files = [f for f in os.listdir(data_folder) if f.lower().endswith(extensions_valides)]
+    # On ne prend que les images (lues directement dans l'archive si besoin)
+    try:
+        source = open_source(data_folder)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit()
+    files = source.names()
     
-    if not files:
+    if not files and not args.watch:
         print(f"❌ Aucune image trouvée dans {data_folder}")
-    
-    for f in files:
-        path = os.path.join(data_folder, f)
-        analyze_image(path, reader)
\ No newline at end of file
+        sys.exit()
+    if args.watch and not isinstance(source, DirectorySource):
+        print("❌ --watch nécessite un dossier (pas une archive)")
+        sys.exit()
+
+    if isinstance(source, DirectorySource):
+        # Dossier : les workers / étapes de décodage lisent eux-mêmes les fichiers
+        paths = [os.path.join(data_folder, f) for f in files]
+    else:
+        # Archive : lue une seule fois, par le processus principal, au fil de l'eau
+        paths = None
+    decode_options = {"reduced_decode": args.reduced_decode}
+
+    # Instrumentation : JSONL partagé par les workers, agrégation mémoire en séquentiel
+    trace_sink = JsonlSink(args.trace) if args.trace else None
+    memory_sink = MemorySink() if args.metrics else None
+
+    if (args.scaling or args.workers > 0) and paths is None and not args.shard:
+        paths = list(source)  # (nom, contenu encodé) envoyés aux workers
+
+    if args.shard:
+        try:
+            run_shard_mode(source, data_folder, files, args.shard, args.shard_dir, args.workers,
+                           args.threads, dict(options, **decode_options, **reader_options), trace_sink)
+        except ValueError as e:
+            print(f"❌ {e}")
+        print_cache_stats(cache)
+        sys.exit()
+
+    if args.scaling:
+        counts = [int(n) for n in args.scaling.split(",")]
+        timings = {n: run_batch_mode(paths, n, args.threads, dict(options, **decode_options, **reader_options), trace_sink)
+                   for n in counts}
+        print("\n=== Scalabilité ===")
+        for n, wall in timings.items():
+            print(f"{n:>3} worker(s) : {len(paths) / wall:6.2f} images/s  "
+                  f"(x{timings[counts[0]] / wall:.2f})")
+        print_cache_stats(cache)
+        sys.exit()
+
+    if args.workers > 0:
+        run_batch_mode(paths, args.workers, args.threads, dict(options, **decode_options, **reader_options), trace_sink)
+        print_cache_stats(cache)
+        sys.exit()
+
+    sinks = [s for s in (trace_sink, memory_sink) if s is not None]
+    if sinks:
+        set_sink(sinks[0] if len(sinks) == 1 else MultiSink(*sinks))
+
+    # Initialisation unique du lecteur, en arrière-plan pendant le décodage et le
+    # prétraitement des premières images. Avec le cache OCR, chargé seulement si
+    # une variante n'y est pas (un re-scoring complet ne charge jamais le modèle).
+    print("Chargement du modèle EasyOCR" + (" (à la demande)..." if cache is not None
+                                           else " (en arrière-plan)..."))
+    reader = LazyReader(background=cache is None, **reader_options)
+
+    if args.stream or args.watch:
+        stream_options = {"queue_depth": args.queue_depth, "decode_workers": args.decode_workers,
+                          "preprocess_workers": args.preprocess_workers,
+                          "ordered": not args.unordered}
+        if args.watch:
+            print(f"Surveillance de {data_folder} (Ctrl+C pour arrêter)...")
+            source, total = watch_directory(data_folder), None
+        else:
+            source, total = (paths if paths is not None else iter(source)), len(files)
+        run_stream_mode(reader, source, total, dict(stream_options, **decode_options), options)
+        print_cache_stats(cache)
+        sys.exit()
+
+    total_passes = 0
+    analysed = 0
+    for name, data in source:
+        result = analyze_image(name, data, reader, **options, **decode_options)
+        if result:
+            total_passes += result["passes"]
+            analysed += 1
+
+    if analysed:
+        print(f"\nPassages OCR moyens par image : {total_passes / analysed:.2f}")
+    print_cache_stats(cache)
+
+    if memory_sink is not None:
+        print("\n" + memory_sink.summary())
+        memory_sink.write_prometheus(args.metrics)
+        print(f"Métriques écrites dans {args.metrics}")
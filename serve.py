@@ -0,0 +1,54 @@
+"""
+--------------------------------------------------------------------------------
+File: serve.py
+Authors:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Lance le service de détection (src/service.py) : le modèle EasyOCR reste
+    chargé en mémoire et répond aux requêtes en HTTP local ou sur socket Unix.
+
+    Exemple :
+        python serve.py --port 8765
+        curl --data-binary @data/inputs/ISO-WIN-AZERTY-1.png http://127.0.0.1:8765/detect
+        curl http://127.0.0.1:8765/stats
+--------------------------------------------------------------------------------
+"""
+
+import argparse
+
+from src.engine import create_reader
+from src.service import DetectionService, make_server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KeyDetect - Service de détection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Chemin d'un socket Unix (remplace host/port)")
+    parser.add_argument("--window-ms", type=float, default=20,
+                        help="Fenêtre de regroupement des requêtes en ms (défaut 20)")
+    parser.add_argument("--max-batch", type=int, default=8, help="Images max par batch (défaut 8)")
+    parser.add_argument("--max-queue", type=int, default=32,
+                        help="Requêtes max en attente avant de répondre 503 (défaut 32)")
+    parser.add_argument("--threads", type=int, default=None, help="Threads torch")
+    parser.add_argument("--accelerated", action="store_true",
+                        help="Mode CPU accéléré du lecteur (int8 + inference_mode + chauffe)")
+    args = parser.parse_args()
+
+    print("Chargement du modèle EasyOCR...")
+    reader = create_reader(threads=args.threads, accelerated=args.accelerated)
+
+    service = DetectionService(reader, batch_window=args.window_ms / 1000,
+                               max_batch=args.max_batch, max_queue=args.max_queue).start()
+    server = make_server(service, args.host, args.port, unix_socket=args.unix)
+    print(f"Service prêt sur {args.unix or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
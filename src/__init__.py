@@ -1,2 +1,10 @@
-from . import preprocessing
-from . import engine
\ No newline at end of file
+import importlib
+
+# Sous-modules importés à la demande (src.engine tire torch + EasyOCR :
+# plusieurs secondes qu'un simple `import src` ne doit pas payer)
+_SUBMODULES = ("preprocessing", "engine")
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,97 @@
+"""
+--------------------------------------------------------------------------------
+File: src/batch.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Analyse de masse multi-processus.
+    Chaque worker charge son lecteur EasyOCR une seule fois (initializer du Pool)
+    puis traite les images qu'on lui envoie. Les résultats remontent dans
+    l'ordre de fin de traitement, avec le temps passé par image.
+    Une image est soit un chemin, soit (nom, contenu encodé) pour un membre
+    d'archive lu par le processus principal.
+--------------------------------------------------------------------------------
+"""
+
+import multiprocessing
+import os
+import time
+
+import cv2
+
+from src.engine import LazyReader
+from src.pipeline import detect_layout_encoded
+from src.instrumentation import set_sink
+
+# État propre à chaque processus worker
+_worker_reader = None
+_worker_options = {}
+
+def _init_worker(threads, options, sink=None, accelerated=False):
+    global _worker_reader, _worker_options
+    set_sink(sink)
+    # Limite OpenCV et torch pour éviter la sur-souscription des coeurs
+    if threads:
+        cv2.setNumThreads(threads)
+    # Chargé en arrière-plan : la première image est décodée pendant ce temps
+    _worker_reader = LazyReader(threads=threads, accelerated=accelerated)
+    _worker_options = options
+
+def analyze_encoded(name, data, reader, **options):
+    """
+    Décode (en mémoire) et analyse une image, retourne le dict de detect_layout
+    enrichi de "file", "source" (nom ou chemin tel que reçu) et "seconds".
+    Options : celles de detect_layout_encoded.
+    """
+    start = time.perf_counter()
+    result = detect_layout_encoded(reader, data, **options) if data else None
+    if result is None:
+        result = {"layout": "Erreur", "confidence": 0, "scores": {}, "chars": {},
+                  "rows": None, "passes": 0}
+
+    result["file"] = os.path.basename(name)
+    result["source"] = name
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def analyze_path(path, reader, **options):
+    """Charge et analyse une image depuis un chemin"""
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        data = None
+    result = analyze_encoded(path, data, reader, **options)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def analyze_item(item, reader, **options):
+    """item : chemin, ou tuple (nom, contenu encodé)"""
+    if isinstance(item, str):
+        return analyze_path(item, reader, **options)
+    name, data = item
+    return analyze_encoded(name, data, reader, **options)
+
+def _worker_analyze(item):
+    result = analyze_item(item, _worker_reader, **_worker_options)
+    result["pid"] = os.getpid()
+    return result
+
+def run_batch(paths, workers, threads=1, sink=None, accelerated=False, **options):
+    """
+    Générateur : analyse `paths` (chemins ou tuples (nom, contenu encodé),
+    ex: une source de src.dataset) sur un pool de `workers` processus
+    (threads torch/OpenCV par worker = `threads`) et produit les résultats
+    dans l'ordre où ils se terminent.
+    sink : sink d'instrumentation installé dans chaque worker (ex: JsonlSink partagé).
+    accelerated : lecteurs en mode CPU accéléré (voir create_reader).
+    """
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                              initargs=(threads, options, sink, accelerated)) as pool:
+        for result in pool.imap_unordered(_worker_analyze, paths, chunksize=1):
+            yield result
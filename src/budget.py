@@ -0,0 +1,259 @@
+"""
+--------------------------------------------------------------------------------
+File: src/budget.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Mode budget : l'appelant donne un temps maximal par image (en secondes).
+    Un modèle de coût (CostModel) apprend en cours d'exécution le coût de
+    chaque étape, en secondes par mégapixel de l'image agrandie :
+        - chaque noeud du prétraitement (upscale, gris, débruitage d'Adaptive...) ;
+        - le passage OCR de chaque variante ("ocr.<variante>") ;
+    ainsi que le nombre de lettres qu'apporte chaque variante.
+    À partir de ces estimations, le planificateur choisit :
+        - le facteur d'échelle (le plus grand qui laisse passer au moins
+          deux variantes dans le budget) ;
+        - l'ordre des variantes (lettres attendues par seconde) ;
+        - s'il peut se permettre le débruitage d'Adaptive, sinon AdaptiveFast
+          (même seuillage sans débruitage), sinon rien.
+    Une variante qui ne tient plus dans le temps restant est sautée ; le
+    résultat (meilleur score_layout disponible) est alors marqué "partial".
+--------------------------------------------------------------------------------
+"""
+
+import threading
+import time
+
+from src.preprocessing import PREPROCESSING_GRAPH, DEFAULT_SCALE
+from src.engine import (ocr_passes, collect_detections, cluster_rows, score_layout,
+                        estimate_scale, LAYOUT_RULES, TARGET_CHAR_HEIGHT)
+from src.detections import DetectionTable, DEFAULT_FUSION
+
+# Estimations de départ (s / mégapixel de l'image agrandie, CPU de portable),
+# remplacées par la première mesure de chaque étape
+DEFAULT_COSTS = {
+    "upscaled": 0.01,
+    "gray": 0.002,
+    "lab_l": 0.01,
+    "Adaptive": 0.7,        # fastNlMeansDenoising
+    "AdaptiveFast": 0.01,
+    "LAB": 0.002,
+    "Inverted": 0.001,
+    "CLAHE": 0.01,
+    "ocr": 1.0,             # passage OCR d'une variante encore jamais mesurée
+    "scale.probe": 0.5,     # estimate_scale (s par appel, image réduite à 960 px)
+}
+
+# Variante de repli quand la variante elle-même ne tient plus dans le budget
+FALLBACKS = {"Adaptive": "AdaptiveFast"}
+
+# Facteurs d'échelle essayés, du plus grand au plus petit
+SCALE_STEPS = (4, 3, 2.5, 2, 1.5, 1, 0.75, 0.5)
+
+# Part maximale du budget consacrée à estimate_scale (scale="auto")
+PROBE_SHARE = 0.25
+
+def megapixels(shape, scale):
+    """Taille (en Mpx) de l'image agrandie d'un facteur `scale`"""
+    return shape[0] * shape[1] * scale * scale / 1e6
+
+class CostModel:
+    """
+    Coûts par étape (moyenne glissante exponentielle, facteur `alpha`) et
+    lettres apportées par variante. Partagé entre threads (verrou) : un même
+    modèle peut servir à toutes les images d'un processus.
+    """
+    def __init__(self, costs=None, alpha=0.3):
+        self.alpha = alpha
+        self.costs = dict(DEFAULT_COSTS if costs is None else costs)
+        self.yields = {}
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, stage):
+        if stage in self.costs:
+            return self.costs[stage]
+        if not stage.startswith("ocr."):
+            return 0.0
+        # OCR d'une variante jamais mesurée : moyenne des variantes déjà mesurées
+        measured = [rate for name, rate in self.costs.items() if name.startswith("ocr.")]
+        return sum(measured) / len(measured) if measured else self.costs["ocr"]
+
+    def estimate(self, stage, mpx):
+        """Durée estimée (s) de `stage` sur une image agrandie de `mpx` mégapixels"""
+        with self._lock:
+            return self._rate(stage) * mpx
+
+    def observe(self, stage, seconds, mpx):
+        """Enregistre une mesure : la première remplace l'estimation de départ"""
+        if mpx <= 0:
+            return
+        rate = seconds / mpx
+        with self._lock:
+            n = self.samples.get(stage, 0)
+            if n:
+                rate = self.alpha * rate + (1 - self.alpha) * self._rate(stage)
+            self.costs[stage] = rate
+            self.samples[stage] = n + 1
+
+    def observe_yield(self, variant, letters):
+        with self._lock:
+            previous = self.yields.get(variant)
+            self.yields[variant] = letters if previous is None else \
+                self.alpha * letters + (1 - self.alpha) * previous
+
+    def expected_yield(self, variant):
+        # Variante jamais mesurée : considérée aussi utile que les autres
+        with self._lock:
+            return self.yields.get(variant, 1.0)
+
+    def pass_cost(self, graph, variant, mpx):
+        """Durée estimée d'un passage : prétraitement encore à faire dans `graph` + OCR"""
+        return sum(self.estimate(node, mpx) for node in graph.pending_nodes(variant)) \
+            + self.estimate("ocr." + variant, mpx)
+
+    def plan_cost(self, variants, mpx, graph=PREPROCESSING_GRAPH):
+        """Durée estimée de plusieurs passages sur une image pas encore prétraitée"""
+        nodes = set()
+        for variant in variants:
+            node = variant
+            while node != "source":
+                nodes.add(node)
+                node = graph[node][0]
+        return sum(self.estimate(node, mpx) for node in nodes) \
+            + sum(self.estimate("ocr." + v, mpx) for v in variants)
+
+    def order(self, variants, mpx):
+        """Variantes triées par lettres attendues par seconde (ordre d'origine à égalité)"""
+        def value(variant):
+            cost = self.estimate(variant, mpx) + self.estimate("ocr." + variant, mpx)
+            return self.expected_yield(variant) / max(cost, 1e-6)
+        return sorted(variants, key=value, reverse=True)
+
+    def snapshot(self):
+        with self._lock:
+            return {"costs": dict(self.costs), "yields": dict(self.yields),
+                    "samples": dict(self.samples)}
+
+# Modèle partagé par défaut (un par processus : chaque worker apprend le sien)
+DEFAULT_COST_MODEL = CostModel()
+
+def choose_scale(model, shape, variants, remaining, scale=DEFAULT_SCALE, min_passes=2):
+    """
+    Plus grand facteur (<= `scale`) pour lequel les `min_passes` variantes les
+    moins chères tiennent dans `remaining` secondes ; à défaut une seule, à
+    défaut le plus petit facteur de SCALE_STEPS.
+    """
+    candidates = [scale] + [s for s in SCALE_STEPS if s < scale]
+    for need in sorted({min(min_passes, len(variants)), 1}, reverse=True):
+        for s in candidates:
+            mpx = megapixels(shape, s)
+            cheapest = sorted(variants, key=lambda v: model.plan_cost([v], mpx))[:need]
+            if model.plan_cost(cheapest, mpx) <= remaining:
+                return s
+    return candidates[-1]
+
+def budget_scale(reader, img, variants, deadline, model=None, scale=DEFAULT_SCALE,
+                 target_height=TARGET_CHAR_HEIGHT):
+    """
+    Facteur d'échelle du mode budget. scale="auto" : estimate_scale seulement
+    s'il coûte moins de PROBE_SHARE du budget restant (sinon DEFAULT_SCALE),
+    puis réduit si nécessaire par choose_scale.
+    """
+    model = model or DEFAULT_COST_MODEL
+    if scale == "auto":
+        if model.estimate("scale.probe", 1) <= PROBE_SHARE * (deadline - time.perf_counter()):
+            start = time.perf_counter()
+            scale = estimate_scale(reader, img, target_height)
+            model.observe("scale.probe", time.perf_counter() - start, 1)
+        else:
+            scale = DEFAULT_SCALE
+    return choose_scale(model, img.shape[:2], variants, deadline - time.perf_counter(), scale)
+
+class _NodeTimer:
+    """Chronomètre les noeuds calculés par un PreprocessingGraph et nourrit le modèle"""
+    def __init__(self, graph, model, mpx):
+        self.seconds = 0.0
+        self.computed = set()
+        graph.graph = {node: (parent, self._wrap(node, func, model, mpx))
+                       for node, (parent, func) in graph.graph.items()}
+
+    def _wrap(self, node, func, model, mpx):
+        def timed(source, pool=None):
+            start = time.perf_counter()
+            out = func(source, pool=pool)
+            elapsed = time.perf_counter() - start
+            model.observe(node, elapsed, mpx)
+            self.seconds += elapsed
+            self.computed.add(node)
+            return out
+        return timed
+
+def run_ocr_budget(reader, graph, names, deadline, model=None, min_confidence=100,
+                   min_letters=8, cache=None, image_key=None, fusion=DEFAULT_FUSION, tiling=None):
+    """
+    Passages OCR dans l'ordre choisi par le modèle de coût, tant que le
+    suivant tient avant `deadline` (time.perf_counter()). Comme la cascade,
+    s'arrête dès que le layout est sûr. Un passage déjà commencé n'est pas
+    interrompu : une estimation trop basse peut dépasser le budget (le
+    modèle apprend la mesure pour l'image suivante).
+
+    Retourne (validated_chars, nombre_de_passages_OCR, rapport) avec
+    rapport = {"partial", "skipped" (variantes sautées), "degraded"
+    (variante -> repli utilisé), "order" (variantes lues, dans l'ordre)}.
+    """
+    model = model or DEFAULT_COST_MODEL
+    mpx = megapixels(graph.get("source").shape, graph.scale)
+    timer = _NodeTimer(graph, model, mpx)
+    order = model.order(names, mpx)
+    graph.plan(order)
+
+    table = DetectionTable()
+    passes, done, skipped, degraded = 0, [], [], {}
+    confident = False
+    for name in order:
+        if confident:
+            graph.release(name)
+            continue
+
+        remaining = deadline - time.perf_counter()
+        variant = name
+        if model.pass_cost(graph, name, mpx) > remaining:
+            fallback = FALLBACKS.get(name)
+            if fallback is None or model.pass_cost(graph, fallback, mpx) > remaining:
+                graph.release(name)
+                skipped.append(name)
+                continue
+            # Repli déclaré avant de libérer la variante : les étapes communes
+            # (upscale, gris) restent en mémoire au lieu d'être recalculées
+            graph.plan([fallback])
+            graph.release(name)
+            variant = degraded[name] = fallback
+
+        before, preprocess = len(table), timer.seconds
+        start = time.perf_counter()
+        collect_detections(ocr_passes(reader, graph.get, [variant], cache=cache,
+                                      image_key=image_key, scale=graph.scale,
+                                      release_variant=graph.release, tiling=tiling),
+                           graph.scale, table)
+        if variant in timer.computed:  # pas trouvée en cache : l'OCR a vraiment tourné
+            ocr_seconds = time.perf_counter() - start - (timer.seconds - preprocess)
+            model.observe("ocr." + variant, ocr_seconds, mpx)
+            model.observe_yield(variant, len(table) - before)
+        passes += 1
+        done.append(variant)
+
+        # Critère d'arrêt de la cascade : assez de lettres ET gagnant net
+        if table.letters() >= min_letters:
+            char_rows = cluster_rows(table.chars(method=fusion))
+            if char_rows:
+                best_layout, confidence, _ = score_layout(char_rows)
+                confident = best_layout in LAYOUT_RULES and confidence >= min_confidence
+
+    report = {"partial": bool(skipped or degraded), "skipped": skipped,
+              "degraded": degraded, "order": done}
+    return table.chars(method=fusion), passes, report
@@ -0,0 +1,175 @@
+"""
+--------------------------------------------------------------------------------
+File: src/cache.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Cache disque des résultats OCR bruts (boîtes, texte, confiance) par variante.
+    La clé combine le hash du contenu de l'image, le nom de la variante et les
+    paramètres OCR : modifier LAYOUT_RULES ou le scoring ne force donc plus
+    à relancer l'OCR.
+    Stockage SQLite (mode WAL) : accès concurrent sûr entre plusieurs processus
+    et threads (une connexion par thread et par processus), taille maximale avec éviction LRU, compteurs hits/misses persistants.
+--------------------------------------------------------------------------------
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# À incrémenter si le format des résultats ou le prétraitement change
+CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ocr_last_access ON ocr(last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+-- Octets occupés, tenus à jour par put/éviction (initialisés depuis un ancien cache)
+INSERT OR IGNORE INTO counters SELECT 'bytes', COALESCE(SUM(size), 0) FROM ocr;
+"""
+
+def image_key(img):
+    """Hash du contenu (pixels + forme) d'une image décodée"""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{img.shape}|{img.dtype}".encode())
+    h.update(img if img.flags["C_CONTIGUOUS"] else img.tobytes())
+    return h.hexdigest()
+
+def _to_plain(results):
+    """Convertit la sortie EasyOCR (types numpy) en JSON pur"""
+    return [[[[float(x), float(y)] for x, y in bbox], str(text), float(conf)]
+            for bbox, text, conf in results]
+
+class OcrCache:
+    """
+    Cache OCR persistant. Une connexion SQLite est ouverte par thread (un objet
+    SQLite ne peut pas changer de thread) et par processus : l'objet peut donc
+    servir à plusieurs threads (streaming, service, GUI) et être transmis aux
+    workers de src/batch.py.
+    """
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Compteurs du processus courant (les totaux persistants sont dans stats())
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, "conn", None) is None or local.pid != os.getpid():
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def _entry_key(self, img_key, variant, params):
+        raw = json.dumps([CACHE_VERSION, img_key, variant, params], sort_keys=True)
+        return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+    def _bump(self, conn, name, n=1):
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (n, name))
+
+    def get(self, img_key, variant, params):
+        """Résultats OCR bruts de la variante, ou None si absents"""
+        conn = self._connection()
+        key = self._entry_key(img_key, variant, params)
+        # Lecture sans verrou d'écriture (WAL : les lecteurs ne s'attendent pas),
+        # puis courte écriture pour la date d'accès (LRU) et les compteurs
+        row = conn.execute("SELECT value FROM ocr WHERE key = ?", (key,)).fetchone()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if row is None:
+                self._bump(conn, "misses")
+            else:
+                conn.execute("UPDATE ocr SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._bump(conn, "hits")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [(bbox, text, conf) for bbox, text, conf in json.loads(row[0])]
+
+    def put(self, img_key, variant, params, results):
+        """Enregistre les résultats puis évince les entrées les plus anciennes si besoin"""
+        conn = self._connection()
+        key = self._entry_key(img_key, variant, params)
+        value = json.dumps(_to_plain(results))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size FROM ocr WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)",
+                         (key, value, len(value), time.time()))
+            self._bump(conn, "bytes", len(value) - (old[0] if old else 0))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM ocr ORDER BY last_access"):
+            if total - freed <= self.max_bytes:
+                break
+            evicted.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM ocr WHERE key = ?", evicted)
+        self._bump(conn, "evictions", len(evicted))
+        self._bump(conn, "bytes", -freed)
+
+    def stats(self):
+        """Compteurs persistants (tous processus confondus) + occupation"""
+        conn = self._connection()
+        stats = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+        stats.update(entries=entries, max_bytes=self.max_bytes)
+        return stats
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM ocr")
+            conn.execute("UPDATE counters SET value = 0")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
@@ -0,0 +1,100 @@
+"""
+--------------------------------------------------------------------------------
+File: src/clustering.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Découpage optimal et déterministe de coordonnées Y (1D) en 3 rangées.
+    En 1D, les clusters optimaux au sens des K-Means (somme des carrés
+    intra-cluster minimale) sont des intervalles contigus des valeurs triées :
+    il suffit donc de tester toutes les paires de coupures (i, j) grâce aux
+    sommes préfixes. Quelques dizaines de lettres -> quelques centaines de
+    candidats, évalués en un seul calcul NumPy, y compris pour un lot d'images.
+--------------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+def _segment_cost(s1, s2, start, end):
+    """Somme des carrés intra-segment [start, end) à partir des sommes préfixes"""
+    n = end - start
+    total = np.take_along_axis(s1, end, axis=-1) - np.take_along_axis(s1, start, axis=-1)
+    total_sq = np.take_along_axis(s2, end, axis=-1) - np.take_along_axis(s2, start, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return total_sq - total * total / n
+
+def optimal_rows_batch(y_arrays):
+    """
+    Découpe optimale en 3 rangées pour plusieurs images en un seul passage.
+    y_arrays : liste de tableaux 1D (au moins 3 valeurs chacun).
+    Retourne une liste de tableaux d'entiers (0=Haut, 1=Milieu, 2=Bas),
+    alignés sur l'ordre d'origine de chaque tableau.
+    Des Y égaux sont toujours dans la même rangée : avec moins de 3 valeurs
+    distinctes, chaque valeur a sa rangée (moins de 3 rangées utilisées).
+    """
+    m = len(y_arrays)
+    if m == 0:
+        return []
+    lengths = np.array([len(y) for y in y_arrays])
+    n_max = int(lengths.max())
+
+    # Tri + padding (les positions au-delà de n sont masquées plus bas)
+    orders = [np.argsort(np.asarray(y, dtype=np.float64), kind="stable") for y in y_arrays]
+    ys = np.zeros((m, n_max))
+    for k, (y, order) in enumerate(zip(y_arrays, orders)):
+        ys[k, :len(y)] = np.asarray(y, dtype=np.float64)[order]
+
+    # Centrage par image pour la stabilité numérique des sommes de carrés
+    valid = np.arange(n_max)[None, :] < lengths[:, None]
+    ys = np.where(valid, ys - ys[:, :1], 0.0)
+
+    s1 = np.concatenate([np.zeros((m, 1)), np.cumsum(ys, axis=1)], axis=1)
+    s2 = np.concatenate([np.zeros((m, 1)), np.cumsum(ys * ys, axis=1)], axis=1)
+
+    # Coupures candidates : rangée 0 = [0, i), rangée 1 = [i, j), rangée 2 = [j, n)
+    cut = np.arange(n_max + 1)
+    i = np.broadcast_to(cut[:, None], (n_max + 1, n_max + 1))
+    j = np.broadcast_to(cut[None, :], (n_max + 1, n_max + 1))
+    flat_i = np.broadcast_to(i.ravel(), (m, i.size))
+    flat_j = np.broadcast_to(j.ravel(), (m, j.size))
+    zeros = np.zeros_like(flat_i)
+    ends = np.broadcast_to(lengths[:, None], flat_i.shape)
+
+    cost = (_segment_cost(s1, s2, zeros, flat_i)
+            + _segment_cost(s1, s2, flat_i, flat_j)
+            + _segment_cost(s1, s2, flat_j, ends))
+
+    # On ne coupe jamais entre deux valeurs égales (même point -> même rangée)
+    prev = np.concatenate([np.full((m, 1), -np.inf), ys], axis=1)   # prev[:, c] = y[c-1]
+    distinct = np.concatenate([ys, np.full((m, 1), np.inf)], axis=1) > prev
+    ok_i = np.take_along_axis(distinct, flat_i, axis=1)
+    ok_j = np.take_along_axis(distinct, flat_j, axis=1)
+    allowed = (flat_i >= 1) & (flat_j > flat_i) & (flat_j < ends)
+    cost = np.where(allowed & ok_i & ok_j, cost, np.inf)
+    # Moins de 3 valeurs distinctes : aucune coupure possible
+    few_values = ~np.isfinite(cost.min(axis=1))
+
+    best = np.argmin(cost, axis=1)
+    best_i, best_j = best // (n_max + 1), best % (n_max + 1)
+
+    rows = []
+    for k, order in enumerate(orders):
+        if few_values[k]:
+            # Une rangée par valeur distincte (rang de la valeur)
+            sorted_rows = np.concatenate([[0], np.cumsum(distinct[k, 1:lengths[k]])]).astype(np.int64)
+        else:
+            sorted_rows = np.zeros(lengths[k], dtype=np.int64)
+            sorted_rows[best_i[k]:best_j[k]] = 1
+            sorted_rows[best_j[k]:] = 2
+        labels = np.empty_like(sorted_rows)
+        labels[order] = sorted_rows
+        rows.append(labels)
+    return rows
+
+def optimal_rows(y):
+    """Découpe optimale d'un seul tableau de Y en 3 rangées (0=Haut, 1=Milieu, 2=Bas)"""
+    return optimal_rows_batch([y])[0]
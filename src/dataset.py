@@ -0,0 +1,188 @@
+"""
+--------------------------------------------------------------------------------
+File: src/dataset.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Accès aux jeux d'images de test.
+    Liste les images d'un dossier et extrait la vérité terrain (layout attendu)
+    à partir du nom de fichier, selon la convention FORMAT-OS-LAYOUT-X.png.
+    watch_directory surveille un dossier et produit les nouvelles images au fil de l'eau.
+    open_source lit les images d'un dossier OU directement d'une archive zip/tar
+    (sans extraction sur disque) ; decode_image décode depuis la mémoire, avec
+    une réduction de résolution optionnelle (IMREAD_REDUCED_*).
+--------------------------------------------------------------------------------
+"""
+
+import os
+import tarfile
+import time
+import zipfile
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+# Facteur de réduction au décodage -> drapeau OpenCV (libjpeg réduit directement
+# pendant la décompression ; les autres formats sont décodés puis réduits)
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def decode_image(data, reduction=1):
+    """Décode une image encodée (bytes) en BGR, réduite d'un facteur 1, 2, 4 ou 8"""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_DECODE_FLAGS[reduction])
+
+def reduction_for_scale(scale):
+    """
+    Plus grand facteur de réduction au décodage sans perte pour le prétraitement :
+    l'image sera de toute façon réduite si scale < 1 (ex: scale 0.3 -> réduction 2,
+    puis facteur 0.6 sur l'image décodée). scale="auto" -> 1 (inconnu à l'avance).
+    """
+    if scale == "auto":
+        return 1
+    for reduction in (8, 4, 2):
+        if scale * reduction <= 1:
+            return reduction
+    return 1
+
+def list_images(folder, extensions=IMAGE_EXTENSIONS):
+    """Noms des fichiers image du dossier (ordre de os.listdir)"""
+    return [f for f in os.listdir(folder) if f.lower().endswith(extensions)]
+
+def watch_directory(folder, poll_interval=1.0, extensions=IMAGE_EXTENSIONS,
+                    include_existing=True, stop_event=None):
+    """
+    Générateur infini (jusqu'à stop_event.set()) des chemins des nouvelles images
+    déposées dans `folder`. Un fichier n'est produit qu'une fois que sa taille
+    est stable entre deux scrutations (copie terminée).
+    """
+    seen = set() if include_existing else set(list_images(folder, extensions))
+    pending = {}  # nom -> taille à la scrutation précédente
+    while stop_event is None or not stop_event.is_set():
+        for name in sorted(list_images(folder, extensions)):
+            if name in seen:
+                continue
+            try:
+                size = os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                continue
+            if pending.get(name) == size and size > 0:
+                seen.add(name)
+                del pending[name]
+                yield os.path.join(folder, name)
+            else:
+                pending[name] = size
+        time.sleep(poll_interval)
+
+# --- SOURCES D'IMAGES (dossier ou archive) ---
+
+class DirectorySource:
+    """Images d'un dossier (ordre de os.listdir, comme list_images)"""
+    def __init__(self, folder, extensions=IMAGE_EXTENSIONS):
+        self.path = folder
+        self.extensions = extensions
+
+    def names(self):
+        return list_images(self.path, self.extensions)
+
+    def read(self, name):
+        with open(os.path.join(self.path, name), "rb") as f:
+            return f.read()
+
+    def __iter__(self):
+        """(nom, contenu encodé) pour chaque image"""
+        for name in self.names():
+            yield name, self.read(name)
+
+class ZipSource:
+    """Images d'une archive .zip, lues en mémoire sans extraction"""
+    def __init__(self, path, extensions=IMAGE_EXTENSIONS):
+        self.path = path
+        self.extensions = extensions
+        self._zip = None
+
+    def __getstate__(self):
+        # Le fichier zip ouvert n'est pas transmissible à un autre processus
+        return {"path": self.path, "extensions": self.extensions}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["extensions"])
+
+    def _archive(self):
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.path)
+        return self._zip
+
+    def names(self):
+        return [info.filename for info in self._archive().infolist()
+                if not info.is_dir() and info.filename.lower().endswith(self.extensions)]
+
+    def read(self, name):
+        return self._archive().read(name)
+
+    def __iter__(self):
+        for name in self.names():
+            yield name, self.read(name)
+
+class TarSource:
+    """Images d'une archive .tar (.tar.gz, .tar.bz2, .tar.xz), lues en un seul passage"""
+    def __init__(self, path, extensions=IMAGE_EXTENSIONS):
+        self.path = path
+        self.extensions = extensions
+
+    def _wanted(self, member):
+        return member.isfile() and member.name.lower().endswith(self.extensions)
+
+    def names(self):
+        with tarfile.open(self.path) as archive:
+            return [m.name for m in archive if self._wanted(m)]
+
+    def read(self, name):
+        # Accès direct : coûteux sur une archive compressée, préférer l'itération
+        with tarfile.open(self.path) as archive:
+            return archive.extractfile(name).read()
+
+    def __iter__(self):
+        # Lecture séquentielle (mode flux "r|*") : efficace même compressé
+        with tarfile.open(self.path, "r|*") as archive:
+            for member in archive:
+                if self._wanted(member):
+                    yield member.name, archive.extractfile(member).read()
+
+def open_source(path, extensions=IMAGE_EXTENSIONS):
+    """Source d'images adaptée : dossier, archive zip ou archive tar"""
+    if os.path.isdir(path):
+        return DirectorySource(path, extensions)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path, extensions)
+    if tarfile.is_tarfile(path):
+        return TarSource(path, extensions)
+    raise ValueError(f"Ni un dossier ni une archive zip/tar : {path}")
+
+def parse_expected_layout(filename):
+    """
+    Extrait le layout attendu du nom de fichier.
+    Convention: FORMAT-OS-LAYOUT-X.png (ex: ISO-WIN-AZERTY-1.png)
+    Accepte aussi un nom de membre d'archive (ex: lot1/ISO-WIN-AZERTY-1.png).
+    """
+    try:
+        name_no_ext = os.path.splitext(os.path.basename(filename))[0] # Enlève .png
+        parts = name_no_ext.split('-')
+
+        # On cherche AZERTY, QWERTY ou QWERTZ dans les parties du nom
+        for part in parts:
+            p = part.upper()
+            if p in ["AZERTY", "QWERTY", "QWERTZ"]:
+                return p
+        return "INCONNU"
+    except Exception:
+        return "ERREUR"
@@ -0,0 +1,186 @@
+"""
+--------------------------------------------------------------------------------
+File: src/detections.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Stockage en colonnes des détections OCR (un tableau structuré NumPy :
+    image, variante, lettre, x, y, largeur, hauteur, confiance) et fusion
+    vectorisée des variantes en une position Y par lettre :
+        - "mean"     : moyenne simple sans rejet (fusion historique, par défaut) ;
+        - "weighted" : moyenne des Y pondérée par la confiance, après rejet
+          des doublons aberrants (une même lettre lue sur une autre rangée,
+          ex: le "0" de la rangée des chiffres corrigé en "O"), sur demande.
+    La colonne "image" permet de fusionner un lot d'images en un seul calcul.
+--------------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ("image", np.int32),
+    ("variant", np.int16),   # indice dans DetectionTable.variants (-1 = inconnue)
+    ("char", "U1"),
+    ("x", np.float32),       # centre de la boîte, repère de l'image d'origine
+    ("y", np.float32),
+    ("width", np.float32),
+    ("height", np.float32),
+    ("confidence", np.float32),
+])
+
+# Résultat de la fusion : une ligne par (image, lettre)
+FUSED_DTYPE = np.dtype([
+    ("image", np.int32),
+    ("char", "U1"),
+    ("y", np.float64),        # Y fusionné
+    ("spread", np.float32),   # écart-type (pondéré) des Y retenus
+    ("count", np.int32),      # détections retenues
+    ("rejected", np.int32),   # détections écartées comme aberrantes
+    ("weight", np.float32),   # somme des confiances retenues
+])
+
+FUSION_METHODS = ("weighted", "mean")
+DEFAULT_FUSION = "mean"
+
+# Une détection est aberrante si son Y s'écarte de la médiane (pondérée) de
+# sa lettre de plus de OUTLIER_FACTOR x la hauteur moyenne des boîtes de la lettre
+OUTLIER_FACTOR = 1.0
+
+def _weighted_median(values, weights, groups, n_groups):
+    """Médiane pondérée de `values` par groupe (toujours une valeur existante du groupe)"""
+    order = np.lexsort((values, groups))
+    g, w = groups[order], weights[order]
+    totals = np.bincount(groups, weights=weights, minlength=n_groups)
+    before = np.concatenate(([0.0], np.cumsum(totals)))[g]
+    reached = np.cumsum(w) - before >= totals[g] / 2 - 1e-9
+    pos = np.flatnonzero(reached)
+    first = pos[np.concatenate(([True], g[pos[1:]] != g[pos[:-1]]))]
+    median = np.empty(n_groups, dtype=np.float64)
+    median[g[first]] = values[order[first]]
+    return median
+
+def fuse_detections(det, method=DEFAULT_FUSION, outlier_factor=OUTLIER_FACTOR):
+    """
+    Fusion vectorisée d'un tableau DETECTION_DTYPE en un tableau FUSED_DTYPE,
+    trié par image puis par ordre de première apparition de chaque lettre.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Méthode de fusion inconnue : {method}")
+    if len(det) == 0:
+        return np.zeros(0, dtype=FUSED_DTYPE)
+
+    # Groupes (image, lettre), numérotés dans l'ordre de première apparition
+    codes = np.ascontiguousarray(det["char"]).view(np.uint32).astype(np.int64)
+    keys = det["image"].astype(np.int64) << 32 | codes
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.lexsort((first, det["image"][first]))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    groups = rank[inverse.ravel()]
+    n_groups = len(order)
+    counts = np.bincount(groups, minlength=n_groups)
+
+    y = det["y"].astype(np.float64)
+    if method == "mean":
+        weights = np.ones(len(det))
+        keep = np.ones(len(det), dtype=bool)
+    else:
+        weights = det["confidence"].astype(np.float64)
+        median = _weighted_median(y, weights, groups, n_groups)
+        height = np.bincount(groups, weights=det["height"], minlength=n_groups) / counts
+        keep = np.abs(y - median[groups]) <= outlier_factor * height[groups]
+        weights = weights * keep
+
+    total = np.bincount(groups, weights=weights, minlength=n_groups)
+    mean = np.bincount(groups, weights=weights * y, minlength=n_groups) / total
+    variance = np.bincount(groups, weights=weights * (y - mean[groups]) ** 2,
+                           minlength=n_groups) / total
+    kept = np.bincount(groups, weights=keep, minlength=n_groups).astype(np.int32)
+
+    fused = np.zeros(n_groups, dtype=FUSED_DTYPE)
+    fused["image"] = det["image"][first[order]]
+    fused["char"] = det["char"][first[order]]
+    fused["y"] = mean
+    fused["spread"] = np.sqrt(np.maximum(variance, 0))
+    fused["count"] = kept
+    fused["rejected"] = counts - kept
+    fused["weight"] = np.bincount(groups, weights=det["confidence"] * keep, minlength=n_groups)
+    return fused
+
+class DetectionTable:
+    """
+    Détections OCR accumulées passage après passage (ajouts par blocs,
+    concaténés à la demande), pour une ou plusieurs images.
+    """
+    def __init__(self):
+        self.variants = []
+        self._chunks = []
+        self._array = None
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def _variant_code(self, name):
+        if name is None:
+            return -1
+        if name not in self.variants:
+            self.variants.append(name)
+        return self.variants.index(name)
+
+    def append(self, chars, boxes, confidences, variant=None, image=0, scale=1):
+        """
+        Ajoute les détections d'un passage OCR.
+        chars : lettres ; boxes : coins EasyOCR (n, 4, 2) dans le repère de la
+        variante ; scale : facteur du prétraitement (retour au repère d'origine).
+        """
+        if not len(chars):
+            return
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4, 2) / scale
+        chunk = np.zeros(len(chars), dtype=DETECTION_DTYPE)
+        chunk["image"] = image
+        chunk["variant"] = self._variant_code(variant)
+        chunk["char"] = chars
+        # Centre = milieu des coins haut-gauche et bas-droit (comme la fusion historique)
+        chunk["x"] = (boxes[:, 0, 0] + boxes[:, 2, 0]) / 2
+        chunk["y"] = (boxes[:, 0, 1] + boxes[:, 2, 1]) / 2
+        chunk["width"] = boxes[:, :, 0].max(axis=1) - boxes[:, :, 0].min(axis=1)
+        chunk["height"] = boxes[:, :, 1].max(axis=1) - boxes[:, :, 1].min(axis=1)
+        chunk["confidence"] = confidences
+        self._chunks.append(chunk)
+        self._array = None
+
+    @property
+    def array(self):
+        """Toutes les détections (tableau DETECTION_DTYPE)"""
+        if self._array is None:
+            self._array = (np.concatenate(self._chunks) if self._chunks
+                           else np.zeros(0, dtype=DETECTION_DTYPE))
+            self._chunks = [self._array] if len(self._array) else []
+        return self._array
+
+    def letters(self, image=0):
+        """Nombre de lettres distinctes détectées sur une image"""
+        det = self.array
+        return len(np.unique(det["char"][det["image"] == image]))
+
+    def fuse(self, method=DEFAULT_FUSION, outlier_factor=OUTLIER_FACTOR):
+        return fuse_detections(self.array, method, outlier_factor)
+
+    def chars(self, image=0, method=DEFAULT_FUSION, outlier_factor=OUTLIER_FACTOR):
+        """{lettre: Y fusionné} d'une image (le dict validated_chars du pipeline)"""
+        fused = self.fuse(method, outlier_factor)
+        fused = fused[fused["image"] == image]
+        return {str(c): float(y) for c, y in zip(fused["char"], fused["y"])}
+
+    def chars_by_image(self, n_images, method=DEFAULT_FUSION, outlier_factor=OUTLIER_FACTOR):
+        """Liste de {lettre: Y fusionné} pour les images 0..n_images-1 (une seule fusion)"""
+        fused = self.fuse(method, outlier_factor)
+        per_image = [{} for _ in range(n_images)]
+        for image, c, y in zip(fused["image"].tolist(), fused["char"].tolist(), fused["y"].tolist()):
+            if 0 <= image < n_images:
+                per_image[image][c] = y
+        return per_image
@@ -9,19 +9,28 @@ Author:
     
 Description: 
     Cœur logique de l'application. Contient :
-    1. Le pipeline OCR (EasyOCR) avec gestion multi-images.
-    2. L'algorithme de Clustering (K-Means) pour identifier les rangées physiques
-       indépendamment de l'angle de la photo.
-    3. Le système de Scoring pondéré pour classifier le layout (AZERTY/QWERTY...).
+    1. Le pipeline OCR (EasyOCR) avec gestion multi-images ; les détections
+       sont fusionnées en colonnes par src/detections.py.
+    2. Le Clustering 1D des hauteurs (découpage optimal exact, K-Means en secours)
+       pour identifier les rangées physiques indépendamment de l'angle de la photo.
+    3. Le système de Scoring pondéré pour classifier le layout (AZERTY/QWERTY...),
+       à partir du registre compilé de src/layouts.py.
 --------------------------------------------------------------------------------
 """
 
-import easyocr
+import os
+import threading
+
+import cv2
 import numpy as np
 from collections import Counter
-from sklearn.cluster import KMeans
 import warnings
 
+from src.clustering import optimal_rows, optimal_rows_batch
+from src.detections import DetectionTable, DEFAULT_FUSION
+from src.layouts import DEFAULT_REGISTRY
+from src.instrumentation import span, count, enabled as instrumentation_enabled
+
 # Mapping pour corriger les erreurs fréquentes d'OCR
 OCR_CORRECTIONS = {
     '0': 'O', '1': 'I', '5': 'S', '2': 'Z', '4': 'A', '8': 'B', 
@@ -29,27 +38,143 @@ OCR_CORRECTIONS = {
 }
 
 # --- DÉFINITION INTELLIGENTE DES LAYOUTS ---
-# On ne définit plus des lignes entières rigides, mais des "Marqueurs forts"
-LAYOUT_RULES = {
-    "AZERTY": {
-        # Si je trouve ces lettres en HAUT, c'est +++ pour AZERTY
-        "TOP":  {'A', 'Z', 'E', 'R', 'T'}, 
-        # Si je trouve ces lettres au MILIEU, c'est +++ pour AZERTY
-        "MID":  {'Q', 'S', 'D', 'F', 'G', 'M'}, # M est au milieu en AZERTY (souvent)
-        # Si je trouve ces lettres en BAS, c'est +++ pour AZERTY
-        "BOT":  {'W', 'X', 'C', 'V'}
-    },
-    "QWERTY": {
-        "TOP":  {'Q', 'W', 'E', 'R', 'T', 'Y'},
-        "MID":  {'A', 'S', 'D', 'F', 'G'},
-        "BOT":  {'Z', 'X', 'C', 'V'}
-    },
-    "QWERTZ": {
-        "TOP":  {'Q', 'W', 'E', 'R', 'T', 'Z'},
-        "MID":  {'A', 'S', 'D', 'F', 'G'},
-        "BOT":  {'Y', 'X', 'C', 'V'}
-    }
-}
+# On ne définit plus des lignes entières rigides, mais des "Marqueurs forts",
+# déclarés dans data/layouts/*.json (voir src/layouts.py).
+# LAYOUT_RULES reste disponible sous sa forme historique {layout: {"TOP": {...}, ...}}.
+LAYOUT_RULES = DEFAULT_REGISTRY.rules
+
+# Hauteur visée (px) des lettres dans les variantes envoyées à l'OCR (mode scale="auto")
+TARGET_CHAR_HEIGHT = 48
+
+def estimate_scale(reader, img, target_height=TARGET_CHAR_HEIGHT, probe_size=960,
+                   min_scale=0.25, max_scale=4.0, default=3):
+    """
+    Estime le facteur d'échelle qui amène les légendes des touches à `target_height` px.
+    Passe de détection CRAFT bon marché sur une copie réduite (plus grand côté
+    = probe_size), puis hauteur médiane des boîtes "lettre" (pas plus larges que 2x
+    leur hauteur). Retourne `default` si rien n'est détecté.
+    """
+    h, w = img.shape[:2]
+    probe_factor = min(1.0, probe_size / max(h, w))
+    probe = img
+    if probe_factor < 1:
+        probe = cv2.resize(img, None, fx=probe_factor, fy=probe_factor, interpolation=cv2.INTER_AREA)
+    if probe.ndim == 3:
+        probe = cv2.cvtColor(probe, cv2.COLOR_BGR2GRAY)
+
+    try:
+        with span("scale.probe"):
+            horizontal_list, _ = reader.detect(probe)
+    except Exception:
+        return default
+
+    boxes = [(x_max - x_min, y_max - y_min) for x_min, x_max, y_min, y_max in horizontal_list[0]]
+    heights = [bh for bw, bh in boxes if bh > 0 and bw <= 2 * bh] or [bh for _, bh in boxes if bh > 0]
+    if not heights:
+        return default
+
+    legend_height = float(np.median(heights)) / probe_factor
+    return round(float(np.clip(target_height / legend_height, min_scale, max_scale)), 2)
+
+def create_reader(threads=None, accelerated=False, quantize=True):
+    """
+    Crée le lecteur EasyOCR (CPU).
+    threads     : nombre de threads intra-op de torch (None = défaut de torch).
+    quantize    : quantification dynamique int8 des couches Linear/LSTM du
+                  réseau de reconnaissance (défaut d'EasyOCR sur CPU) ;
+                  False = référence fp32.
+    accelerated : mode CPU accéléré (int8 forcé) : appels du lecteur sous
+                  torch.inference_mode, threads torch fixés (intra-op = threads
+                  ou nombre de coeurs, inter-op = 1) et passage de chauffe à la
+                  création, pour que la première image ne paie pas l'initialisation.
+    """
+    # Import différé : torch + EasyOCR coûtent plusieurs secondes, payées seulement
+    # quand un lecteur est réellement créé (pas pour --help ou un re-scoring en cache)
+    import easyocr
+    import torch
+    if accelerated:
+        torch.set_num_threads(threads or os.cpu_count() or 1)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # déjà fixé (ou travail parallèle déjà lancé dans ce processus)
+    elif threads:
+        torch.set_num_threads(threads)
+
+    reader = easyocr.Reader(['en'], gpu=False, quantize=quantize or accelerated)
+    if accelerated:
+        # Méthodes d'instance : l'interface (readtext, detect, recognize...) ne change pas
+        for name in ("readtext", "readtext_batched", "detect", "recognize"):
+            setattr(reader, name, torch.inference_mode()(getattr(reader, name)))
+        _warm_up(reader)
+    reader.accelerated = accelerated
+    reader.quantize = quantize or accelerated
+    return reader
+
+class LazyReader:
+    """
+    Lecteur EasyOCR chargé en différé, utilisable partout à la place du lecteur.
+    background=True : chargement (imports torch/EasyOCR compris) lancé tout de
+    suite dans un thread, pendant que les images sont décodées et prétraitées.
+    background=False : chargé au premier appel seulement (ex: re-scoring depuis
+    le cache OCR, où le modèle n'est parfois jamais utilisé).
+    Le premier accès à un attribut du lecteur attend la fin du chargement.
+    """
+    def __init__(self, background=True, **reader_options):
+        self._options = reader_options
+        self._reader = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._load, name="reader-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        try:
+            with span("reader.load"):
+                self._reader = create_reader(**self._options)
+        except Exception as e:
+            self._error = e
+
+    def ready(self):
+        return self._reader is not None
+
+    def wait(self):
+        """Attend le chargement et retourne le vrai lecteur"""
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self._reader is None and self._error is None:
+                self._load()
+        if self._error is not None:
+            raise RuntimeError(f"Échec du chargement du modèle EasyOCR : {self._error}")
+        return self._reader
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.wait(), name)
+
+def reader_params(reader):
+    """
+    Réglages du lecteur qui influencent sa sortie (clé de cache : int8 et fp32
+    ne lisent pas pareil). Un LazyReader n'est pas chargé pour autant.
+    """
+    if isinstance(reader, LazyReader):
+        accelerated = reader._options.get("accelerated", False)
+        quantize = reader._options.get("quantize", True) or accelerated
+    else:
+        accelerated = getattr(reader, "accelerated", False)
+        quantize = getattr(reader, "quantize", True)
+    return {"quantize": bool(quantize), "accelerated": bool(accelerated)}
+
+def _warm_up(reader):
+    """Une lecture complète (détection + reconnaissance) sur une petite image synthétique"""
+    img = np.full((64, 320), 255, np.uint8)
+    cv2.putText(img, "AZERTY", (10, 46), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 0, 3)
+    with span("reader.warm_up"):
+        reader.readtext(img, allowlist=OCR_ALLOWLIST)
 
 def clean_char(text):
     text = text.upper().strip()
@@ -58,129 +183,315 @@ def clean_char(text):
     if len(text) != 1: return ""
     return OCR_CORRECTIONS.get(text, text)
 
-def run_ocr_pipeline(reader, processed_images):
-    char_data = {}
+# Caractères autorisés pour l'OCR (allowlist large)
+OCR_ALLOWLIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Variantes utilisées pour la détection des boîtes en mode "detect_once"
+DEFAULT_DETECT_ON = ("Inverted",)
+
+def _box_iou(a, b):
+    """IoU de deux boîtes horizontales EasyOCR [x_min, x_max, y_min, y_max]"""
+    inter_w = min(a[1], b[1]) - max(a[0], b[0])
+    inter_h = min(a[3], b[3]) - max(a[2], b[2])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    union = (a[1] - a[0]) * (a[3] - a[2]) + (b[1] - b[0]) * (b[3] - b[2]) - inter
+    return inter / union if union > 0 else 0.0
+
+def detect_boxes(reader, images, iou_threshold=0.5):
+    """
+    Lance uniquement le détecteur CRAFT sur une ou plusieurs variantes
+    et fusionne les boîtes (une boîte déjà couverte à IoU >= seuil est ignorée).
+    Retourne (horizontal_list, free_list) au format de Reader.recognize.
+    """
+    merged_horizontal, merged_free = [], []
+    for img in images:
+        with span("ocr.detect"):
+            horizontal_list, free_list = reader.detect(img)
+        for box in horizontal_list[0]:
+            if all(_box_iou(box, kept) < iou_threshold for kept in merged_horizontal):
+                merged_horizontal.append(box)
+        merged_free.extend(free_list[0])
+    count("ocr.detected_boxes", len(merged_horizontal) + len(merged_free))
+    return merged_horizontal, merged_free
+
+def _read_variant(reader, img, boxes=None, tiling=None):
+    """
+    OCR complet (détection + reconnaissance) ou reconnaissance seule si boxes est fourni.
+    tiling (src/tiling.Tiling) : OCR complet par tuiles lues en parallèle.
+    """
+    if boxes is None:
+        if tiling is not None:
+            return tiling.read(img, lambda tile: reader.readtext(tile, allowlist=OCR_ALLOWLIST))
+        return reader.readtext(img, allowlist=OCR_ALLOWLIST)
+    horizontal_list, free_list = boxes
+    if not horizontal_list and not free_list:
+        return []
+    return reader.recognize(img, horizontal_list, free_list, allowlist=OCR_ALLOWLIST)
+
+def _accumulate_results(table, results, scale=1, variant=None, image=0):
+    """
+    Ajoute les lettres valides d'un passage OCR à la table de détections
+    (DetectionTable). Les coordonnées sont divisées par `scale` (retour au
+    repère de l'image d'origine).
+    Retourne le nombre de détections retenues.
+    """
+    chars, boxes, confidences = [], [], []
+    low_conf = rejected = 0
+    for (bbox, text, conf) in results:
+        if conf < 0.3: # 0.3 = tolerance
+            low_conf += 1
+            continue
+
+        char = clean_char(text)
+        if not char or not char.isalpha():
+            rejected += 1
+            continue
+
+        chars.append(char)
+        boxes.append(bbox)
+        confidences.append(conf)
+
+    table.append(chars, boxes, confidences, variant, image, scale)
+    accepted = len(chars)
+    if instrumentation_enabled():
+        count("letters.accepted", accepted, variant=variant)
+        count("letters.rejected_confidence", low_conf, variant=variant)
+        count("letters.rejected_clean_char", rejected, variant=variant)
+    return accepted
 
-    for method_name, img in processed_images:
-        # On utilise une allowlist large
+class OcrEvidence:
+    """
+    Cumul incrémental des détections OCR (même fusion que fuse_ocr_results),
+    pour des passages qui arrivent au fil du temps (ex: images d'une vidéo).
+    """
+    def __init__(self, fusion=DEFAULT_FUSION):
+        self.table = DetectionTable()
+        self.fusion = fusion
+        self.passes = 0
+
+    def add(self, results, scale=1, variant=None):
+        """Ajoute un passage OCR, retourne le nombre de détections retenues"""
+        self.passes += 1
+        return _accumulate_results(self.table, results, scale, variant)
+
+    def chars(self):
+        """{lettre: Y fusionné} sur tous les passages reçus"""
+        return self.table.chars(method=self.fusion)
+
+def ocr_params(mode="full", detect_on=DEFAULT_DETECT_ON, scale=3, tiling=None, reader=None):
+    """Paramètres qui influencent la sortie OCR brute (utilisés comme clé de cache)"""
+    params = {"allowlist": OCR_ALLOWLIST, "mode": mode, "scale": float(scale)}
+    if reader is not None:
+        params.update(reader_params(reader))
+    if mode == "detect_once":
+        params["detect_on"] = list(detect_on)
+    elif tiling is not None:
+        params["tiling"] = tiling.params()
+    return params
+
+def ocr_passes(reader, get_variant, names, mode="full", detect_on=DEFAULT_DETECT_ON,
+               cache=None, image_key=None, scale=3, release_variant=None, tiling=None):
+    """
+    Générateur (nom_variante, résultats_bruts) : un passage OCR par variante.
+    En mode "full", `names` peut être un générateur (ex: PreprocessingExecutor.ready,
+    variantes lues dans l'ordre où elles sont prêtes).
+
+    mode="full"        : readtext (détection + reconnaissance) sur chaque variante.
+    mode="detect_once" : détection sur les variantes de `detect_on` (boîtes fusionnées),
+                         puis reconnaissance seule sur toutes les variantes.
+
+    Si `cache` (OcrCache) et `image_key` sont fournis, les résultats déjà connus
+    sont relus sans prétraitement ni OCR, les nouveaux y sont enregistrés.
+    `scale` (facteur du prétraitement) fait partie de la clé de cache.
+    `release_variant(nom)` est appelé quand une variante n'est plus utile
+    (ex: PreprocessingGraph.release, pour libérer sa mémoire au fil des passages).
+    `tiling` (src/tiling.Tiling) : en mode "full", chaque variante est lue par
+    tuiles qui se chevauchent (doublons des chevauchements retirés).
+    """
+    if mode not in ("full", "detect_once"):
+        raise ValueError(f"Mode OCR inconnu : {mode}")
+    params = ocr_params(mode, detect_on, scale, tiling, reader)
+
+    boxes = None
+    for method_name in names:
+        if cache is not None:
+            results = cache.get(image_key, method_name, params)
+            count("cache.hit" if results is not None else "cache.miss", variant=method_name)
+            if results is not None:
+                yield method_name, results
+                if release_variant is not None:
+                    release_variant(method_name)
+                continue
+
+        if mode == "detect_once" and boxes is None:
+            sources = [get_variant(name) for name in names if name in detect_on] or [get_variant(names[0])]
+            try:
+                boxes = detect_boxes(reader, sources)
+            except Exception:
+                return
+            del sources
+
+        img = get_variant(method_name)
         try:
-            results = reader.readtext(img, allowlist='ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+            with span("ocr.pass", variant=method_name, mode=mode):
+                results = _read_variant(reader, img, boxes, tiling)
         except Exception:
+            count("ocr.errors", variant=method_name)
+            results = None
+        del img
+
+        if results is None:
+            yield method_name, []
+        else:
+            count("ocr.boxes", len(results), variant=method_name)
+            if cache is not None:
+                cache.put(image_key, method_name, params, results)
+            yield method_name, results
+        if release_variant is not None:
+            release_variant(method_name)
+
+def collect_detections(passes, scale=1, table=None, image=0):
+    """
+    Range des passages OCR (nom_variante, résultats) dans une DetectionTable
+    (nouvelle, ou `table` existante avec l'indice `image` pour un lot d'images).
+    """
+    if table is None:
+        table = DetectionTable()
+    for method_name, results in passes:
+        _accumulate_results(table, results, scale, method_name, image)
+    return table
+
+def fuse_ocr_results(passes, scale=1, fusion=DEFAULT_FUSION):
+    """
+    Fusionne des passages OCR (nom_variante, résultats) en {lettre: Y}.
+    scale : facteur du prétraitement, pour ramener les Y dans le repère d'origine.
+    fusion : "mean" (moyenne simple, défaut) ou "weighted" (confiance + rejet
+    des doublons aberrants).
+    """
+    return collect_detections(passes, scale).chars(method=fusion)
+
+def run_ocr_pipeline(reader, processed_images, mode="full", detect_on=DEFAULT_DETECT_ON,
+                     cache=None, image_key=None, fusion=DEFAULT_FUSION, tiling=None, scale=3):
+    """
+    OCR de toutes les variantes et fusion des positions Y par lettre.
+    Voir ocr_passes pour `mode`, `detect_on`, `tiling` et le cache, fuse_ocr_results pour `fusion`.
+    scale : facteur avec lequel les variantes ont été prétraitées (Y ramenés dans
+    le repère d'origine, clé de cache).
+    processed_images : liste ou générateur (nom, image), ex: iter_processed_images.
+    En mode "full", les variantes sont consommées une par une.
+    """
+    if mode == "detect_once":
+        # La détection commune a besoin des variantes de `detect_on` avant le premier passage
+        images = dict(processed_images)
+        passes = ocr_passes(reader, images.__getitem__, list(images), mode,
+                            detect_on, cache, image_key, scale=scale, tiling=tiling)
+    else:
+        passes = (result for name, img in processed_images
+                  for result in ocr_passes(reader, lambda _, img=img: img, [name], mode,
+                                           detect_on, cache, image_key, scale=scale,
+                                           tiling=tiling))
+    return fuse_ocr_results(passes, scale=scale, fusion=fusion)
+
+def run_ocr_cascade(reader, get_variant, names, min_confidence=100, min_letters=8,
+                    mode="full", detect_on=DEFAULT_DETECT_ON, cache=None, image_key=None,
+                    scale=3, release_variant=None, fusion=DEFAULT_FUSION, tiling=None):
+    """
+    Mode cascade : ajoute les variantes une par une (dans l'ordre de `names`),
+    re-clusterise et re-score après chaque passage OCR, et s'arrête dès que
+    le layout gagnant atteint `min_confidence` avec au moins `min_letters` lettres.
+
+    `get_variant(nom)` calcule la variante à la demande : une variante jamais
+    atteinte n'est donc jamais prétraitée.
+    Les Y sont ramenés dans le repère de l'image d'origine (division par `scale`).
+    Retourne (validated_chars, nombre_de_passages_OCR).
+    """
+    table = DetectionTable()
+    passes = 0
+
+    for method_name, results in ocr_passes(reader, get_variant, names, mode, detect_on, cache,
+                                           image_key, scale, release_variant, tiling):
+        passes += 1
+        _accumulate_results(table, results, scale, method_name)
+
+        # Critère d'arrêt : assez de lettres ET gagnant net
+        if table.letters() < min_letters:
+            continue
+        char_rows = cluster_rows(table.chars(method=fusion))
+        if not char_rows:
             continue
-        
-        for (bbox, text, conf) in results:
-            if conf < 0.3: continue # 0.3 = tolerance
-            
-            char = clean_char(text)
-            if not char or not char.isalpha(): continue
+        best_layout, confidence, _ = score_layout(char_rows)
+        if best_layout in LAYOUT_RULES and confidence >= min_confidence:
+            break
 
-            # Centre Y
-            y_center = (bbox[0][1] + bbox[2][1]) / 2
+    return table.chars(method=fusion), passes
 
-            if char not in char_data:
-                char_data[char] = {'y_sum': 0, 'count': 0}
-            
-            char_data[char]['y_sum'] += y_center
-            char_data[char]['count'] += 1
+def _kmeans_rows(y_coords, n_clusters):
+    """Ancien clusterer (sklearn KMeans, 10 initialisations) : rangée par point"""
+    from sklearn.cluster import KMeans
 
-    # On garde les lettres vues au moins 1 fois (pour maximiser les chances)
-    validated_chars = {}
-    for char, data in char_data.items():
-        avg_y = data['y_sum'] / data['count']
-        validated_chars[char] = avg_y
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    labels = kmeans.fit_predict(y_coords.reshape(-1, 1))
+    centers = kmeans.cluster_centers_.flatten()
+    count("cluster.restarts", kmeans.n_init)
+    count("cluster.kmeans_iterations", int(kmeans.n_iter_))
 
-    return validated_chars
+    # On trie les centres pour savoir qui est HAUT (petit Y), MILIEU, BAS (grand Y)
+    sorted_indices = np.argsort(centers)
 
-def cluster_rows(validated_chars):
+    # Mapping du cluster ID vers le Row ID (0=Haut, 1=Milieu, 2=Bas)
+    map_cluster = {old_idx: new_idx for new_idx, old_idx in enumerate(sorted_indices)}
+    return [map_cluster[label] for label in labels]
+
+def cluster_rows(validated_chars, method="optimal"):
     """
-    K-MEANS 1D : Pour séparer 3 niveaux de hauteur.
+    Sépare les lettres en 3 niveaux de hauteur (0=Haut, 1=Milieu, 2=Bas).
+    method="optimal" : découpage 1D exact et déterministe (src/clustering.py).
+    method="kmeans"  : ancien K-Means sklearn (fallback).
     """
     if len(validated_chars) < 4:
         return None
 
-    y_coords = np.array(list(validated_chars.values())).reshape(-1, 1)
+    y_coords = np.array(list(validated_chars.values()), dtype=np.float64)
     
     # On tente de trouver 3 rangées. Si ça échoue (trop peu de points), on tente 2.
     n_clusters = 3
     if len(y_coords) < 3: n_clusters = len(y_coords)
 
     try:
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        labels = kmeans.fit_predict(y_coords)
-        centers = kmeans.cluster_centers_.flatten()
-        
-        # On trie les centres pour savoir qui est HAUT (petit Y), MILIEU, BAS (grand Y)
-        sorted_indices = np.argsort(centers)
-        
-        # Mapping du cluster ID vers le Row ID (0=Haut, 1=Milieu, 2=Bas)
-        map_cluster = {old_idx: new_idx for new_idx, old_idx in enumerate(sorted_indices)}
-        
-        char_rows = {}
-        chars_list = list(validated_chars.keys())
-        for i, char in enumerate(chars_list):
-            original_label = labels[i]
-            row_id = map_cluster[original_label]
-            char_rows[char] = row_id
-            
-        return char_rows
+        with span("cluster", method=method):
+            if method == "kmeans" or n_clusters != 3:
+                rows = _kmeans_rows(y_coords, n_clusters)
+            elif method == "optimal":
+                rows = optimal_rows(y_coords)
+            else:
+                raise ValueError(f"Méthode de clustering inconnue : {method}")
+
+        return {char: int(row) for char, row in zip(validated_chars.keys(), rows)}
     except Exception as e:
         print(f"Erreur clustering: {e}")
         return None
 
-def score_layout(char_to_row_map):
+def cluster_rows_batch(validated_chars_list):
     """
-    Nouveau système de scoring pondéré.
+    Version vectorisée de cluster_rows (méthode optimale) pour plusieurs images.
+    Retourne une liste alignée de {lettre: rangée} (ou None si < 4 lettres).
     """
-    scores = {k: 0 for k in LAYOUT_RULES.keys()}
-    
-    # On compte combien de lettres pertinentes on a trouvées au total
-    relevant_chars_found = 0
-
-    for char, detected_row in char_to_row_map.items():
-        # 0=TOP, 1=MID, 2=BOT
-        
-        relevant_chars_found += 1
-        
-        for layout_name, rules in LAYOUT_RULES.items():
-            
-            # --- RÈGLES POSITIVES (Bonus) ---
-            if detected_row == 0 and char in rules["TOP"]:
-                scores[layout_name] += 10 # Gros bonus si bonne lettre en haut
-                # Bonus Spécial AZERTY/QWERTY
-                if char in ['A', 'Q', 'Z', 'W']: scores[layout_name] += 15 
-
-            elif detected_row == 1 and char in rules["MID"]:
-                scores[layout_name] += 10
-                if char in ['A', 'Q', 'M']: scores[layout_name] += 15
-
-            elif detected_row == 2 and char in rules["BOT"]:
-                scores[layout_name] += 10
-                if char in ['W', 'Z', 'Y', 'M']: scores[layout_name] += 15
-
-            # --- RÈGLES NÉGATIVES (Malus / Contradiction) ---
-            # Si je vois un 'Q' en haut, ce N'EST PAS un AZERTY
-            if detected_row == 0 and char == 'Q':
-                scores['AZERTY'] -= 50
-            
-            # Si je vois un 'A' en haut, ce N'EST PAS un QWERTY/QWERTZ
-            if detected_row == 0 and char == 'A':
-                scores['QWERTY'] -= 50
-                scores['QWERTZ'] -= 50
-
-            # Si je vois un 'Z' en haut, ce N'EST PAS un QWERTY (Z est en bas)
-            if detected_row == 0 and char == 'Z':
-                scores['QWERTY'] -= 50
-                # C'est soit AZERTY soit QWERTZ
-
-            # Si je vois un 'Y' en bas, c'est probablement QWERTZ
-            if detected_row == 2 and char == 'Y':
-                scores['QWERTZ'] += 40
-                scores['QWERTY'] -= 20 # Y est en haut en QWERTY
-
-    # Normalisation et décision
-    if relevant_chars_found == 0:
-        return "INCONNU", 0, scores
+    eligible = [chars for chars in validated_chars_list if len(chars) >= 4]
+    rows_iter = iter(optimal_rows_batch([np.array(list(c.values()), dtype=np.float64)
+                                         for c in eligible]))
+    results = []
+    for chars in validated_chars_list:
+        if len(chars) < 4:
+            results.append(None)
+        else:
+            rows = next(rows_iter)
+            results.append({char: int(row) for char, row in zip(chars.keys(), rows)})
+    return results
 
+def _decide(scores):
+    """Choix du layout et confiance relative à partir des scores bruts"""
     best_layout = max(scores, key=scores.get)
     max_score = scores[best_layout]
     
@@ -197,4 +508,30 @@ def score_layout(char_to_row_map):
     if max_score <= 0:
         return "INCERTAIN", 0, scores
 
-    return best_layout, confidence, scores
\ No newline at end of file
+    return best_layout, confidence, scores
+
+def score_layout(char_to_row_map, registry=None):
+    """
+    Système de scoring pondéré : somme des poids du registre de layouts
+    pour chaque (lettre, rangée détectée). 0=TOP, 1=MID, 2=BOT.
+    """
+    registry = registry or DEFAULT_REGISTRY
+    
+    # Normalisation et décision
+    if not char_to_row_map:
+        return "INCONNU", 0, {k: 0 for k in registry.names}
+
+    with span("score"):
+        totals = registry.score_vector(char_to_row_map)
+    return _decide({name: int(v) for name, v in zip(registry.names, totals)})
+
+def score_layout_batch(char_to_row_maps, registry=None):
+    """Version vectorisée de score_layout pour un lot d'images (liste de triplets)"""
+    registry = registry or DEFAULT_REGISTRY
+    totals = registry.score_matrix(char_to_row_maps)
+
+    results = []
+    for char_to_row_map, row in zip(char_to_row_maps, totals):
+        scores = {name: int(v) for name, v in zip(registry.names, row)}
+        results.append(_decide(scores) if char_to_row_map else ("INCONNU", 0, scores))
+    return results
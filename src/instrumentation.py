@@ -0,0 +1,265 @@
+"""
+--------------------------------------------------------------------------------
+File: src/instrumentation.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Couche d'instrumentation (traces + compteurs) du pipeline de détection.
+    Le pipeline appelle span("nom", tag=...) et count("nom", n, tag=...) ;
+    les événements partent vers un "sink" interchangeable :
+        - MemorySink : agrégation en mémoire (+ export texte Prometheus)
+        - JsonlSink  : un événement JSON par ligne dans un fichier
+    Sans sink installé (défaut), span() renvoie un objet vide partagé et count()
+    sort immédiatement : le coût est quasi nul.
+    Fournit aussi la mesure de la mémoire du processus (RSS courant et pic).
+--------------------------------------------------------------------------------
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_sink = None
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("sink", "name", "tags", "start")
+
+    def __init__(self, sink, name, tags):
+        self.sink, self.name, self.tags = sink, name, tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.sink.span(self.name, time.perf_counter() - self.start, self.tags, exc_type is not None)
+        return False
+
+# --- API utilisée par le pipeline ---
+
+def enabled():
+    return _sink is not None
+
+def span(name, **tags):
+    """Mesure la durée d'un bloc `with span("ocr.pass", variant="LAB"):`"""
+    sink = _sink
+    if sink is None:
+        return _NULL_SPAN
+    return _Span(sink, name, tags)
+
+def count(name, value=1, **tags):
+    """Incrémente un compteur"""
+    sink = _sink
+    if sink is None:
+        return
+    sink.counter(name, value, tags)
+
+def set_sink(sink):
+    """Installe un sink (None = instrumentation désactivée). Retourne l'ancien."""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+def get_sink():
+    return _sink
+
+@contextlib.contextmanager
+def instrumented(sink):
+    previous = set_sink(sink)
+    try:
+        yield sink
+    finally:
+        set_sink(previous)
+
+# --- Sinks ---
+
+def _tag_key(tags):
+    return tuple(sorted(tags.items()))
+
+class MemorySink:
+    """Agrège durées (nombre, total, min, max) et compteurs par (nom, tags)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+
+    def span(self, name, seconds, tags, failed=False):
+        key = (name, _tag_key(tags))
+        with self._lock:
+            stats = self.spans.get(key)
+            if stats is None:
+                stats = self.spans[key] = {"count": 0, "total": 0.0, "min": seconds,
+                                           "max": seconds, "errors": 0}
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["min"] = min(stats["min"], seconds)
+            stats["max"] = max(stats["max"], seconds)
+            stats["errors"] += failed
+
+    def counter(self, name, value, tags):
+        key = (name, _tag_key(tags))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """Texte lisible trié par temps total décroissant"""
+        lines = [f"{'Span':<40}{'N':>7}{'Total (s)':>11}{'Moy. (ms)':>11}{'Max (ms)':>10}"]
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda kv: -kv[1]["total"])
+            counters = sorted(self.counters.items())
+        for (name, tags), s in spans:
+            label = name + "".join(f" {k}={v}" for k, v in tags)
+            lines.append(f"{label:<40}{s['count']:>7}{s['total']:>11.3f}"
+                         f"{1000 * s['total'] / s['count']:>11.1f}{1000 * s['max']:>10.1f}")
+        if counters:
+            lines.append("")
+            lines.append(f"{'Compteur':<40}{'Valeur':>10}")
+            for (name, tags), value in counters:
+                label = name + "".join(f" {k}={v}" for k, v in tags)
+                lines.append(f"{label:<40}{value:>10}")
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix="keydetect"):
+        """Export au format texte Prometheus (exposition 0.0.4)"""
+        def labels(items):
+            if not items:
+                return ""
+            escaped = ((k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+        def metric_name(name):
+            return prefix + "_" + "".join(c if c.isalnum() else "_" for c in name)
+
+        with self._lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+
+        lines = [f"# TYPE {prefix}_span_seconds summary"]
+        for (name, tags), s in spans:
+            lbl = labels((("span", name),) + tags)
+            lines.append(f"{prefix}_span_seconds_sum{lbl} {s['total']}")
+            lines.append(f"{prefix}_span_seconds_count{lbl} {s['count']}")
+
+        seen = set()
+        for (name, tags), value in counters:
+            metric = metric_name(name) + "_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{labels(tags)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="keydetect"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+
+class JsonlSink:
+    """
+    Écrit chaque événement sur une ligne JSON (ajout en fin de fichier).
+    Utilisable par plusieurs processus sur le même fichier.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _write(self, event):
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            if self._file is None or self._pid != os.getpid():
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._pid = os.getpid()
+            self._file.write(line)
+
+    def span(self, name, seconds, tags, failed=False):
+        self._write({"ts": time.time(), "pid": os.getpid(), "type": "span", "name": name,
+                     "seconds": seconds, "tags": tags, "error": failed})
+
+    def counter(self, name, value, tags):
+        self._write({"ts": time.time(), "pid": os.getpid(), "type": "counter", "name": name,
+                     "value": value, "tags": tags})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class MultiSink:
+    """Diffuse les événements vers plusieurs sinks"""
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def span(self, name, seconds, tags, failed=False):
+        for sink in self.sinks:
+            sink.span(name, seconds, tags, failed)
+
+    def counter(self, name, value, tags):
+        for sink in self.sinks:
+            sink.counter(name, value, tags)
+
+# --- MESURE MÉMOIRE ---
+
+def _proc_status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss():
+    """Remet à zéro le pic RSS du processus (Linux uniquement). Retourne True si possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def current_rss_mb():
+    """RSS actuel en Mo (Linux uniquement, None sinon)"""
+    return _proc_status_mb("VmRSS")
+
+def peak_rss_mb():
+    """Pic RSS en Mo (depuis le dernier reset sous Linux, depuis le démarrage sinon)"""
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
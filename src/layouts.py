@@ -0,0 +1,93 @@
+"""
+--------------------------------------------------------------------------------
+File: src/layouts.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Registre déclaratif des layouts clavier (fichiers JSON de data/layouts).
+    Chaque fichier décrit, par rangée (TOP/MID/BOT) :
+        - markers     : lettres attendues (+marker_points chacune)
+        - bonus       : points en plus pour les lettres discriminantes
+        - adjustments : bonus/malus appliqués quelle que soit la liste des marqueurs
+        - keys        : rangée complète des touches (utilisée seulement par le
+                        générateur d'images synthétiques, src/synthetic.py)
+    Le registre est compilé en un tenseur de poids W[lettre, rangée, layout] :
+    le score d'une image devient une simple somme de poids (gather NumPy),
+    et peut être calculé pour un lot d'images en un seul passage.
+--------------------------------------------------------------------------------
+"""
+
+import glob
+import json
+import os
+import string
+
+import numpy as np
+
+ROW_NAMES = ("TOP", "MID", "BOT")
+LAYOUTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "layouts")
+
+class LayoutRegistry:
+    """
+    Registre compilé.
+    weights : int64 (nb_lettres + 1, 4, nb_layouts). La dernière lettre et la
+    dernière rangée sont des entrées neutres (lettre inconnue / rangée hors 0-2).
+    """
+    def __init__(self, definitions, alphabet=string.ascii_uppercase):
+        self.definitions = list(definitions)
+        self.names = [d["name"] for d in self.definitions]
+        self.alphabet = alphabet
+        self.char_index = {c: i for i, c in enumerate(alphabet)}
+
+        weights = np.zeros((len(alphabet) + 1, len(ROW_NAMES) + 1, len(self.names)), dtype=np.int64)
+        for k, layout in enumerate(self.definitions):
+            for r, row in enumerate(ROW_NAMES):
+                for char in layout.get("markers", {}).get(row, ""):
+                    weights[self.char_index[char], r, k] += layout.get("marker_points", 10)
+                for section in ("bonus", "adjustments"):
+                    for char, points in layout.get(section, {}).get(row, {}).items():
+                        weights[self.char_index[char], r, k] += points
+        self.weights = weights
+
+    @property
+    def rules(self):
+        """Vue historique {layout: {"TOP": set, "MID": set, "BOT": set}}"""
+        return {d["name"]: {row: set(d.get("markers", {}).get(row, "")) for row in ROW_NAMES}
+                for d in self.definitions}
+
+    def _indices(self, char_to_row_map):
+        unknown_char, unknown_row = len(self.alphabet), len(ROW_NAMES)
+        chars = np.fromiter((self.char_index.get(c, unknown_char) for c in char_to_row_map),
+                            dtype=np.int64, count=len(char_to_row_map))
+        rows = np.fromiter((r if r in (0, 1, 2) else unknown_row for r in char_to_row_map.values()),
+                           dtype=np.int64, count=len(char_to_row_map))
+        return chars, rows
+
+    def score_vector(self, char_to_row_map):
+        """Scores bruts (un par layout) d'une image {lettre: rangée}"""
+        chars, rows = self._indices(char_to_row_map)
+        return self.weights[chars, rows].sum(axis=0)
+
+    def score_matrix(self, char_to_row_maps):
+        """Scores bruts (nb_images, nb_layouts) d'un lot d'images"""
+        totals = np.zeros((len(char_to_row_maps), len(self.names)), dtype=np.int64)
+        parts = [self._indices(m) + (np.full(len(m), i, dtype=np.int64),)
+                 for i, m in enumerate(char_to_row_maps) if m]
+        if parts:
+            chars, rows, images = (np.concatenate(p) for p in zip(*parts))
+            np.add.at(totals, images, self.weights[chars, rows])
+        return totals
+
+def load_registry(folder=LAYOUTS_DIR):
+    """Charge tous les *.json du dossier (ordre alphabétique des fichiers)"""
+    definitions = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            definitions.append(json.load(f))
+    return LayoutRegistry(definitions)
+
+DEFAULT_REGISTRY = load_registry()
@@ -0,0 +1,187 @@
+"""
+--------------------------------------------------------------------------------
+File: src/pipeline.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Enchaînement complet pour une image déjà chargée :
+    Prétraitement -> OCR -> Clustering -> Scoring.
+    Renvoie un dictionnaire de résultat réutilisable par la console,
+    le GUI et les benchmarks (sans affichage).
+--------------------------------------------------------------------------------
+"""
+
+import time
+
+from src.preprocessing import PreprocessingGraph, VARIANTS, DEFAULT_SCALE, DEFAULT_POOL
+from src.engine import (run_ocr_cascade, cluster_rows, score_layout, ocr_passes, fuse_ocr_results,
+                        estimate_scale, TARGET_CHAR_HEIGHT)
+from src.budget import run_ocr_budget, budget_scale, choose_scale, DEFAULT_COST_MODEL
+from src.detections import DEFAULT_FUSION
+from src.cache import image_key
+from src.dataset import decode_image, reduction_for_scale
+from src.instrumentation import span
+
+def detect_layout(reader, img, min_chars=4, cascade=False, min_confidence=100,
+                  min_letters=8, ocr_mode="full", variants=VARIANTS, cache=None,
+                  scale=DEFAULT_SCALE, target_height=TARGET_CHAR_HEIGHT, graph=None,
+                  budget=None, cost_model=None, tiling=None, executor=None,
+                  fusion=DEFAULT_FUSION):
+    """
+    Analyse une image BGR et retourne un dict :
+        layout, confidence, scores, chars (lettre -> Y), rows (lettre -> rangée),
+        passes (nombre de passages OCR effectués), scale (facteur utilisé).
+    Les Y de `chars` sont exprimés dans le repère de l'image d'origine.
+    layout vaut "Pas assez de lettres" / "Echec Cluster" en cas d'échec.
+    Avec `cache` (OcrCache), les variantes déjà lues ne sont ni prétraitées ni OCRisées.
+    scale="auto" : facteur choisi pour amener les lettres à `target_height` px.
+    graph : PreprocessingGraph déjà (partiellement) calculé pour `img` (son échelle
+    remplace alors `scale`), ex: prétraitement fait en amont par le mode streaming.
+    budget : temps maximal en secondes (voir src/budget.py). L'échelle (au plus
+    `scale`), l'ordre des variantes et le débruitage sont choisis d'après les
+    coûts mesurés (`cost_model`, DEFAULT_COST_MODEL par défaut) ; arrêt anticipé
+    comme en cascade, OCR complet sur chaque variante (ocr_mode ignoré).
+    Le résultat contient alors aussi partial (variantes sautées ou dégradées),
+    skipped, degraded, budget et elapsed. Avec `graph`, son échelle sert de maximum :
+    si le budget impose un facteur plus petit, le graphe est refait à ce facteur
+    (l'ancien est fermé, ses variantes déjà calculées sont perdues).
+    tiling : src/tiling.Tiling, OCR par tuiles des grandes variantes (mode "full").
+    executor : PreprocessingExecutor, variantes prétraitées en parallèle et lues
+    par l'OCR dans l'ordre où elles sont prêtes (fusion dans l'ordre de `variants`).
+    Seulement en mode "full" sans cascade, budget ni cache (qui restent paresseux).
+    fusion : "mean" (défaut) ou "weighted", voir src/detections.py.
+    """
+    with span("detect_layout"):
+        if budget is not None:
+            return _detect_layout_budget(reader, img, min_chars, min_confidence, min_letters,
+                                         variants, cache, scale, target_height, graph,
+                                         budget, cost_model, tiling, fusion)
+        return _detect_layout(reader, img, min_chars, cascade, min_confidence, min_letters,
+                              ocr_mode, variants, cache, scale, target_height, graph, tiling,
+                              executor, fusion)
+
+def _detect_layout(reader, img, min_chars, cascade, min_confidence, min_letters,
+                   ocr_mode, variants, cache, scale, target_height, graph, tiling, executor,
+                   fusion):
+    if graph is not None:
+        scale = graph.scale
+    else:
+        if scale == "auto":
+            scale = estimate_scale(reader, img, target_height)
+        graph = PreprocessingGraph(img, scale=scale, pool=DEFAULT_POOL)
+    key = image_key(img) if cache is not None else None
+    # Chaque variante (et ses étapes intermédiaires) est libérée après son passage OCR
+    graph.plan(variants)
+
+    if cascade:
+        chars, passes = run_ocr_cascade(reader, graph.get, variants,
+                                        min_confidence=min_confidence,
+                                        min_letters=min_letters, mode=ocr_mode,
+                                        cache=cache, image_key=key, scale=scale,
+                                        release_variant=graph.release, tiling=tiling,
+                                        fusion=fusion)
+    elif executor is not None and ocr_mode == "full" and cache is None:
+        # Variantes calculées en parallèle, chacune lue dès qu'elle est prête ;
+        # fusion dans l'ordre canonique (résultat identique au mode séquentiel)
+        results = dict(ocr_passes(reader, graph.get, executor.ready(graph, variants),
+                                  scale=scale, release_variant=graph.release, tiling=tiling))
+        chars = fuse_ocr_results(((name, results[name]) for name in variants), scale=scale,
+                                 fusion=fusion)
+        passes = len(variants)
+    else:
+        # Prétraitement paresseux : une variante trouvée en cache n'est jamais calculée
+        chars = fuse_ocr_results(ocr_passes(reader, graph.get, variants, ocr_mode,
+                                            cache=cache, image_key=key, scale=scale,
+                                            release_variant=graph.release, tiling=tiling),
+                                 scale=scale, fusion=fusion)
+        passes = len(variants)
+
+    result = classify_chars(chars, min_chars)
+    result["passes"] = passes
+    result["scale"] = scale
+    return result
+
+def _detect_layout_budget(reader, img, min_chars, min_confidence, min_letters, variants,
+                          cache, scale, target_height, graph, budget, cost_model, tiling,
+                          fusion):
+    start = time.perf_counter()
+    deadline = start + budget
+    if graph is None:
+        scale = budget_scale(reader, img, variants, deadline, cost_model, scale, target_height)
+        graph = PreprocessingGraph(img, scale=scale, pool=DEFAULT_POOL)
+    else:
+        # Graphe préparé en amont (ex: streaming) : son échelle est un maximum
+        scale = choose_scale(cost_model or DEFAULT_COST_MODEL, img.shape[:2], variants,
+                             deadline - time.perf_counter(), graph.scale)
+        if scale < graph.scale:
+            graph.close()
+            graph = PreprocessingGraph(img, scale=scale, pool=DEFAULT_POOL)
+    key = image_key(img) if cache is not None else None
+
+    chars, passes, report = run_ocr_budget(reader, graph, variants, deadline, cost_model,
+                                           min_confidence=min_confidence,
+                                           min_letters=min_letters, cache=cache, image_key=key,
+                                           fusion=fusion, tiling=tiling)
+    result = classify_chars(chars, min_chars)
+    result.update(passes=passes, scale=graph.scale, partial=report["partial"],
+                  skipped=report["skipped"], degraded=report["degraded"],
+                  budget=budget, elapsed=time.perf_counter() - start)
+    return result
+
+def detect_layout_encoded(reader, data, reduced_decode=False, probe_reduction=2, **options):
+    """
+    Comme detect_layout, mais depuis une image encodée (bytes d'un fichier ou
+    d'un membre d'archive), décodée en mémoire.
+
+    reduced_decode=True : décode à résolution réduite quand le prétraitement
+    n'a pas besoin de la pleine résolution :
+        - scale numérique < 1 : réduction 2/4/8 puis facteur compensé ;
+        - scale="auto" : estimation sur l'image réduite de `probe_reduction`,
+          gardée si elle doit de toute façon être réduite, sinon re-décodage complet.
+    Les Y de `chars` restent exprimés dans le repère de l'image pleine résolution.
+    None si l'image est illisible ; la réduction utilisée est dans "decode_reduction".
+    """
+    scale = options.pop("scale", DEFAULT_SCALE)
+    if reduced_decode and scale == "auto":
+        probe = decode_image(data, probe_reduction)
+        if probe is None:
+            return None
+        probe_scale = estimate_scale(reader, probe, options.get("target_height", TARGET_CHAR_HEIGHT))
+        if probe_scale <= 1:
+            img, reduction, scale = probe, probe_reduction, probe_scale
+        else:
+            img, reduction, scale = decode_image(data), 1, probe_scale / probe_reduction
+    else:
+        reduction = reduction_for_scale(scale) if reduced_decode else 1
+        img = decode_image(data, reduction)
+        if reduction > 1:
+            scale = scale * reduction
+    if img is None:
+        return None
+
+    result = detect_layout(reader, img, scale=scale, **options)
+    if reduction > 1:
+        result["chars"] = {c: y * reduction for c, y in result["chars"].items()}
+    result["decode_reduction"] = reduction
+    return result
+
+def classify_chars(chars, min_chars=4):
+    """Clustering + Scoring de lettres déjà fusionnées ({lettre: Y})"""
+    result = {"layout": "Pas assez de lettres", "confidence": 0, "scores": {},
+              "chars": chars, "rows": None}
+
+    if len(chars) < min_chars:
+        return result
+
+    char_rows = cluster_rows(chars)
+    if not char_rows:
+        result["layout"] = "Echec Cluster"
+        return result
+
+    best_layout, confidence, scores = score_layout(char_rows)
+    result.update(layout=best_layout, confidence=confidence, scores=scores, rows=char_rows)
+    return result
@@ -6,88 +6,463 @@ Author:
     Théo MERTENS
     Baris OZCELIK
     Khassan AKTAMIROV
-    
-Description: 
+
+Description:
     Module de traitement d'image utilisant OpenCV.
     Fournit plusieurs méthodes (Adaptive Threshold, LAB Channel, Inversion)
-    pour préparer l'image avant l'OCR, afin de gérer les reflets, 
+    pour préparer l'image avant l'OCR, afin de gérer les reflets,
     les ombres et les claviers à fort contraste (touches noires/lettres blanches).
+
+    Les méthodes sont décrites sous forme d'un petit graphe de dépendances :
+    les étapes communes (upscale x3, niveaux de gris, canal L) ne sont
+    calculées qu'une seule fois par image puis partagées entre les variantes.
+    Le facteur d'échelle (x3 par défaut) peut être adapté à la résolution.
+    En mode économe (plan/release, iter_processed_images), chaque noeud est
+    libéré dès qu'il n'est plus utile et les buffers sont réutilisés (BufferPool).
+    PreprocessingExecutor calcule les variantes d'une image en parallèle.
 --------------------------------------------------------------------------------
 """
 
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import cv2
 import numpy as np
 
-def method_adaptive_threshold(img):
-    """Méthode 1: Contraste local agressif (bon pour les reflets)"""
-    # Upscale pour aider l'OCR
-    img_upscaled = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.cvtColor(img_upscaled, cv2.COLOR_BGR2GRAY)
-    
+from src.instrumentation import span
+
+# --- POOL DE BUFFERS ---
+
+class BufferPool:
+    """
+    Réserve de tableaux NumPy réutilisables, rangés par (forme, type).
+    Les étapes OpenCV écrivent directement dedans (paramètre dst) au lieu
+    d'allouer un nouveau tableau de plusieurs dizaines de Mo à chaque image.
+    Partagée entre threads (verrou) ; au-delà de `max_bytes` de buffers libres,
+    les tableaux rendus sont simplement abandonnés au ramasse-miettes.
+    Un buffer libre ne doit pas gonfler le pic mémoire : quand une allocation
+    neuve est nécessaire, des buffers libres d'autres formes (les plus anciens)
+    sont d'abord rendus au système pour au moins autant d'octets.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._free = {}
+        self._order = []  # clés des buffers libres, du plus ancien au plus récent
+        self._free_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            buffers = self._free.get(key)
+            if buffers:
+                buf = buffers.pop()
+                self._order.remove(key)
+                self._free_bytes -= buf.nbytes
+                self.hits += 1
+                return buf
+            self.misses += 1
+            self._trim(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        return np.empty(shape, dtype=dtype)
+
+    def _trim(self, nbytes):
+        """Abandonne des buffers libres (plus anciens d'abord) pour au moins `nbytes` octets"""
+        while nbytes > 0 and self._order:
+            key = self._order.pop(0)
+            buf = self._free[key].pop(0)
+            self._free_bytes -= buf.nbytes
+            nbytes -= buf.nbytes
+
+    def release(self, buf):
+        if buf is None or not buf.flags.owndata or not buf.flags.c_contiguous:
+            return
+        with self._lock:
+            if self._free_bytes + buf.nbytes > self.max_bytes:
+                return
+            key = (buf.shape, buf.dtype)
+            self._free.setdefault(key, []).append(buf)
+            self._order.append(key)
+            self._free_bytes += buf.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self._order.clear()
+            self._free_bytes = 0
+
+# Pool partagé par défaut (utilisé par iter_processed_images et detect_layout)
+DEFAULT_POOL = BufferPool()
+
+def _buffer(pool, shape, dtype=np.uint8):
+    """Buffer de sortie pour OpenCV (None = laisser OpenCV allouer)"""
+    return pool.acquire(shape, dtype) if pool is not None else None
+
+def _recycle(pool, buf):
+    if pool is not None:
+        pool.release(buf)
+
+# --- ÉTAPES INTERMÉDIAIRES (partagées entre les méthodes) ---
+# Chaque étape accepte un `pool` optionnel pour ses buffers (sortie et temporaires).
+
+# Facteur d'échelle historique (x3)
+DEFAULT_SCALE = 3
+
+def _upscale(img, scale=DEFAULT_SCALE, pool=None):
+    # Upscale pour aider l'OCR (ou downscale des très grandes photos si scale < 1)
+    if scale == 1:
+        return img
+    interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+    # Même taille que celle calculée par OpenCV à partir de fx/fy (sinon dst est réalloué)
+    shape = (round(img.shape[0] * scale), round(img.shape[1] * scale)) + img.shape[2:]
+    return cv2.resize(img, None, dst=_buffer(pool, shape, img.dtype), fx=scale, fy=scale,
+                      interpolation=interpolation)
+
+def _to_gray(img_upscaled, pool=None):
+    return cv2.cvtColor(img_upscaled, cv2.COLOR_BGR2GRAY,
+                        dst=_buffer(pool, img_upscaled.shape[:2]))
+
+# Conversion LAB par bandes de lignes : évite une image LAB complète (3 canaux)
+# alors que seul le canal L est utilisé (conversion pixel à pixel -> résultat identique)
+LAB_STRIP_ROWS = 256
+
+def _lab_luminance(img_upscaled, pool=None):
+    height = img_upscaled.shape[0]
+    l_channel = _buffer(pool, img_upscaled.shape[:2])
+    if l_channel is None:
+        l_channel = np.empty(img_upscaled.shape[:2], dtype=np.uint8)
+    for y in range(0, height, LAB_STRIP_ROWS):
+        lab = cv2.cvtColor(img_upscaled[y:y + LAB_STRIP_ROWS], cv2.COLOR_BGR2LAB)
+        l_channel[y:y + LAB_STRIP_ROWS] = lab[:, :, 0]
+    return l_channel
+
+def _otsu_black_text(channel, pool=None):
+    """Binarisation Otsu + heuristique d'inversion (texte noir sur fond blanc)"""
+    _, binary = cv2.threshold(channel, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+                              dst=_buffer(pool, channel.shape))
+
+    # Heuristique : Si l'image est majoritairement noire, on inverse
+    # (image binaire 0/255 : countNonZero = nombre de pixels blancs, sans tableau temporaire)
+    white = cv2.countNonZero(binary)
+    if binary.size - white > white:
+        binary = cv2.bitwise_not(binary, dst=binary)
+
+    return binary
+
+# --- VARIANTES FINALES (à partir des étapes partagées) ---
+
+ADAPTIVE_BLOCK_SIZE = 31
+ADAPTIVE_STRIP_ROWS = 256
+
+def _adaptive_threshold(inverted, pool=None):
+    # Seuil adaptatif (par bandes : le flou gaussien interne d'OpenCV coûte
+    # plusieurs fois la taille de l'image ; une marge de blockSize // 2 lignes
+    # autour de chaque bande donne exactement le même résultat)
+    binary = _buffer(pool, inverted.shape)
+    if binary is None:
+        binary = np.empty_like(inverted)
+    height, margin = inverted.shape[0], ADAPTIVE_BLOCK_SIZE // 2
+    for y in range(0, height, ADAPTIVE_STRIP_ROWS):
+        y0, y1 = max(0, y - margin), min(height, y + ADAPTIVE_STRIP_ROWS + margin)
+        strip = cv2.adaptiveThreshold(
+            inverted[y0:y1], 255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY,
+            blockSize=ADAPTIVE_BLOCK_SIZE, # Fenêtre large
+            C=10
+        )
+        rows = min(ADAPTIVE_STRIP_ROWS, height - y)
+        binary[y:y + rows] = strip[y - y0:y - y0 + rows]
+    return binary
+
+def _adaptive_from_gray(gray, pool=None):
     # Denoising
-    gray = cv2.fastNlMeansDenoising(gray, h=10)
-    
+    denoised = cv2.fastNlMeansDenoising(gray, dst=_buffer(pool, gray.shape), h=10)
+
     # Inversion (Texte blanc sur noir devient Noir sur Blanc)
-    gray = cv2.bitwise_not(gray)
-    
-    # Seuil adaptatif
-    binary = cv2.adaptiveThreshold(
-        gray, 255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY,
-        blockSize=31, # Fenêtre large
-        C=10
-    )
+    denoised = cv2.bitwise_not(denoised, dst=denoised)
+
+    binary = _adaptive_threshold(denoised, pool)
+    _recycle(pool, denoised)
     return binary
 
+def _adaptive_fast_from_gray(gray, pool=None):
+    # Comme Adaptive, sans le débruitage (de loin l'étape la plus chère) :
+    # repli du mode budget quand Adaptive ne tient plus dans le temps restant
+    inverted = cv2.bitwise_not(gray, dst=_buffer(pool, gray.shape))
+    binary = _adaptive_threshold(inverted, pool)
+    _recycle(pool, inverted)
+    return binary
+
+def _inverted_from_gray(gray, pool=None):
+    return cv2.bitwise_not(gray, dst=_buffer(pool, gray.shape))
+
+def _clahe_from_gray(gray, pool=None):
+    # Application du CLAHE (Égalisation locale d'histogramme)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    enhanced = clahe.apply(gray, dst=_buffer(pool, gray.shape))
+
+    # Binarisation après rehaussement de contraste
+    # On utilise Otsu qui s'adapte bien après un CLAHE
+    binary = _otsu_black_text(enhanced, pool)
+    _recycle(pool, enhanced)
+    return binary
+
+# --- GRAPHE DE DÉPENDANCES ---
+# nom_du_noeud -> (dépendance, fonction). "source" = image BGR d'origine.
+PREPROCESSING_GRAPH = {
+    "upscaled": ("source", _upscale),
+    "gray":     ("upscaled", _to_gray),
+    "lab_l":    ("upscaled", _lab_luminance),
+    "Adaptive": ("gray", _adaptive_from_gray),
+    "AdaptiveFast": ("gray", _adaptive_fast_from_gray),
+    "LAB":      ("lab_l", _otsu_black_text),
+    "Inverted": ("gray", _inverted_from_gray),
+    "CLAHE":    ("gray", _clahe_from_gray),
+}
+
+# Ordre des variantes envoyées à l'OCR (AdaptiveFast n'est qu'un repli du mode budget)
+VARIANTS = ("Adaptive", "LAB", "Inverted", "CLAHE")
+
+class PreprocessingGraph:
+    """
+    Évalue paresseusement les noeuds du graphe pour UNE image.
+    Chaque noeud est calculé au plus une fois puis mis en cache.
+
+    Mode économe en mémoire : plan(noms) compte qui a encore besoin de chaque
+    noeud ; release(nom) signale qu'une variante a été consommée. Un noeud
+    dont plus personne n'a besoin est retiré du cache et son buffer rendu au pool.
+    Une variante libérée ne doit donc plus être utilisée par l'appelant.
+
+    Utilisable depuis plusieurs threads (PreprocessingExecutor) : un noeud en
+    cours de calcul par un thread est attendu par les autres, pas recalculé.
+    """
+    def __init__(self, img, graph=PREPROCESSING_GRAPH, scale=DEFAULT_SCALE, pool=None):
+        self.graph = graph
+        self.scale = scale
+        self.pool = pool
+        if scale != DEFAULT_SCALE:
+            self.graph = dict(graph, upscaled=("source", functools.partial(_upscale, scale=scale)))
+        self._cache = {"source": img}
+        self._refs = {}
+        self._requested = set()
+        self._computing = {}  # noeud -> Event, le temps de son calcul
+        self._lock = threading.Lock()
+
+    def get(self, node):
+        with self._lock:
+            if node in self._cache:
+                return self._cache[node]
+            done = self._computing.get(node)
+            if done is None:
+                done = self._computing[node] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # Calculé par un autre thread : on attend (et on recommence s'il a échoué)
+            done.wait()
+            return self.get(node)
+
+        try:
+            parent, func = self.graph[node]
+            source = self.get(parent)
+            with span("preprocess", node=node):
+                value = func(source, pool=self.pool)
+            with self._lock:
+                self._cache[node] = value
+                siblings = self._pending_siblings(node, parent) if node in self._refs else None
+        finally:
+            with self._lock:
+                del self._computing[node]
+            done.set()
+
+        if siblings is not None:
+            # Les autres étapes intermédiaires issues du même parent sont calculées
+            # tout de suite : le parent (souvent l'upscale 3 canaux) est libéré plus tôt
+            for sibling in siblings:
+                self.get(sibling)
+            # Ce noeud est calculé : il n'a plus besoin de son parent
+            with self._lock:
+                self._drop_ref(parent)
+        return value
+
+    def _pending_siblings(self, node, parent):
+        return [other for other, (other_parent, _) in self.graph.items()
+                if other_parent == parent and other != node and other in self._refs
+                and other not in self._cache and other not in self._computing
+                and other not in self._requested]
+
+    def pending_nodes(self, node):
+        """
+        Noeuds que get(node) calculerait maintenant, dans l'ordre : ancêtres
+        manquants, le noeud, et les étapes intermédiaires soeurs calculées d'avance.
+        """
+        if node in self._cache:
+            return []
+        parent = self.graph[node][0]
+        nodes = self.pending_nodes(parent) + [node]
+        if node in self._refs:
+            nodes += self._pending_siblings(node, parent)
+        return nodes
+
+    def plan(self, names):
+        """
+        Déclare les variantes qui seront demandées (puis libérées) une à une.
+        Une variante déjà déclarée ne l'est pas deux fois (graphe préparé en amont,
+        ex: étape de prétraitement du mode streaming, puis detect_layout).
+        """
+        def claim(node):
+            if node == "source":
+                return
+            first = node not in self._refs
+            self._refs[node] = self._refs.get(node, 0) + 1
+            if first and node not in self._cache:
+                claim(self.graph[node][0])
+
+        with self._lock:
+            names = [name for name in dict.fromkeys(names) if name not in self._requested]
+            self._requested.update(names)
+            for name in names:
+                claim(name)
+        return self
+
+    def release(self, name):
+        """La variante `name` a été consommée (lue par l'OCR ou trouvée en cache)"""
+        with self._lock:
+            self._drop_ref(name)
+
+    def _drop_ref(self, node):
+        if node not in self._refs:
+            return
+        self._refs[node] -= 1
+        if self._refs[node] > 0:
+            return
+        del self._refs[node]
+        if node in self._cache:
+            buf = self._cache.pop(node)
+            if self.pool is not None and buf is not self._cache["source"]:
+                self.pool.release(buf)
+        else:
+            # Jamais calculé (ex: variante trouvée en cache) : le parent n'en a plus besoin
+            self._drop_ref(self.graph[node][0])
+
+    def close(self):
+        """Graphe abandonné : rend au pool tous les buffers encore gardés (sauf la source)"""
+        with self._lock:
+            source = self._cache["source"]
+            if self.pool is not None:
+                for node, buf in self._cache.items():
+                    if node != "source" and buf is not source:
+                        self.pool.release(buf)
+            self._cache = {"source": source}
+            self._refs.clear()
+            self._requested.clear()
+
+    def variants(self, names=VARIANTS):
+        return [(name, self.get(name)) for name in names]
+
+    def iter_variants(self, names=VARIANTS):
+        """
+        Générateur (nom, image) : une variante à la fois, libérée (et son buffer
+        réutilisé) dès que l'itération reprend. Ne pas conserver les images produites.
+        """
+        self.plan(names)
+        for name in names:
+            yield name, self.get(name)
+            self.release(name)
+
+# --- PRÉTRAITEMENT PARALLÈLE (variantes d'une même image) ---
+
+class PreprocessingExecutor:
+    """
+    Pool de threads partagé qui calcule les variantes d'une image en même
+    temps (les appels OpenCV relâchent le GIL) : l'OCR d'une variante peut
+    commencer dès qu'elle est prête, sans attendre le débruitage d'Adaptive.
+
+    Les threads internes d'OpenCV sont répartis entre les workers : à la
+    création du pool, cv2.setNumThreads(threads_OpenCV_actuels // workers),
+    sauf si `opencv_threads` est donné. Le réglage OpenCV étant global au
+    processus, un seul pool devrait servir par processus.
+    Le pool est créé au premier usage (l'objet reste picklable pour les workers batch).
+    """
+    def __init__(self, workers=None, opencv_threads=None):
+        self.workers = workers or min(len(VARIANTS), os.cpu_count() or 1)
+        self.opencv_threads = opencv_threads
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"workers": self.workers, "opencv_threads": self.opencv_threads}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self.opencv_threads is None:
+                    self.opencv_threads = max(1, cv2.getNumThreads() // self.workers)
+                cv2.setNumThreads(self.opencv_threads)
+                self._executor = ThreadPoolExecutor(self.workers,
+                                                    thread_name_prefix="preprocess")
+            return self._executor
+
+    def ready(self, graph, names=VARIANTS):
+        """
+        Lance le calcul de toutes les variantes de `names` dans `graph` et
+        génère leurs noms dans l'ordre où elles sont prêtes (graph.get(nom)
+        est alors immédiat). Une erreur de prétraitement est relancée ici.
+        """
+        futures = {self._pool().submit(graph.get, name): name for name in names}
+        for future in as_completed(futures):
+            future.result()
+            yield futures[future]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+# --- API HISTORIQUE (une méthode = une variante) ---
+
+def method_adaptive_threshold(img):
+    """Méthode 1: Contraste local agressif (bon pour les reflets)"""
+    return PreprocessingGraph(img).get("Adaptive")
+
 def method_lab_channel(img):
     """Méthode 2: Canal de Luminance (bon pour les claviers colorés)"""
-    img_upscaled = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    lab = cv2.cvtColor(img_upscaled, cv2.COLOR_BGR2LAB)
-    l_channel, _, _ = cv2.split(lab)
-    
-    # Threshold simple sur la luminance
-    _, binary = cv2.threshold(l_channel, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    # Heuristique : Si l'image est majoritairement noire, on inverse
-    if np.sum(binary == 0) > np.sum(binary == 255):
-        binary = cv2.bitwise_not(binary)
-        
-    return binary
+    return PreprocessingGraph(img).get("LAB")
 
 def method_simple_inversion(img):
     """Méthode 3: Simple inversion (Fallback)"""
-    img_upscaled = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.cvtColor(img_upscaled, cv2.COLOR_BGR2GRAY)
-    return cv2.bitwise_not(gray)
+    return PreprocessingGraph(img).get("Inverted")
 
 def method_clahe_contrast(img):
     """
     Méthode 4: CLAHE (Contrast Limited Adaptive Histogram Equalization)
     Pour normaliser l'éclairage hétérogène (ombre/lumière).
     """
-    img_upscaled = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.cvtColor(img_upscaled, cv2.COLOR_BGR2GRAY)
-    
-    # Application du CLAHE (Égalisation locale d'histogramme)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(gray)
-    
-    # Binarisation après rehaussement de contraste
-    # On utilise Otsu qui s'adapte bien après un CLAHE
-    _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    # Heuristique d'inversion (on veut du texte noir sur fond blanc)
-    if np.sum(binary == 0) > np.sum(binary == 255):
-        binary = cv2.bitwise_not(binary)
-        
-    return binary
+    return PreprocessingGraph(img).get("CLAHE")
 
-def get_processed_images(img):
-    """Retourne une liste de tuples (nom_methode, image_traitée)"""
-    return [
-        ("Adaptive", method_adaptive_threshold(img)),
-        ("LAB", method_lab_channel(img)),
-        ("Inverted", method_simple_inversion(img)),
-        ("CLAHE", method_clahe_contrast(img))
-    ]
\ No newline at end of file
+def get_processed_images(img, scale=DEFAULT_SCALE, executor=None):
+    """
+    Retourne une liste de tuples (nom_methode, image_traitée).
+    executor (PreprocessingExecutor) : variantes calculées en parallèle.
+    """
+    graph = PreprocessingGraph(img, scale=scale)
+    if executor is not None:
+        for _ in executor.ready(graph):
+            pass
+    return graph.variants()
+
+def iter_processed_images(img, scale=DEFAULT_SCALE, pool=DEFAULT_POOL):
+    """
+    Comme get_processed_images, mais en générateur économe en mémoire :
+    chaque variante est libérée dès que l'itération reprend (à consommer tout de suite).
+    """
+    return PreprocessingGraph(img, scale=scale, pool=pool).iter_variants()
@@ -0,0 +1,88 @@
+"""
+--------------------------------------------------------------------------------
+File: src/results.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Stockage en mémoire des résultats d'un benchmark (indépendant de l'interface).
+    Le thread d'analyse ajoute les lignes ; l'interface lit, à son rythme,
+    une "vue" (filtre + tri) sous forme de liste d'indices. Les vues sont
+    mises en cache et recalculées seulement quand le contenu change.
+--------------------------------------------------------------------------------
+"""
+
+import threading
+
+# Filtres disponibles : nom -> prédicat sur une ligne
+FILTERS = {
+    "all": lambda row: True,
+    "failures": lambda row: not row["success"],
+    "successes": lambda row: row["success"],
+}
+
+# Colonnes triables : nom -> clé de tri ("index" = ordre d'arrivée)
+SORT_KEYS = {
+    "index": lambda row: row["index"],
+    "file": lambda row: row["file"].lower(),
+    "expected": lambda row: row["expected"],
+    "detected": lambda row: row["detected"],
+    "confidence": lambda row: row["confidence"],
+    "success": lambda row: row["success"],
+}
+
+class ResultStore:
+    """Lignes {index, file, expected, detected, confidence, success} + compteurs"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0  # incrémenté à chaque modification, jamais remis à zéro
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.rows = []
+            self.success_count = 0
+            # Pas de remise à zéro : un nouveau run ne doit pas retomber sur une
+            # version déjà affichée par l'interface (VirtualTable.refresh)
+            self.version += 1
+            self._view_cache = {}
+
+    def add(self, file, expected, detected, confidence):
+        success = expected == detected
+        with self._lock:
+            self.rows.append({"index": len(self.rows), "file": file, "expected": expected,
+                              "detected": detected, "confidence": confidence,
+                              "success": success})
+            self.success_count += success
+            self.version += 1
+        return success
+
+    def __len__(self):
+        return len(self.rows)
+
+    def counts(self):
+        """(total, succès, échecs, précision en %)"""
+        with self._lock:
+            total, success = len(self.rows), self.success_count
+        accuracy = 100 * success / total if total else 0.0
+        return total, success, total - success, accuracy
+
+    def view(self, filter_name="all", sort_key="index", reverse=False):
+        """Indices des lignes à afficher (filtrées puis triées)"""
+        with self._lock:
+            cache_key = (filter_name, sort_key, reverse)
+            cached = self._view_cache.get(cache_key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            keep, key = FILTERS[filter_name], SORT_KEYS[sort_key]
+            indices = [i for i, row in enumerate(self.rows) if keep(row)]
+            if sort_key != "index" or reverse:
+                indices.sort(key=lambda i: key(self.rows[i]), reverse=reverse)
+            self._view_cache = {cache_key: (self.version, indices)}
+            return indices
+
+    def row(self, index):
+        return self.rows[index]
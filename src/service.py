@@ -0,0 +1,302 @@
+"""
+--------------------------------------------------------------------------------
+File: src/service.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Service de détection longue durée (daemon local).
+    Le lecteur EasyOCR est chargé une seule fois et partagé par tous les clients.
+    Les requêtes arrivées dans une courte fenêtre sont regroupées : les variantes
+    de même taille passent ensemble dans Reader.readtext_batched (détecteur CRAFT
+    en un seul batch), puis chaque image est fusionnée, clusterisée et scorée.
+
+    API HTTP (localhost ou socket Unix) :
+        POST /detect  corps = image encodée (png/jpg)
+                      -> {"layout", "confidence", "scores"} (comme score_layout)
+        GET  /stats   -> compteurs, profondeur de file, percentiles de latence
+    File d'attente bornée : au-delà de max_queue, réponse 503 (backpressure).
+    Une erreur de l'OCR est renvoyée au client (500) et comptée dans "errors".
+--------------------------------------------------------------------------------
+"""
+
+import collections
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from src.preprocessing import PreprocessingGraph, VARIANTS
+from src.engine import OCR_ALLOWLIST, collect_detections
+from src.detections import DetectionTable
+from src.pipeline import classify_chars
+
+class QueueFullError(Exception):
+    """La file d'attente du service est pleine (le client doit réessayer plus tard)"""
+
+class ServiceStoppedError(Exception):
+    """Le service a été arrêté avant de traiter la requête"""
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class DetectionService:
+    """
+    Regroupe les requêtes en micro-batchs et les traite sur un thread unique
+    (le lecteur EasyOCR n'est utilisé que par ce thread).
+    """
+    def __init__(self, reader, batch_window=0.02, max_batch=8, max_queue=32, min_chars=4):
+        self.reader = reader
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.min_chars = min_chars
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._latencies = collections.deque(maxlen=4096)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.started_at = time.time()
+        self.counters = {"served": 0, "rejected": 0, "errors": 0, "batches": 0, "batched_images": 0}
+
+    # --- Cycle de vie ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Arrête le service : les requêtes encore en file reçoivent ServiceStoppedError,
+        le batch en cours se termine. Ne bloque jamais sur une file pleine.
+        """
+        while True:
+            self._drain()
+            try:
+                self._queue.put_nowait(None)
+                break
+            except queue.Full:
+                continue  # un client a rempli la file entre-temps : on vide à nouveau
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _drain(self):
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                with self._lock:
+                    self.counters["rejected"] += 1
+                job[1].set_exception(ServiceStoppedError("Service arrêté"))
+
+    # --- API ---
+
+    def submit(self, img):
+        """Met une image BGR en file et retourne un Future -> (layout, confidence, scores)"""
+        future = Future()
+        try:
+            self._queue.put_nowait((img, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise QueueFullError(f"File pleine ({self.max_queue} requêtes en attente)")
+        return future
+
+    def detect(self, img, timeout=None):
+        return self.submit(img).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = dict(self.counters)
+        batches = counters["batches"]
+        return {
+            **counters,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "mean_batch_size": counters["batched_images"] / batches if batches else 0,
+            "uptime_s": time.time() - self.started_at,
+            "latency_ms": {f"p{p}": _percentile(latencies, p) for p in (50, 90, 95, 99)},
+        }
+
+    # --- Traitement ---
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)  # on termine ce batch puis on s'arrête
+                break
+            batch.append(job)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            try:
+                results = self._process(batch)
+            except Exception as e:
+                with self._lock:
+                    self.counters["errors"] += len(batch)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            failed = sum(isinstance(result, Exception) for result in results)
+            with self._lock:
+                self.counters["batches"] += 1
+                self.counters["batched_images"] += len(batch)
+                self.counters["served"] += len(batch) - failed
+                self.counters["errors"] += failed
+                for (_, _, enqueued), result in zip(batch, results):
+                    if not isinstance(result, Exception):
+                        self._latencies.append(1000 * (done - enqueued))
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _process(self, batch):
+        """
+        Une réponse par requête : (layout, confidence, scores), ou l'exception
+        de l'OCR si une de ses variantes n'a pas pu être lue.
+        """
+        # Variantes de toutes les images, regroupées par taille (contrainte de readtext_batched)
+        groups = collections.defaultdict(list)
+        for job_index, (img, _, _) in enumerate(batch):
+            for name, variant in PreprocessingGraph(img).variants():
+                groups[variant.shape].append((job_index, name, variant))
+
+        passes = [dict() for _ in batch]
+        errors = {}
+        for items in groups.values():
+            try:
+                outputs = self.reader.readtext_batched([v for _, _, v in items],
+                                                       allowlist=OCR_ALLOWLIST,
+                                                       batch_size=len(items))
+            except Exception as e:
+                for job_index, _, _ in items:
+                    errors.setdefault(job_index, e)
+                continue
+            for (job_index, name, _), results in zip(items, outputs):
+                passes[job_index][name] = results
+
+        # Fusion de tout le lot en un seul calcul (colonne "image" = indice de la requête),
+        # variantes dans l'ordre habituel
+        table = DetectionTable()
+        for job_index, job_passes in enumerate(passes):
+            collect_detections(((name, job_passes.get(name, [])) for name in VARIANTS),
+                               table=table, image=job_index)
+
+        responses = []
+        for job_index, chars in enumerate(table.chars_by_image(len(batch))):
+            if job_index in errors:
+                responses.append(errors[job_index])
+                continue
+            result = classify_chars(chars, self.min_chars)
+            responses.append((result["layout"], result["confidence"], result["scores"]))
+        return responses
+
+# --- Serveur HTTP ---
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, service.stats())
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/detect":
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            data = np.frombuffer(self.rfile.read(length), dtype=np.uint8)
+            img = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+            if img is None:
+                self._send_json(400, {"error": "image illisible"})
+                return
+            try:
+                future = service.submit(img)
+            except QueueFullError as e:
+                self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+                return
+            try:
+                layout, confidence, scores = future.result()
+            except ServiceStoppedError as e:
+                self._send_json(503, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, {"layout": layout, "confidence": confidence, "scores": scores})
+
+        def address_string(self):
+            # Sur socket Unix, client_address est vide
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        # HTTPServer.server_bind suppose une adresse (hôte, port)
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+def make_server(service, host="127.0.0.1", port=8765, unix_socket=None):
+    handler = _make_handler(service)
+    if unix_socket:
+        return UnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
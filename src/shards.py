@@ -0,0 +1,226 @@
+"""
+--------------------------------------------------------------------------------
+File: src/shards.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Analyse d'un gros lot d'images répartie sur plusieurs machines (ou
+    processus) qui partagent un dossier de résultats :
+        - l'image `nom` revient au shard hash(nom) % N : stable d'une machine
+          et d'une exécution à l'autre, sans coordination ;
+        - manifest.json (écrit une seule fois, par le premier shard) fige la
+          liste des images et N ; les autres shards vérifient qu'ils
+          travaillent sur la même liste ;
+        - chaque shard ajoute ses résultats à son propre fichier
+          shard-<i>-of-<N>.jsonl (ajout seul) et tient un point de reprise :
+          relancé après une interruption, il saute les images terminées ;
+        - merge_results combine tous les shards en un rapport de précision
+          (vérité terrain : parse_expected_layout) et de latence, au format
+          des rapports de cli_benchmark.py (comparables avec "compare").
+--------------------------------------------------------------------------------
+"""
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+from src.dataset import parse_expected_layout
+
+MANIFEST_NAME = "manifest.json"
+
+def shard_of(name, count):
+    """Shard (0..count-1) d'une image, d'après son nom (hash stable, pas hash())"""
+    digest = hashlib.sha1(name.replace(os.sep, "/").encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+def parse_shard(spec):
+    """"i/N" -> (i, N)"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard invalide : {spec!r} (attendu i/N, ex: 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard invalide : {spec!r} (il faut 0 <= i < N)")
+    return index, count
+
+def _listing_digest(names):
+    return hashlib.sha1("\n".join(sorted(names)).encode("utf-8")).hexdigest()
+
+def _write_atomic(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp, path)
+
+def write_manifest(shard_dir, source, names, count):
+    """
+    Crée le manifest partagé (si absent) ou vérifie qu'il correspond à cette
+    liste d'images et à ce nombre de shards. Retourne le manifest.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    path = os.path.join(shard_dir, MANIFEST_NAME)
+    manifest = {"source": source, "shards": count, "images": len(names),
+                "digest": _listing_digest(names), "names": sorted(names),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    # Écrit à côté puis lié : deux shards lancés en même temps ne peuvent
+    # pas créer deux manifests différents, ni lire un fichier à moitié écrit
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    try:
+        os.link(tmp, path)
+        return manifest
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp)
+
+    existing = load_manifest(shard_dir)
+    if existing["shards"] != count:
+        raise ValueError(f"Le manifest de {shard_dir} a été créé pour {existing['shards']} "
+                         f"shards, pas {count}")
+    if existing["digest"] != manifest["digest"]:
+        raise ValueError(f"La liste d'images diffère du manifest de {shard_dir} "
+                         f"({existing['images']} images attendues, {len(names)} trouvées)")
+    return existing
+
+def load_manifest(shard_dir):
+    with open(os.path.join(shard_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+def _read_records(path, trusted_offset=0):
+    """
+    Lignes JSON complètes d'un fichier de shard, et la position de fin de la
+    dernière ligne valide (une ligne coupée par une interruption est ignorée).
+    Les `trusted_offset` premiers octets (point de reprise) ne sont pas re-validés.
+    """
+    records, valid_end = [], 0
+    if not os.path.exists(path):
+        return records, valid_end
+    if os.path.getsize(path) < trusted_offset:
+        trusted_offset = 0  # fichier plus court que le point de reprise : tout re-valider
+    with open(path, "rb") as f:
+        for line in f:
+            end = valid_end + len(line)
+            if end > trusted_offset and not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if end > trusted_offset:
+                    break
+                raise ValueError(f"Fichier de shard corrompu : {path} (octet {valid_end})")
+            valid_end = end
+    return records, valid_end
+
+class ShardRun:
+    """Fichier de résultats (JSONL, ajout seul) + point de reprise d'un shard"""
+    def __init__(self, shard_dir, index, count):
+        self.index, self.count = index, count
+        base = os.path.join(shard_dir, f"shard-{index}-of-{count}")
+        self.results_path = base + ".jsonl"
+        self.checkpoint_path = base + ".checkpoint.json"
+        self.done = set()
+        self._file = None
+        self._offset = 0
+        self.total = None
+
+    def resume(self):
+        """Relit les résultats déjà écrits (reprise) et retourne les noms terminés"""
+        trusted = 0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                trusted = json.load(f).get("offset", 0)
+        records, valid_end = _read_records(self.results_path, trusted)
+        if os.path.exists(self.results_path) and os.path.getsize(self.results_path) > valid_end:
+            # Fin de fichier coupée (interruption pendant une écriture) : on la retire
+            with open(self.results_path, "r+b") as f:
+                f.truncate(valid_end)
+        self.done = {r["name"] for r in records}
+        self._offset = valid_end
+        return self.done
+
+    def pending(self, names):
+        """Noms de ce shard pas encore terminés"""
+        return [n for n in names if shard_of(n, self.count) == self.index and n not in self.done]
+
+    def append(self, record):
+        """Ajoute un résultat (ligne JSON synchronisée sur disque) et met à jour le point de reprise"""
+        if self._file is None:
+            self._file = open(self.results_path, "ab")
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._offset += len(line)
+        self.done.add(record["name"])
+        _write_atomic(self.checkpoint_path, {
+            "shard": self.index, "shards": self.count, "offset": self._offset,
+            "done": len(self.done), "total": self.total,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def merge_results(shard_dir):
+    """
+    Combine les fichiers de tous les shards de `shard_dir` en un rapport :
+    précision (attendu = parse_expected_layout du nom), latence (moyenne, p50,
+    p95 de l'analyse de chaque image), avancement par shard et images manquantes.
+    """
+    manifest = None
+    if os.path.exists(os.path.join(shard_dir, MANIFEST_NAME)):
+        manifest = load_manifest(shard_dir)
+
+    records, per_shard = {}, {}
+    for path in sorted(glob.glob(os.path.join(shard_dir, "shard-*-of-*.jsonl"))):
+        shard_records, _ = _read_records(path, trusted_offset=0)
+        per_shard[os.path.basename(path)[:-len(".jsonl")]] = len(shard_records)
+        for record in shard_records:
+            records[record["name"]] = record  # une image relancée : dernier résultat
+
+    rows = list(records.values())
+    for row in rows:
+        row["expected"] = parse_expected_layout(row["name"])
+        row["success"] = row["layout"] == row["expected"]
+    seconds = [row["seconds"] for row in rows]
+    expected_names = set(manifest["names"]) if manifest else set(records)
+
+    by_layout = {}
+    for row in rows:
+        stats = by_layout.setdefault(row["expected"], {"images": 0, "success": 0})
+        stats["images"] += 1
+        stats["success"] += row["success"]
+
+    return {
+        "config": {"shard_dir": shard_dir,
+                   "source": manifest["source"] if manifest else None,
+                   "shards": manifest["shards"] if manifest else len(per_shard)},
+        "summary": {
+            "images": len(rows),
+            "accuracy": 100 * sum(row["success"] for row in rows) / len(rows) if rows else 0,
+            "latency": {"mean": sum(seconds) / len(seconds) if seconds else None,
+                        "p50": _percentile(seconds, 50), "p95": _percentile(seconds, 95)},
+            "stages_mean": {},
+            "peak_rss_mb": None,
+        },
+        "by_layout": by_layout,
+        "shards": per_shard,
+        "missing": sorted(expected_names - set(records)),
+        "images": sorted(rows, key=lambda row: row["name"]),
+    }
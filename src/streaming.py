@@ -0,0 +1,265 @@
+"""
+--------------------------------------------------------------------------------
+File: src/streaming.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Pipeline d'analyse en flux : les étapes tournent en parallèle, chacune dans
+    son propre groupe de threads, reliées par des files bornées :
+
+        chemins -> [décodage] -> [prétraitement] -> [OCR + clustering + scoring] -> résultats
+
+    cv2.imread et les filtres OpenCV libèrent le GIL : pendant que torch lit
+    l'image N, les images N+1, N+2... sont décodées et prétraitées.
+    Les files bornées (queue_depth) limitent la mémoire et ralentissent
+    l'amont quand l'OCR ne suit pas.
+    La source peut être une liste de chemins, un dossier surveillé
+    (src.dataset.watch_directory) ou des tuples (nom, contenu encodé), ex: une
+    archive ouverte avec src.dataset.open_source.
+--------------------------------------------------------------------------------
+"""
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from src.preprocessing import PreprocessingGraph, VARIANTS, DEFAULT_SCALE, DEFAULT_POOL
+from src.pipeline import detect_layout
+from src.dataset import decode_image, reduction_for_scale, REDUCED_DECODE_FLAGS
+
+# Marqueur de fin de flux
+_DONE = object()
+
+def _item_name(source_item):
+    """Chemin, ou nom d'un tuple (nom, contenu encodé)"""
+    return source_item if isinstance(source_item, str) else source_item[0]
+
+def _error_result(message):
+    return {"layout": "Erreur", "confidence": 0, "scores": {}, "chars": {},
+            "rows": None, "passes": 0, "error": message}
+
+class StreamingPipeline:
+    """
+    Analyse en flux avec un seul lecteur EasyOCR (l'étape OCR a un seul thread).
+
+    decode_workers / preprocess_workers : threads des étapes OpenCV
+    queue_depth : taille maximale de chaque file entre deux étapes
+    ordered     : True = résultats dans l'ordre de la source,
+                  False = dans l'ordre de fin de traitement
+    reduced_decode : décodage à résolution réduite si le facteur d'échelle
+                  (numérique) le permet (voir detect_layout_encoded)
+    options     : arguments de detect_layout (cascade, cache, scale, ...)
+    """
+    def __init__(self, reader, decode_workers=2, preprocess_workers=2, queue_depth=4,
+                 ordered=True, reduced_decode=False, **options):
+        self.reader = reader
+        self.decode_workers = decode_workers
+        self.preprocess_workers = preprocess_workers
+        self.queue_depth = queue_depth
+        self.ordered = ordered
+        self.options = options
+        scale = options.get("scale", DEFAULT_SCALE)
+        self.reduction = reduction_for_scale(scale) if reduced_decode else 1
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.processed = 0
+        self.started_at = None
+        self.finished_at = None
+        self.busy = {"decode": 0.0, "preprocess": 0.0, "ocr": 0.0}
+
+    # --- Statistiques ---
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def throughput(self):
+        """Débit en images/s depuis le début du flux"""
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        """Débit + taux d'occupation de chaque étape (temps de travail / (durée x threads))"""
+        elapsed = self.elapsed()
+        threads = {"decode": self.decode_workers, "preprocess": self.preprocess_workers, "ocr": 1}
+        with self._lock:
+            busy = dict(self.busy)
+        return {
+            "images": self.processed,
+            "seconds": elapsed,
+            "images_per_s": self.throughput(),
+            "utilization": {stage: busy[stage] / (elapsed * threads[stage]) if elapsed > 0 else 0.0
+                            for stage in busy},
+        }
+
+    # --- Étapes ---
+
+    def _decode(self, item):
+        index, source_item, _ = item
+        if isinstance(source_item, str):
+            name = source_item
+            img = cv2.imread(name, REDUCED_DECODE_FLAGS[self.reduction])
+        else:
+            name, data = source_item
+            img = decode_image(data, self.reduction)
+        if img is None:
+            return index, name, _error_result(f"Impossible de lire l'image à {name}")
+        return index, name, img
+
+    def _preprocess(self, item):
+        index, path, img = item
+        if isinstance(img, dict):  # erreur de décodage : on transmet tel quel
+            return item
+        scale = self.options.get("scale", DEFAULT_SCALE)
+        if scale == "auto":
+            # L'estimation de l'échelle a besoin du lecteur : faite dans l'étape OCR
+            return index, path, (img, None)
+        if self.reduction > 1:
+            scale = scale * self.reduction
+        graph = PreprocessingGraph(img, scale=scale, pool=DEFAULT_POOL)
+        # En cascade, avec cache ou en mode budget, certaines variantes ne seront
+        # jamais lues : on garde alors le calcul paresseux dans l'étape OCR.
+        if not self.options.get("cascade") and self.options.get("cache") is None \
+                and self.options.get("budget") is None:
+            # plan() d'abord : les étapes intermédiaires (upscale 3 canaux, gris, canal L)
+            # sont libérées dès la dernière variante calculée, pas gardées dans les files ;
+            # chaque variante l'est ensuite après son passage OCR (detect_layout)
+            variants = self.options.get("variants", VARIANTS)
+            graph.plan(variants)
+            graph.variants(variants)
+        return index, path, (img, graph)
+
+    def _ocr(self, item):
+        index, path, payload = item
+        if isinstance(payload, dict):
+            result = payload
+        else:
+            img, graph = payload
+            result = detect_layout(self.reader, img, graph=graph, **self.options)
+            if self.reduction > 1:
+                # Y ramenés dans le repère de l'image pleine résolution
+                result["chars"] = {c: y * self.reduction for c, y in result["chars"].items()}
+            result["decode_reduction"] = self.reduction
+        result["file"] = os.path.basename(path)
+        result["index"] = index
+        return result
+
+    # --- Mécanique des files ---
+
+    def _put(self, q, item, stop):
+        """put bloquant mais interrompu si le consommateur a abandonné le flux"""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q, stop):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _start_stage(self, name, func, workers, q_in, q_out, stop):
+        remaining = [workers]
+
+        def _work():
+            while True:
+                item = self._get(q_in, stop)
+                if item is _DONE:
+                    self._put(q_in, _DONE, stop)  # réveille les autres threads de l'étape
+                    with self._lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last:
+                        self._put(q_out, _DONE, stop)
+                    return
+                start = time.perf_counter()
+                try:
+                    output = func(item)
+                except Exception as e:
+                    output = (item[0], _item_name(item[1]), _error_result(str(e)))
+                with self._lock:
+                    self.busy[name] += time.perf_counter() - start
+                if not self._put(q_out, output, stop):
+                    return
+
+        threads = [threading.Thread(target=_work, name=f"stream-{name}-{i}", daemon=True)
+                   for i in range(workers)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def _feed(self, source, q_out, stop):
+        try:
+            for index, path in enumerate(source):
+                if not self._put(q_out, (index, path, None), stop):
+                    return
+        except Exception as e:
+            print(f"❌ Erreur de la source d'images : {e}")
+        finally:
+            self._put(q_out, _DONE, stop)
+
+    def run(self, source):
+        """
+        Générateur des dicts de detect_layout (+ "file", "index") pour chaque
+        chemin de `source` (itérable, éventuellement infini).
+        """
+        self._reset()
+        self.started_at = time.perf_counter()
+        stop = threading.Event()
+        decoded = queue.Queue(maxsize=self.queue_depth)
+        paths = queue.Queue(maxsize=self.queue_depth)
+        prepared = queue.Queue(maxsize=self.queue_depth)
+        results = queue.Queue(maxsize=self.queue_depth)
+
+        threading.Thread(target=self._feed, args=(source, paths, stop),
+                         name="stream-feed", daemon=True).start()
+        workers = (self._start_stage("decode", self._decode, self.decode_workers, paths, decoded, stop)
+                   + self._start_stage("preprocess", self._preprocess, self.preprocess_workers,
+                                       decoded, prepared, stop)
+                   + self._start_stage("ocr", self._ocr, 1, prepared, results, stop))
+
+        pending = {}  # mode ordonné : résultats arrivés en avance
+        next_index = 0
+        try:
+            while True:
+                result = self._get(results, stop)
+                if result is _DONE:
+                    break
+                if isinstance(result, tuple):  # exception dans l'étape OCR
+                    index, path, error = result
+                    result = dict(error, file=os.path.basename(path), index=index)
+                if not self.ordered:
+                    self.processed += 1
+                    yield result
+                    continue
+                pending[result["index"]] = result
+                while next_index in pending:
+                    self.processed += 1
+                    yield pending.pop(next_index)
+                    next_index += 1
+        finally:
+            # Arrêt (fin normale ou abandon du flux) : chaque thread termine son image en cours
+            stop.set()
+            for t in workers:
+                t.join()
+            self.finished_at = time.perf_counter()
+
+def stream_layouts(reader, source, **kwargs):
+    """Raccourci : StreamingPipeline(reader, **kwargs).run(source)"""
+    return StreamingPipeline(reader, **kwargs).run(source)
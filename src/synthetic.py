@@ -0,0 +1,260 @@
+"""
+--------------------------------------------------------------------------------
+File: src/synthetic.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Générateur d'images synthétiques de claviers pour les tests de charge et
+    de non-régression (data/inputs ne contient que quelques dizaines de photos).
+    Les rangées de touches viennent du registre des layouts (champ "keys" de
+    data/layouts/*.json), le rendu utilise uniquement le dessin OpenCV et ses
+    polices Hershey intégrées (aucun fichier de police).
+    Paramètres : résolution, rotation, perspective (skew), flou, reflet,
+    couleur des touches, inversion des légendes, légendes effacées, bruit.
+    Les fichiers suivent la convention FORMAT-OS-LAYOUT-N.png (vérité terrain
+    lue par parse_expected_layout) ; tout est déterministe à partir d'une graine.
+--------------------------------------------------------------------------------
+"""
+
+import json
+import multiprocessing
+import os
+
+import cv2
+import numpy as np
+
+from src.layouts import DEFAULT_REGISTRY, ROW_NAMES
+
+FORMATS = ("ISO", "ANSI")
+SYSTEMS = ("WIN", "MAC")
+NUMBER_ROW = "1234567890"
+FONTS = (cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX)
+
+# Largeur du clavier en touches, et largeur (en touches) de la touche de gauche
+# de chaque rangée (Tab, Verr. Maj, Maj ; Maj ISO plus courte + touche "<>")
+KEYBOARD_UNITS = 15
+ROW_LEAD = {"NUM": 1.0, "TOP": 1.5, "MID": 1.75, "BOT": {"ISO": 1.25, "ANSI": 2.25}}
+LEAD_LABELS = {"NUM": "", "TOP": "tab", "MID": "caps", "BOT": "shift"}
+MODIFIERS = {"WIN": ("ctrl", "win", "alt"), "MAC": ("ctrl", "option", "cmd")}
+
+# Couleurs de touches (BGR) tirées au hasard : sombres, claires, colorées
+KEY_PALETTE = ((35, 35, 35), (60, 55, 50), (20, 20, 25), (230, 230, 230), (205, 210, 215),
+               (240, 235, 225), (120, 60, 30), (40, 40, 140), (60, 110, 40))
+
+# Plages de tirage par défaut de generate_dataset (bornes max, tirées dans [0, max])
+DEFAULT_RANGES = {
+    "widths": (800, 1280, 1600, 2400, 3200),
+    "max_rotation": 8.0,      # degrés
+    "max_skew": 0.15,         # rétrécissement relatif d'un bord (perspective)
+    "max_blur": 1.5,          # sigma (px, pour 1600 px de large)
+    "max_glare": 0.5,         # intensité du reflet (0-1)
+    "max_dropout": 0.2,       # fraction de légendes effacées
+    "max_noise": 6.0,         # écart-type du bruit (niveaux de gris)
+    "invert_prob": 0.3,       # légendes sombres sur touches claires <-> inverse
+    "number_row_prob": 0.8,
+}
+
+def layout_rows(definition):
+    """{"TOP": "...", "MID": "...", "BOT": "..."} : rangée complète, ou les marqueurs à défaut"""
+    keys = definition.get("keys") or definition.get("markers", {})
+    return {row: keys.get(row, "") for row in ROW_NAMES}
+
+def _luminance(color):
+    b, g, r = color
+    return 0.114 * b + 0.587 * g + 0.299 * r
+
+def _draw_key(img, x, y, w, h, key_color, legend, legend_color, font, unit, centered, small=False):
+    """Touche arrondie (bord plus sombre) + légende ; retourne True si une lettre est dessinée"""
+    x0, y0, x1, y1 = int(x), int(y), int(x + w), int(y + h)
+    edge = tuple(int(c * 0.7) for c in key_color)
+    cv2.rectangle(img, (x0, y0), (x1, y1), edge, -1, cv2.LINE_AA)
+    inset = max(1, int(unit * 0.06))
+    cv2.rectangle(img, (x0 + inset, y0 + inset), (x1 - inset, y1 - 2 * inset), key_color, -1, cv2.LINE_AA)
+    if not legend:
+        return False
+
+    thickness = max(1, int(round(unit / (40 if small else 28))))
+    (_, ref_h), _ = cv2.getTextSize("W", font, 1.0, thickness)
+    scale = unit * (0.22 if small else 0.38) / ref_h
+    (tw, th), _ = cv2.getTextSize(legend, font, scale, thickness)
+    if centered:
+        org = (int(x + (w - tw) / 2), int(y + (h + th) / 2))
+    else:
+        org = (int(x + unit * 0.18), int(y + unit * 0.18 + th))
+    cv2.putText(img, legend, org, font, scale, legend_color, thickness, cv2.LINE_AA)
+    return legend.isalpha() and len(legend) == 1
+
+def _warp(img, rotation, skew, background):
+    """Rotation + perspective, contenu ramené dans le cadre d'origine"""
+    h, w = img.shape[:2]
+    corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    k = abs(skew) * w / 2
+    if skew >= 0:  # bord du haut plus court (photo prise d'en bas)
+        target = np.float32([[k, 0], [w - k, 0], [w, h], [0, h]])
+    else:
+        target = np.float32([[0, 0], [w, 0], [w - k, h], [k, h]])
+    matrix = np.vstack([cv2.getRotationMatrix2D((w / 2, h / 2), rotation, 1.0), [0, 0, 1]])
+    matrix = matrix @ cv2.getPerspectiveTransform(corners, target)
+
+    # Mise à l'échelle pour que le clavier transformé tienne dans l'image
+    moved = cv2.perspectiveTransform(corners[None], matrix)[0]
+    (min_x, min_y), (max_x, max_y) = moved.min(axis=0), moved.max(axis=0)
+    fit = min(w / (max_x - min_x), h / (max_y - min_y), 1.0)
+    center = np.array([[fit, 0, w / 2 - fit * (min_x + max_x) / 2],
+                       [0, fit, h / 2 - fit * (min_y + max_y) / 2], [0, 0, 1]])
+    return cv2.warpPerspective(img, center @ matrix, (w, h), flags=cv2.INTER_LINEAR,
+                               borderValue=background)
+
+def render_keyboard(definition, fmt="ISO", system="WIN", width=1600, key_color=(35, 35, 35),
+                    invert=False, rotation=0.0, skew=0.0, blur=0.0, glare=0.0, dropout=0.0,
+                    noise=0.0, number_row=True, font=cv2.FONT_HERSHEY_SIMPLEX, seed=0):
+    """
+    Dessine un clavier du layout `definition` (entrée du registre).
+    Retourne (image BGR, nombre de lettres dessinées).
+    invert : échange couleur des touches et couleur des légendes.
+    blur   : sigma du flou gaussien (px, rapporté à une image de 1600 px de large).
+    glare  : intensité (0-1) d'une tache de reflet ; dropout : fraction de légendes effacées.
+    seed   : graine du hasard propre au rendu (légendes effacées, reflet, bruit, fond).
+    """
+    rng = np.random.default_rng(seed)
+    rows = (["NUM"] if number_row else []) + list(ROW_NAMES)
+    legends = dict(layout_rows(definition), NUM=NUMBER_ROW)
+
+    unit = width / (KEYBOARD_UNITS + 2)
+    height = int(round(unit * (len(rows) + 3)))
+    background = tuple(int(v) for v in rng.integers(90, 200, size=3))
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = background
+
+    legend_color = (235, 235, 235) if _luminance(key_color) < 128 else (25, 25, 25)
+    if invert:
+        key_color, legend_color = legend_color, key_color
+    body = tuple(int(c * 0.55 + 20) for c in key_color)
+    cv2.rectangle(img, (int(unit * 0.8), int(unit * 0.8)),
+                  (int(width - unit * 0.8), int(height - unit * 0.8)), body, -1, cv2.LINE_AA)
+
+    centered = system == "MAC"
+    letters = 0
+    for r, row in enumerate(rows + ["SPACE"]):
+        y = unit * (1 + r)
+        x = unit
+        if row == "SPACE":
+            # Rangée des modificateurs + barre d'espace
+            for label in MODIFIERS[system]:
+                _draw_key(img, x, y, unit * 1.25, unit, key_color, label, legend_color,
+                          font, unit, centered, small=True)
+                x += unit * 1.25
+            _draw_key(img, x, y, unit * 6.25, unit, key_color, "", legend_color, font, unit, centered)
+            x += unit * 6.25
+            for label in reversed(MODIFIERS[system]):
+                _draw_key(img, x, y, unit * 1.25, unit, key_color, label, legend_color,
+                          font, unit, centered, small=True)
+                x += unit * 1.25
+            continue
+
+        lead = ROW_LEAD[row][fmt] if isinstance(ROW_LEAD[row], dict) else ROW_LEAD[row]
+        _draw_key(img, x, y, unit * lead, unit, key_color, LEAD_LABELS[row], legend_color,
+                  font, unit, False, small=True)
+        x += unit * lead
+        keys = legends[row]
+        if row == "BOT" and fmt == "ISO":
+            keys = "<" + keys
+        for char in keys:
+            legend = "" if rng.random() < dropout else char
+            letters += _draw_key(img, x, y, unit, unit, key_color, legend, legend_color,
+                                 font, unit, centered)
+            x += unit
+        # Touche de fin de rangée (Retour arrière, Entrée, Maj droite) jusqu'au bord
+        end = unit * (KEYBOARD_UNITS + 1)
+        if end - x > unit * 0.5:
+            _draw_key(img, x, y, end - x, unit, key_color, "", legend_color, font, unit, centered)
+
+    if glare > 0:
+        # Tache lumineuse elliptique (reflet d'éclairage sur le plastique)
+        cx, cy = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height
+        sx, sy = rng.uniform(0.1, 0.3) * width, rng.uniform(0.1, 0.3) * height
+        xs = ((np.arange(width, dtype=np.float32) - cx) / sx) ** 2
+        ys = ((np.arange(height, dtype=np.float32) - cy) / sy) ** 2
+        mask = np.exp(-(ys[:, None] + xs[None, :]) / 2)
+        img = np.clip(img + (glare * 255 * mask)[..., None], 0, 255).astype(np.uint8)
+
+    if rotation or skew:
+        img = _warp(img, rotation, skew, background)
+    if blur > 0:
+        img = cv2.GaussianBlur(img, (0, 0), blur * width / 1600)
+    if noise > 0:
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    return img, letters
+
+def sample_params(rng, layouts, widths=DEFAULT_RANGES["widths"], max_rotation=DEFAULT_RANGES["max_rotation"],
+                  max_skew=DEFAULT_RANGES["max_skew"], max_blur=DEFAULT_RANGES["max_blur"],
+                  max_glare=DEFAULT_RANGES["max_glare"], max_dropout=DEFAULT_RANGES["max_dropout"],
+                  max_noise=DEFAULT_RANGES["max_noise"], invert_prob=DEFAULT_RANGES["invert_prob"],
+                  number_row_prob=DEFAULT_RANGES["number_row_prob"]):
+    """Tire les paramètres d'une image (dict sérialisable en JSON)"""
+    return {
+        "layout": str(rng.choice(layouts)),
+        "format": str(rng.choice(FORMATS)),
+        "system": str(rng.choice(SYSTEMS)),
+        "width": int(rng.choice(widths)),
+        "key_color": [int(c) for c in KEY_PALETTE[rng.integers(len(KEY_PALETTE))]],
+        "invert": bool(rng.random() < invert_prob),
+        "rotation": round(float(rng.uniform(-max_rotation, max_rotation)), 2),
+        "skew": round(float(rng.uniform(-max_skew, max_skew)), 3),
+        "blur": round(float(rng.uniform(0, max_blur)), 2),
+        "glare": round(float(rng.uniform(0, max_glare)), 2),
+        "dropout": round(float(rng.uniform(0, max_dropout)), 2),
+        "noise": round(float(rng.uniform(0, max_noise)), 1),
+        "number_row": bool(rng.random() < number_row_prob),
+        "font": int(rng.integers(len(FONTS))),
+        "seed": int(rng.integers(2 ** 31)),
+    }
+
+def render_params(params, registry=DEFAULT_REGISTRY):
+    """Rendu d'une image à partir des paramètres de sample_params"""
+    definition = registry.definitions[registry.names.index(params["layout"])]
+    return render_keyboard(definition, params["format"], params["system"], params["width"],
+                           tuple(params["key_color"]), params["invert"], params["rotation"],
+                           params["skew"], params["blur"], params["glare"], params["dropout"],
+                           params["noise"], params["number_row"], FONTS[params["font"]],
+                           params["seed"])
+
+def image_params(index, seed=0, layouts=None, **ranges):
+    """Paramètres de l'image n° index : ne dépendent que de (seed, index)"""
+    rng = np.random.default_rng([seed, index])
+    params = sample_params(rng, layouts or DEFAULT_REGISTRY.names, **ranges)
+    params["name"] = f"{params['format']}-{params['system']}-{params['layout']}-{index + 1}.png"
+    return params
+
+def _generate_one(job):
+    out_dir, index, seed, layouts, ranges = job
+    params = image_params(index, seed, layouts, **ranges)
+    img, letters = render_params(params)
+    cv2.imwrite(os.path.join(out_dir, params["name"]), img)
+    params["height"] = img.shape[0]
+    params["letters"] = letters
+    return params
+
+def generate_dataset(out_dir, count, seed=0, layouts=None, workers=1, start=0, **ranges):
+    """
+    Génère `count` images dans out_dir (FORMAT-OS-LAYOUT-N.png) + synthetic.jsonl
+    (paramètres et nombre de lettres de chaque image, même ordre).
+    Déterministe : l'image N ne dépend que de (seed, N), quel que soit `workers`.
+    Générateur des paramètres de chaque image écrite (pour afficher la progression).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(out_dir, index, seed, layouts, ranges) for index in range(start, start + count)]
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap(_generate_one, jobs, chunksize=8) if pool else map(_generate_one, jobs)
+        with open(os.path.join(out_dir, "synthetic.jsonl"), "a" if start else "w", encoding="utf-8") as f:
+            for params in results:
+                f.write(json.dumps(params) + "\n")
+                yield params
+    finally:
+        if pool is not None:
+            pool.terminate()
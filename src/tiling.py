@@ -0,0 +1,133 @@
+"""
+--------------------------------------------------------------------------------
+File: src/tiling.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    OCR par tuiles pour les très grandes photos. Après l'upscale x3, une photo
+    haute résolution donne une variante énorme : readtext la traite d'un bloc
+    (pic mémoire et temps du détecteur proportionnels à tous les pixels, et
+    EasyOCR la réduit à 2560 px de côté pour la détection).
+    Tiling découpe chaque variante en tuiles qui se chevauchent, les lit en
+    parallèle (threads), remet les boîtes dans le repère de la variante, puis
+    retire les doublons des zones de chevauchement :
+        - chaque point de l'image appartient au "coeur" d'une seule tuile
+          (frontière au milieu du chevauchement) : une boîte n'est gardée que
+          par la tuile qui possède son centre ;
+        - les doublons restants (lettre coupée au bord d'une tuile, centre
+          décalé) sont retirés s'ils recouvrent une boîte de même texte venue
+          d'une autre tuile (meilleure confiance gardée).
+    Le chevauchement doit dépasser la hauteur d'une lettre agrandie, pour
+    qu'au moins une tuile la voie en entier.
+--------------------------------------------------------------------------------
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TILE_SIZE = 1280
+DEFAULT_OVERLAP = 192
+
+def _spans(length, tile_size, overlap):
+    """
+    Découpage d'un axe : [(début, fin, début_coeur, fin_coeur)]. La dernière
+    tuile est calée sur le bord (même taille que les autres).
+    """
+    if length <= tile_size:
+        return [(0, length, 0, length)]
+    starts = list(range(0, length - tile_size, tile_size - overlap)) + [length - tile_size]
+    ends = [start + tile_size for start in starts]
+    cuts = [0] + [(starts[i + 1] + ends[i]) // 2 for i in range(len(starts) - 1)] + [length]
+    return [(start, end, cuts[i], cuts[i + 1]) for i, (start, end) in enumerate(zip(starts, ends))]
+
+def _bounds(bbox):
+    xs = [float(p[0]) for p in bbox]
+    ys = [float(p[1]) for p in bbox]
+    return min(xs), max(xs), min(ys), max(ys)
+
+def _overlap(a, b):
+    """
+    Intersection / aire du plus petit de deux rectangles (x_min, x_max, y_min, y_max) :
+    vaut 1 pour une lettre coupée au bord d'une tuile, contenue dans la lettre entière
+    """
+    inter_w = min(a[1], b[1]) - max(a[0], b[0])
+    inter_h = min(a[3], b[3]) - max(a[2], b[2])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    smaller = min((a[1] - a[0]) * (a[3] - a[2]), (b[1] - b[0]) * (b[3] - b[2]))
+    return inter_w * inter_h / smaller if smaller > 0 else 0.0
+
+def merge_tile_results(tile_results, overlap_threshold=0.5):
+    """
+    Fusionne les résultats readtext de plusieurs tuiles ([(tuile, résultats)],
+    tuile = (y0, y1, x0, x1, (coeur_y0, coeur_y1, coeur_x0, coeur_x1))) en une
+    liste de (bbox, texte, confiance) dans le repère de l'image entière.
+    """
+    kept = []  # (bounds, indice de tuile, (bbox, texte, confiance))
+    for index, ((y0, _, x0, _, core), results) in enumerate(tile_results):
+        cy0, cy1, cx0, cx1 = core
+        for bbox, text, conf in results:
+            bbox = [[float(x) + x0, float(y) + y0] for x, y in bbox]
+            bounds = _bounds(bbox)
+            center_x, center_y = (bounds[0] + bounds[1]) / 2, (bounds[2] + bounds[3]) / 2
+            if cx0 <= center_x < cx1 and cy0 <= center_y < cy1:
+                kept.append((bounds, index, (bbox, text, float(conf))))
+
+    merged = []
+    for bounds, index, result in sorted(kept, key=lambda item: -item[2][2]):
+        text = result[1].strip().upper()
+        if any(other_index != index and other[1].strip().upper() == text
+               and _overlap(bounds, other_bounds) >= overlap_threshold
+               for other_bounds, other_index, other in merged):
+            continue
+        merged.append((bounds, index, result))
+    # Ordre de lecture (haut -> bas, gauche -> droite), comme readtext
+    merged.sort(key=lambda item: (item[0][2], item[0][0]))
+    return [result for _, _, result in merged]
+
+class Tiling:
+    """
+    Paramètres du découpage en tuiles (taille et chevauchement en px de la
+    variante agrandie) et nombre de tuiles lues en parallèle.
+    Une image plus petite qu'une tuile est lue d'un bloc (résultat identique).
+    """
+    def __init__(self, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP, workers=2,
+                 overlap_threshold=0.5):
+        if tile_size <= 0 or not 0 <= overlap < tile_size:
+            raise ValueError(f"Tuiles invalides : taille {tile_size}, chevauchement {overlap} "
+                             "(il faut 0 <= chevauchement < taille)")
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.workers = max(1, workers)
+        self.overlap_threshold = overlap_threshold
+
+    def params(self):
+        """Paramètres qui influencent la sortie OCR (clé de cache) : pas le nombre de threads"""
+        return {"tile_size": self.tile_size, "overlap": self.overlap,
+                "overlap_threshold": self.overlap_threshold}
+
+    def tiles(self, shape):
+        """[(y0, y1, x0, x1, coeur)] couvrant une image de forme `shape`"""
+        return [(y0, y1, x0, x1, (cy0, cy1, cx0, cx1))
+                for y0, y1, cy0, cy1 in _spans(shape[0], self.tile_size, self.overlap)
+                for x0, x1, cx0, cx1 in _spans(shape[1], self.tile_size, self.overlap)]
+
+    def read(self, img, read_tile):
+        """
+        `read_tile(tuile)` = OCR d'une tuile (ex: reader.readtext), appelé en
+        parallèle sur des vues de `img` (pas de copie). Retourne les résultats
+        fusionnés et dédoublonnés, au format readtext.
+        """
+        tiles = self.tiles(img.shape)
+        if len(tiles) == 1:
+            return read_tile(img)
+        views = [img[y0:y1, x0:x1] for y0, y1, x0, x1, _ in tiles]
+        if self.workers == 1:
+            results = [read_tile(view) for view in views]
+        else:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="ocr-tile") as pool:
+                results = list(pool.map(read_tile, views))
+        return merge_tile_results(list(zip(tiles, results)), self.overlap_threshold)
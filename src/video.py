@@ -0,0 +1,164 @@
+"""
+--------------------------------------------------------------------------------
+File: src/video.py
+Author:
+    Nicolas HOEDENAEKEN
+    Théo MERTENS
+    Baris OZCELIK
+    Khassan AKTAMIROV
+
+Description:
+    Détection du layout sur un flux vidéo (webcam de la borne, ou fichier vidéo
+    pour les tests) au lieu d'une photo unique.
+    Seule une image sur `sample_every` est lue par l'OCR, avec une variante de
+    prétraitement différente à chaque fois (rotation). Les détections s'ajoutent
+    au même cumul {lettre: Y moyen} que run_ocr_pipeline ; le clustering et le
+    scoring ne sont relancés que si de nouvelles lettres sont arrivées, et
+    l'analyse s'arrête dès que la décision est stable.
+--------------------------------------------------------------------------------
+"""
+
+import time
+
+import cv2
+
+from src.preprocessing import PreprocessingGraph, VARIANTS, DEFAULT_SCALE, DEFAULT_POOL
+from src.engine import OcrEvidence, ocr_passes, estimate_scale, TARGET_CHAR_HEIGHT
+from src.layouts import DEFAULT_REGISTRY
+from src.pipeline import classify_chars
+from src.instrumentation import span
+
+def open_capture(source):
+    """cv2.VideoCapture sur un fichier, une URL ou un index de caméra ("0" -> webcam 0)"""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise IOError(f"Impossible d'ouvrir le flux vidéo : {source}")
+    return capture
+
+class VideoLayoutDetector:
+    """
+    sample_every       : une image OCRisée toutes les N images du flux
+    variants_per_frame : nombre de variantes lues par image échantillonnée
+                         (rotation sur `variants` d'une image à l'autre)
+    stable_updates     : nombre de re-scores consécutifs donnant le même layout
+                         (avec min_confidence et min_letters) pour conclure
+    max_frames / max_seconds : limites de sécurité (None = jusqu'à la fin du flux)
+    scale              : facteur du prétraitement ; "auto" = estimé une seule fois
+                         sur la première image échantillonnée
+    """
+    def __init__(self, reader, sample_every=5, variants_per_frame=1, variants=VARIANTS,
+                 min_confidence=100, min_letters=8, stable_updates=2, min_chars=4,
+                 max_frames=None, max_seconds=None, ocr_mode="full",
+                 scale=DEFAULT_SCALE, target_height=TARGET_CHAR_HEIGHT):
+        self.reader = reader
+        self.sample_every = max(1, sample_every)
+        self.variants_per_frame = max(1, min(variants_per_frame, len(variants)))
+        self.variants = tuple(variants)
+        self.min_confidence = min_confidence
+        self.min_letters = min_letters
+        self.stable_updates = stable_updates
+        self.min_chars = min_chars
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+        self.ocr_mode = ocr_mode
+        self.scale = scale
+        self.target_height = target_height
+
+    def _next_variants(self, sampled_index):
+        start = sampled_index * self.variants_per_frame
+        return [self.variants[(start + i) % len(self.variants)]
+                for i in range(self.variants_per_frame)]
+
+    def _is_confident(self, result):
+        return (result["layout"] in DEFAULT_REGISTRY.names
+                and result["confidence"] >= self.min_confidence
+                and len(result["chars"]) >= self.min_letters)
+
+    def updates(self, capture):
+        """
+        Générateur : un dict (comme detect_layout) à chaque re-score, enrichi de
+        frames_read, frames_processed, passes, elapsed et stable.
+        Le dernier dict produit a stable=True si la décision a été atteinte.
+        """
+        evidence = OcrEvidence()
+        scale = self.scale
+        start = time.perf_counter()
+        frames_read = frames_processed = 0
+        streak, last_layout = 0, None
+        self.frames_read = self.frames_processed = self.passes = 0
+
+        while True:
+            if self.max_frames is not None and frames_read >= self.max_frames:
+                return
+            if self.max_seconds is not None and time.perf_counter() - start > self.max_seconds:
+                return
+
+            # Les images non échantillonnées sont seulement avancées (pas de décodage)
+            if frames_read % self.sample_every:
+                if not capture.grab():
+                    return
+                frames_read += 1
+                self.frames_read = frames_read
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                return
+            frames_read += 1
+            self.frames_read = frames_read
+
+            if scale == "auto":
+                scale = estimate_scale(self.reader, frame, self.target_height)
+
+            names = self._next_variants(frames_processed)
+            frames_processed += 1
+            accepted = 0
+            with span("video.frame"):
+                graph = PreprocessingGraph(frame, scale=scale, pool=DEFAULT_POOL).plan(names)
+                for name, results in ocr_passes(self.reader, graph.get, names, self.ocr_mode,
+                                                scale=scale, release_variant=graph.release):
+                    accepted += evidence.add(results, scale, name)
+            self.frames_processed, self.passes = frames_processed, evidence.passes
+
+            # Rien de nouveau : inutile de re-clusteriser
+            if not accepted:
+                continue
+
+            result = classify_chars(evidence.chars(), self.min_chars)
+            if self._is_confident(result):
+                streak = streak + 1 if result["layout"] == last_layout else 1
+                last_layout = result["layout"]
+            else:
+                streak, last_layout = 0, None
+
+            result.update(frames_read=frames_read, frames_processed=frames_processed,
+                          passes=evidence.passes, elapsed=time.perf_counter() - start,
+                          scale=scale, stable=streak >= self.stable_updates)
+            yield result
+            if result["stable"]:
+                return
+
+    def run(self, source):
+        """
+        Analyse le flux jusqu'à une décision stable (ou la fin du flux / des limites).
+        Retourne le dernier résultat ; time_to_decision vaut None si pas de décision.
+        """
+        capture = open_capture(source) if not isinstance(source, cv2.VideoCapture) else source
+        start = time.perf_counter()
+        result = None
+        try:
+            for result in self.updates(capture):
+                pass
+        finally:
+            capture.release()
+
+        if result is None:
+            result = classify_chars({}, self.min_chars)
+            result.update(stable=False, scale=self.scale)
+        # Compteurs du flux entier (des images ont pu être lues après le dernier re-score)
+        result.update(frames_read=self.frames_read, frames_processed=self.frames_processed,
+                      passes=self.passes)
+        result["elapsed"] = time.perf_counter() - start
+        result["time_to_decision"] = result["elapsed"] if result["stable"] else None
+        return result